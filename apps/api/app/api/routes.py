@@ -1,8 +1,12 @@
+import asyncio
 import json
 import logging
-from collections.abc import Iterator
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Iterator
 from functools import lru_cache
 from typing import Annotated, Any
+from uuid import uuid4
 
 from fastapi import (
     APIRouter,
@@ -15,6 +19,8 @@ from fastapi import (
     Response,
     status,
 )
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import ValidationError
 
 from app.core.config import Settings, get_settings
@@ -25,10 +31,15 @@ from app.core.security import (
     security_detail,
 )
 from app.engine.downloads import DownloadSecurityError
+from app.engine.envelope import to_envelope
+from app.engine.fingerprints import FingerprintStore
+from app.engine.incremental import grouping_settings_digest, run_incremental_scan
 from app.engine.models import PhotoItem
-from app.engine.normalizer import normalize_photo_items, normalize_picker_payload
-from app.engine.scan import run_scan
+from app.engine.scan import GroupsCallback, ScanCancelledError, run_scan
 from app.engine.schemas import MAX_ID_LENGTH, ScanRequest, ScanResult
+from app.jobs.backends import ScanJobBackend, ScanJobRecord, ScanJobUnavailableError
+from app.jobs.runner import build_job_payload, normalize_scan_request, requires_image_bytes
+from app.jobs.schemas import ScanJobResponse, ScanJobStatus
 from app.projects.ingestion import (
     ProjectSourceUnavailableError,
     UnsupportedProjectSourceError,
@@ -53,6 +64,8 @@ from app.projects.scope import ScopeDefinition, resolve_scope
 router = APIRouter()
 logger = logging.getLogger(__name__)
 BoundedPathId = Annotated[str, Path(min_length=1, max_length=MAX_ID_LENGTH)]
+# Comment line sent on an otherwise idle event stream so proxies keep it open.
+SSE_KEEPALIVE_SECONDS = 15.0
 
 
 @lru_cache
@@ -66,17 +79,26 @@ def get_app_settings(request: Request) -> Settings:
     return settings
 
 
+def get_scan_jobs(request: Request) -> ScanJobBackend:
+    scan_jobs: ScanJobBackend = request.app.state.scan_jobs
+    return scan_jobs
+
+
 def require_scan_admission(request: Request) -> Iterator[None]:
     controller: ScanAdmissionController = request.app.state.scan_admission
     try:
         with controller.lease():
             yield
     except AdmissionError as exc:
-        raise HTTPException(
-            status_code=exc.status_code,
-            detail=security_detail(request.scope, exc.category, exc.message),
-            headers={"Retry-After": str(exc.retry_after)},
-        ) from exc
+        raise _admission_refused(request, exc) from exc
+
+
+def _admission_refused(request: Request, exc: AdmissionError) -> HTTPException:
+    return HTTPException(
+        status_code=exc.status_code,
+        detail=security_detail(request.scope, exc.category, exc.message),
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
 @router.get("/healthz")
@@ -102,15 +124,12 @@ def scan(
         settings,
         x_scan_explain=x_scan_explain,
     )
-    require_image_bytes = request.picker_payload is not None or any(
-        item.download_url is not None for item in items
-    )
     try:
         return run_scan(
             items,
             settings,
             explain=explain_requested or settings.scan_explain,
-            require_image_bytes=require_image_bytes,
+            require_image_bytes=requires_image_bytes(request, items),
         )
     except DownloadSecurityError as exc:
         raise HTTPException(
@@ -124,6 +143,126 @@ def scan(
         ) from exc
 
 
+@router.post("/api/scan/stream")
+def stream_scan(
+    request: ScanRequest,
+    http_request: Request,
+    _admission: Annotated[None, Depends(require_scan_admission)],
+    settings: Annotated[Settings, Depends(get_app_settings)],
+    x_scan_explain: str | None = Header(default=None, alias="X-Scan-Explain"),
+) -> StreamingResponse:
+    """``/api/scan`` as newline-delimited JSON, sending groups as soon as they are final.
+
+    Each line is ``{"type": "groups", ...}`` for the exact groups and then each candidate
+    bucket's near-duplicate groups, followed by one ``{"type": "result", ...}`` line with
+    the full ``ScanResult``, or a ``{"type": "error", ...}`` line if the scan failed.
+    """
+    items, explain_requested = _prepare_scan_items(
+        request,
+        settings,
+        x_scan_explain=x_scan_explain,
+    )
+
+    def scan_items(on_groups: GroupsCallback, stop: threading.Event) -> ScanResult:
+        return run_scan(
+            items,
+            settings,
+            explain=explain_requested or settings.scan_explain,
+            require_image_bytes=requires_image_bytes(request, items),
+            on_groups=on_groups,
+            stop=stop,
+        )
+
+    return StreamingResponse(
+        _scan_lines(scan_items, http_request, settings.scan_progress_interval_seconds),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "/api/scan/jobs",
+    response_model=ScanJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def submit_scan_job(
+    request: ScanRequest,
+    http_request: Request,
+    settings: Annotated[Settings, Depends(get_app_settings)],
+    scan_jobs: Annotated[ScanJobBackend, Depends(get_scan_jobs)],
+    x_scan_explain: str | None = Header(default=None, alias="X-Scan-Explain"),
+) -> ScanJobResponse:
+    """Queue a scan; it holds its admission slot until it finishes, not just until queued.
+
+    Queued and running jobs therefore count against the scan concurrency limit, and a
+    submission past it is refused with ``scan_busy`` instead of growing the queue.
+    """
+    controller: ScanAdmissionController = http_request.app.state.scan_admission
+    try:
+        release = controller.acquire()
+    except AdmissionError as exc:
+        raise _admission_refused(http_request, exc) from exc
+    try:
+        items, explain_requested = _prepare_scan_items(
+            request,
+            settings,
+            x_scan_explain=x_scan_explain,
+        )
+        job_id = uuid4().hex
+        payload = build_job_payload(request, explain=explain_requested or settings.scan_explain)
+        scan_jobs.submit(job_id, payload, total=len(items), on_finished=release)
+    except ScanJobUnavailableError as exc:
+        release()
+        raise _scan_jobs_unavailable() from exc
+    except BaseException:
+        release()
+        raise
+    return _job_response(job_id, ScanJobRecord.queued(len(items)))
+
+
+@router.get("/api/scan/jobs/{job_id}", response_model=ScanJobResponse)
+def get_scan_job(
+    job_id: BoundedPathId,
+    scan_jobs: Annotated[ScanJobBackend, Depends(get_scan_jobs)],
+) -> ScanJobResponse:
+    return _job_response(job_id, _load_scan_job(scan_jobs, job_id))
+
+
+@router.get("/api/scan/jobs/{job_id}/results")
+def get_scan_job_results(
+    job_id: BoundedPathId,
+    http_request: Request,
+    scan_jobs: Annotated[ScanJobBackend, Depends(get_scan_jobs)],
+) -> dict[str, object]:
+    record = _load_scan_job(scan_jobs, job_id)
+    if record.error is not None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=security_detail(http_request.scope, record.error.category, record.error.message),
+        )
+    if record.envelope is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Scan job has not finished yet.",
+        )
+    return record.envelope
+
+
+@router.get("/api/scan/jobs/{job_id}/events")
+def stream_scan_job_events(
+    job_id: BoundedPathId,
+    settings: Annotated[Settings, Depends(get_app_settings)],
+    scan_jobs: Annotated[ScanJobBackend, Depends(get_scan_jobs)],
+) -> StreamingResponse:
+    """Server-sent ``progress`` events for a scan job, ending once it has finished."""
+    record = _load_scan_job(scan_jobs, job_id)
+    return StreamingResponse(
+        _scan_job_events(scan_jobs, job_id, record, settings.scan_progress_interval_seconds),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/api/projects", response_model=ProjectResponse)
 def create_project(request: ProjectCreateRequest) -> ProjectResponse:
     project = get_project_repo().create_project(request.name.strip())
@@ -231,13 +370,31 @@ def project_scan(
                 detail=safe_validation_errors(exc.errors()),
             ) from exc
     items, explain_requested = _prepare_scan_items(scan_request, settings)
+    fingerprint_store = FingerprintStore(
+        get_project_repo().load_fingerprints(project_id, [item.id for item in items])
+    )
+    settings_digest = grouping_settings_digest(settings)
+    previous_scan = (
+        get_project_repo().load_previous_scan(project_id) if request.incremental else None
+    )
     try:
-        scan_result = run_scan(
-            items,
-            settings,
-            explain=explain_requested or settings.scan_explain,
-            require_image_bytes=source.source_type == "picker",
-        )
+        if previous_scan is None or previous_scan.settings_digest != settings_digest:
+            scan_result = run_scan(
+                items,
+                settings,
+                explain=explain_requested or settings.scan_explain,
+                require_image_bytes=source.source_type == "picker",
+                fingerprint_store=fingerprint_store,
+            )
+        else:
+            scan_result = run_incremental_scan(
+                items,
+                settings,
+                previous_scan,
+                explain=explain_requested or settings.scan_explain,
+                require_image_bytes=source.source_type == "picker",
+                fingerprint_store=fingerprint_store,
+            )
     except DownloadSecurityError as exc:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -248,7 +405,7 @@ def project_scan(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=str(exc),
         ) from exc
-    envelope = _to_envelope(scan_result)
+    envelope = to_envelope(scan_result)
     if source.warning:
         warnings = envelope["telemetry"].get("warnings", [])
         warnings.append(source.warning)
@@ -263,6 +420,8 @@ def project_scan(
         scan_result=scan_result,
         input_items=items,
         envelope=envelope,
+        fingerprints=fingerprint_store.updated,
+        settings_digest=settings_digest,
     )
     if source.source_type == "album_set" and "resumeToken" in source.source_ref:
         next_scope = dict(project.get("scope") or {"type": "album_set"})
@@ -344,94 +503,151 @@ def export_project(
     return Response(content=json.dumps(rows), media_type="application/json")
 
 
-def _to_envelope(scan_result: ScanResult) -> dict[str, Any]:
-    groups: list[dict[str, Any]] = []
-    for bucket, confidence, reason, group_type in [
-        (scan_result.groups_exact, "HIGH", ["HASH_MATCH"], "EXACT"),
-        (scan_result.groups_very_similar, "MEDIUM", ["PHASH_CLOSE"], "NEAR_DUPLICATE"),
-        (scan_result.groups_possibly_similar, "LOW", ["DHASH_CLOSE"], "NEAR_DUPLICATE"),
-    ]:
-        for group in bucket:
-            group_items = []
-            for item in group.items:
-                group_items.append(
+def _load_scan_job(scan_jobs: ScanJobBackend, job_id: str) -> ScanJobRecord:
+    try:
+        record = scan_jobs.get(job_id)
+    except ScanJobUnavailableError as exc:
+        raise _scan_jobs_unavailable() from exc
+    if record is None:
+        raise HTTPException(status_code=404, detail="Scan job not found")
+    return record
+
+
+async def _scan_job_events(
+    scan_jobs: ScanJobBackend,
+    job_id: str,
+    record: ScanJobRecord,
+    interval_seconds: float,
+) -> AsyncIterator[str]:
+    # Waits on the event loop and only borrows a worker thread for each backend read, so
+    # open streams do not tie up the threadpool between polls.
+    sent: ScanJobResponse | None = None
+    last_write = time.monotonic()
+    while True:
+        response = _job_response(job_id, record)
+        if response != sent:
+            sent = response
+            last_write = time.monotonic()
+            yield f"event: progress\ndata: {response.model_dump_json(by_alias=True)}\n\n"
+        elif time.monotonic() - last_write >= SSE_KEEPALIVE_SECONDS:
+            last_write = time.monotonic()
+            yield ": keep-alive\n\n"
+        if record.status in (ScanJobStatus.SUCCEEDED, ScanJobStatus.FAILED):
+            return
+        await asyncio.sleep(interval_seconds)
+        try:
+            latest = await run_in_threadpool(scan_jobs.get, job_id)
+        except ScanJobUnavailableError:
+            yield "event: unavailable\ndata: {}\n\n"
+            return
+        if latest is None:
+            return
+        record = latest
+
+
+async def _scan_lines(
+    scan_items: Callable[[GroupsCallback, threading.Event], ScanResult],
+    http_request: Request,
+    interval_seconds: float,
+) -> AsyncIterator[str]:
+    # The scan runs on its own thread and hands lines over as groups become final. While
+    # waiting for one, the client is checked every interval; once it has gone, the scan is
+    # told to stop at its next batch or bucket. Waiting for it on close keeps the admission
+    # lease held until the scan has really stopped, without holding a worker thread.
+    loop = asyncio.get_running_loop()
+    lines: asyncio.Queue[str | None] = asyncio.Queue()
+    stop = threading.Event()
+
+    def put(line: str | None) -> None:
+        try:
+            loop.call_soon_threadsafe(lines.put_nowait, line)
+        except RuntimeError:
+            # The event loop has closed, so nobody is left to read the line.
+            pass
+
+    def send(line: dict[str, Any]) -> None:
+        put(json.dumps(line, separators=(",", ":")) + "\n")
+
+    def scan_in_background() -> None:
+        try:
+            result = scan_items(
+                lambda groups: send(
                     {
-                        "itemId": item.id,
-                        "type": "PHOTO",
-                        "createTime": item.create_time.isoformat(),
-                        "filename": item.filename or item.id,
-                        "mimeType": item.mime_type or "image/jpeg",
-                        "dimensions": {
-                            "width": item.width or 300,
-                            "height": item.height or 300,
-                        },
-                        "thumbnail": {
-                            "baseUrl": "https://placehold.co/300x300/png?text=Photo",
-                            "suggestedSizePx": 300,
-                        },
-                        "links": {
-                            "googlePhotos": {
-                                "url": item.google_photos_deep_link,
-                            }
-                        },
+                        "type": "groups",
+                        "groups": [
+                            group.model_dump(mode="json", by_alias=True) for group in groups
+                        ],
                     }
-                )
-            groups.append(
+                ),
+                stop,
+            )
+            send({"type": "result", "result": result.model_dump(mode="json", by_alias=True)})
+        except ScanCancelledError:
+            pass
+        except DownloadSecurityError as exc:
+            send(
                 {
-                    "groupId": group.group_id,
-                    "groupType": group_type,
-                    "confidence": confidence,
-                    "reasonCodes": reason,
-                    "itemsCount": len(group.items),
-                    "representativeItemIds": [group.representative_pair.earliest.id],
-                    "items": group_items,
+                    "type": "error",
+                    "status": status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    "detail": security_detail(http_request.scope, exc.category, exc.safe_message),
                 }
             )
+        except ValueError as exc:
+            send(
+                {
+                    "type": "error",
+                    "status": status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    "detail": str(exc),
+                }
+            )
+        except Exception:
+            logger.exception("streamed scan failed")
+            send(
+                {
+                    "type": "error",
+                    "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    "detail": "The scan stopped unexpectedly. Start it again.",
+                }
+            )
+        finally:
+            put(None)
+
+    worker = threading.Thread(target=scan_in_background, name="scan-stream", daemon=True)
+    worker.start()
+    finished = False
+    try:
+        while True:
+            try:
+                line = await asyncio.wait_for(lines.get(), timeout=interval_seconds)
+            except TimeoutError:
+                if await http_request.is_disconnected():
+                    return
+                continue
+            if line is None:
+                finished = True
+                return
+            yield line
+    finally:
+        stop.set()
+        while not finished:
+            finished = await lines.get() is None
+
+
+def _scan_jobs_unavailable() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Scan jobs are unavailable right now. Retry shortly.",
+        headers={"Retry-After": "5"},
+    )
 
-    grouped_items = {item["itemId"] for group in groups for item in group["items"]}
-    failed_count = len(scan_result.failed_items)
-    accepted_count = max(0, scan_result.input_count - failed_count)
-    return {
-        "schemaVersion": "2.2.0",
-        "run": {
-            "runId": scan_result.run_id,
-            "status": "COMPLETED",
-            "startedAt": "",
-            "finishedAt": "",
-            "selection": {
-                "requestedCount": scan_result.input_count,
-                "acceptedCount": accepted_count,
-                "rejectedCount": failed_count,
-            },
-        },
-        "progress": {
-            "stage": "FINALIZE",
-            "message": "Scan completed",
-            "counts": {"processed": scan_result.input_count, "total": scan_result.input_count},
-        },
-        "telemetry": {
-            "cost": {
-                "apiCalls": 0,
-                "estimatedUnits": int(scan_result.cost_estimate.total_cost * 100000),
-                "softCapUnits": 1200,
-                "hardCapUnits": 2000,
-                "hitSoftCap": False,
-                "hitHardCap": False,
-            },
-            "timingMs": int(sum(scan_result.stage_metrics.timings_ms.values())),
-            "warnings": [],
-        },
-        "results": {
-            "summary": {
-                "groupsCount": len(groups),
-                "groupedItemsCount": len(grouped_items),
-                "ungroupedItemsCount": max(0, accepted_count - len(grouped_items)),
-            },
-            "groups": groups,
-            "skippedItems": [],
-            "failedItems": [issue.model_dump(by_alias=True) for issue in scan_result.failed_items],
-        },
-    }
+
+def _job_response(job_id: str, record: ScanJobRecord) -> ScanJobResponse:
+    return ScanJobResponse(
+        jobId=job_id,
+        status=record.status,
+        progress=record.progress,
+        error=record.error,
+    )
 
 
 def _parse_explain_header(value: str | None) -> bool:
@@ -446,11 +662,7 @@ def _prepare_scan_items(
     *,
     x_scan_explain: str | None = None,
 ) -> tuple[list[PhotoItem], bool]:
-    if request.photo_items:
-        items = normalize_photo_items(request.photo_items)
-    else:
-        items = normalize_picker_payload(request.picker_payload or {})
-
+    items = normalize_scan_request(request)
     if not items:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
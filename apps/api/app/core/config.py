@@ -17,12 +17,45 @@ SettingsSourceCallable = Callable[[], dict[str, Any]]
 MAX_REQUEST_BODY_BYTES = 32 * 1024 * 1024
 MAX_DOWNLOAD_BYTES_PER_ITEM = 50 * 1024 * 1024
 MAX_DOWNLOAD_BYTES_PER_SCAN = 500 * 1024 * 1024
+DEFAULT_DOWNLOAD_CACHE_BYTES = 128 * 1024 * 1024
+DEFAULT_DOWNLOAD_CONCURRENCY = 8
+DEFAULT_DOWNLOAD_PER_HOST_CONCURRENCY = 4
+MAX_DOWNLOAD_CONCURRENCY = 32
+DEFAULT_DOWNLOAD_POOL_MAX_IDLE = 8
+DEFAULT_DOWNLOAD_POOL_IDLE_SECONDS = 30.0
+MAX_DOWNLOAD_POOL_MAX_IDLE = 64
+MAX_DOWNLOAD_POOL_IDLE_SECONDS = 120.0
+DEFAULT_DNS_CACHE_TTL_SECONDS = 60.0
+MAX_DNS_CACHE_TTL_SECONDS = 300.0
 MAX_DOWNLOAD_REDIRECTS = 3
 MAX_DOWNLOAD_TIMEOUT_SECONDS = 30.0
 MAX_SCAN_DOWNLOAD_WALL_SECONDS = 10 * 60.0
 MAX_CONCURRENT_SCANS = 1
 MAX_SCAN_ADMISSIONS_PER_MINUTE = 5
 MAX_API_REQUESTS_PER_MINUTE = 120
+MIN_JPEG_DRAFT_EDGE = 32
+MAX_JPEG_DRAFT_EDGE = 4096
+MAX_SCAN_HASH_WORKERS = 32
+DEFAULT_PIPELINE_QUEUE_DEPTH = 16
+MAX_PIPELINE_QUEUE_DEPTH = 256
+DEFAULT_CANDIDATE_WINDOW_SECONDS = 600.0
+MAX_CANDIDATE_WINDOW_SECONDS = 24 * 60 * 60.0
+DEFAULT_CANDIDATE_ASPECT_TOLERANCE = 0.1
+MAX_CANDIDATE_ASPECT_TOLERANCE = 1.0
+DEFAULT_CANDIDATE_MAX_SET_ITEMS = 128
+DEFAULT_CANDIDATE_MAX_COMPARISONS = 1_000_000
+DEFAULT_CANDIDATE_GEOHASH_PRECISION = 6
+MAX_CANDIDATE_GEOHASH_PRECISION = 12
+DEFAULT_CANDIDATE_EXPOSURE_STOPS = 4.0
+MAX_CANDIDATE_EXPOSURE_STOPS = 20.0
+DEFAULT_GLOBAL_LSH_BANDS = 8
+MAX_GLOBAL_LSH_BANDS = 64
+DEFAULT_SCAN_JOB_RESULT_TTL_SECONDS = 24 * 60 * 60.0
+MAX_SCAN_JOB_RESULT_TTL_SECONDS = 7 * 24 * 60 * 60.0
+DEFAULT_SCAN_SHARDS = 4
+DEFAULT_SCAN_PROGRESS_INTERVAL_SECONDS = 0.5
+MAX_SCAN_PROGRESS_INTERVAL_SECONDS = 10.0
+MAX_SCAN_SHARDS = 64
 ALLOWED_LOCAL_CORS_PORTS = {3000}
 GOOGLE_MEDIA_HOST_POLICY = "googleusercontent.com"
 
@@ -37,6 +70,21 @@ class RuntimeEnvironment(StrEnum):
     PRODUCTION = "production"
 
 
+class PhashBackend(StrEnum):
+    NUMPY = "numpy"
+    PYTHON = "python"
+
+
+class CandidateStrategy(StrEnum):
+    WINDOW = "window"
+    BUCKET = "bucket"
+
+
+class ScanJobRunner(StrEnum):
+    INLINE = "inline"
+    CELERY = "celery"
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -57,6 +105,12 @@ class Settings(BaseSettings):
     scan_download_host_overrides: dict[str, str] = {}
     scan_download_max_bytes_per_item: int = MAX_DOWNLOAD_BYTES_PER_ITEM
     scan_download_max_bytes_per_scan: int = MAX_DOWNLOAD_BYTES_PER_SCAN
+    scan_download_cache_max_bytes: int = DEFAULT_DOWNLOAD_CACHE_BYTES
+    scan_download_concurrency: int = DEFAULT_DOWNLOAD_CONCURRENCY
+    scan_download_per_host_concurrency: int = DEFAULT_DOWNLOAD_PER_HOST_CONCURRENCY
+    scan_download_pool_max_idle: int = DEFAULT_DOWNLOAD_POOL_MAX_IDLE
+    scan_download_pool_idle_seconds: float = DEFAULT_DOWNLOAD_POOL_IDLE_SECONDS
+    scan_download_dns_ttl_seconds: float = DEFAULT_DNS_CACHE_TTL_SECONDS
     scan_download_max_redirects: int = MAX_DOWNLOAD_REDIRECTS
     scan_download_timeout_seconds: float = MAX_DOWNLOAD_TIMEOUT_SECONDS
     scan_download_wall_seconds: float = MAX_SCAN_DOWNLOAD_WALL_SECONDS
@@ -67,12 +121,37 @@ class Settings(BaseSettings):
     scan_dhash_threshold_possible: int = 10
     scan_phash_threshold_very: int = 6
     scan_phash_threshold_possible: int = 12
+    scan_phash_backend: PhashBackend = PhashBackend.NUMPY
+    scan_jpeg_draft_decode: bool = False
+    scan_jpeg_draft_min_edge: int = 256
+    scan_hash_workers: int = 1
+    scan_stream_exact_only_items: bool = False
+    scan_pipeline_downloads: bool = True
+    scan_pipeline_queue_depth: int = DEFAULT_PIPELINE_QUEUE_DEPTH
     scan_cost_per_download: float = 0.0002
     scan_cost_per_byte_hash: float = 0.00005
     scan_cost_per_perceptual_hash: float = 0.00008
     scan_cost_per_comparison: float = 0.00001
+    scan_candidate_strategy: CandidateStrategy = CandidateStrategy.BUCKET
+    scan_candidate_window_seconds: float = DEFAULT_CANDIDATE_WINDOW_SECONDS
+    scan_candidate_aspect_match: bool = True
+    scan_candidate_aspect_tolerance: float = DEFAULT_CANDIDATE_ASPECT_TOLERANCE
+    scan_candidate_max_set_items: int = DEFAULT_CANDIDATE_MAX_SET_ITEMS
+    scan_candidate_max_comparisons: int = DEFAULT_CANDIDATE_MAX_COMPARISONS
+    scan_candidate_geo_match: bool = False
+    scan_candidate_geohash_precision: int = DEFAULT_CANDIDATE_GEOHASH_PRECISION
+    scan_candidate_geo_window_seconds: float | None = None
+    scan_candidate_camera_match: bool = False
+    scan_candidate_exposure_stops: float = DEFAULT_CANDIDATE_EXPOSURE_STOPS
     scan_small_input_fallback_max: int = 20
+    scan_global_near_duplicates: bool = False
+    scan_global_lsh_bands: int = DEFAULT_GLOBAL_LSH_BANDS
     scan_explain: bool = False
+    scan_job_runner: ScanJobRunner = ScanJobRunner.INLINE
+    scan_job_result_ttl_seconds: float = DEFAULT_SCAN_JOB_RESULT_TTL_SECONDS
+    scan_job_sharding: bool = False
+    scan_job_shards: int = DEFAULT_SCAN_SHARDS
+    scan_progress_interval_seconds: float = DEFAULT_SCAN_PROGRESS_INTERVAL_SECONDS
     project_db_path: str = "/tmp/photoprune_projects.db"
 
     @field_validator("cors_origins", mode="before")
@@ -138,6 +217,34 @@ class Settings(BaseSettings):
     def enforce_scan_limits(self) -> bool:
         return self.environment == RuntimeEnvironment.PRODUCTION
 
+    @property
+    def jpeg_draft_min_edge(self) -> int | None:
+        return self.scan_jpeg_draft_min_edge if self.scan_jpeg_draft_decode else None
+
+    @property
+    def pipeline_queue_depth(self) -> int | None:
+        return self.scan_pipeline_queue_depth if self.scan_pipeline_downloads else None
+
+    @property
+    def candidate_aspect_tolerance(self) -> float | None:
+        if not self.scan_candidate_aspect_match:
+            return None
+        return self.scan_candidate_aspect_tolerance
+
+    @property
+    def candidate_geohash_precision(self) -> int | None:
+        return self.scan_candidate_geohash_precision if self.scan_candidate_geo_match else None
+
+    @property
+    def candidate_exposure_stops(self) -> float | None:
+        if not self.scan_candidate_camera_match:
+            return None
+        return self.scan_candidate_exposure_stops
+
+    @property
+    def scan_job_shard_count(self) -> int | None:
+        return self.scan_job_shards if self.scan_job_sharding else None
+
     @model_validator(mode="after")
     def validate_security_contract(self) -> "Settings":
         _validate_positive_ceiling(
@@ -156,6 +263,40 @@ class Settings(BaseSettings):
             self.scan_download_max_bytes_per_scan,
             MAX_DOWNLOAD_BYTES_PER_SCAN,
         )
+        _validate_positive_ceiling(
+            "scan_download_cache_max_bytes",
+            self.scan_download_cache_max_bytes,
+            MAX_DOWNLOAD_BYTES_PER_SCAN,
+        )
+        if self.scan_download_cache_max_bytes < self.scan_download_max_bytes_per_item:
+            raise ValueError(
+                "scan_download_cache_max_bytes must hold at least one maximum-size download"
+            )
+        _validate_positive_ceiling(
+            "scan_download_concurrency",
+            self.scan_download_concurrency,
+            MAX_DOWNLOAD_CONCURRENCY,
+        )
+        _validate_positive_ceiling(
+            "scan_download_per_host_concurrency",
+            self.scan_download_per_host_concurrency,
+            MAX_DOWNLOAD_CONCURRENCY,
+        )
+        _validate_positive_ceiling(
+            "scan_download_pool_max_idle",
+            self.scan_download_pool_max_idle,
+            MAX_DOWNLOAD_POOL_MAX_IDLE,
+        )
+        _validate_positive_ceiling(
+            "scan_download_pool_idle_seconds",
+            self.scan_download_pool_idle_seconds,
+            MAX_DOWNLOAD_POOL_IDLE_SECONDS,
+        )
+        _validate_positive_ceiling(
+            "scan_download_dns_ttl_seconds",
+            self.scan_download_dns_ttl_seconds,
+            MAX_DNS_CACHE_TTL_SECONDS,
+        )
         _validate_positive_ceiling(
             "scan_download_max_redirects",
             self.scan_download_max_redirects,
@@ -186,6 +327,77 @@ class Settings(BaseSettings):
             self.api_requests_per_minute,
             MAX_API_REQUESTS_PER_MINUTE,
         )
+        _validate_positive_ceiling(
+            "scan_jpeg_draft_min_edge",
+            self.scan_jpeg_draft_min_edge,
+            MAX_JPEG_DRAFT_EDGE,
+        )
+        _validate_positive_ceiling(
+            "scan_hash_workers",
+            self.scan_hash_workers,
+            MAX_SCAN_HASH_WORKERS,
+        )
+        _validate_positive_ceiling(
+            "scan_pipeline_queue_depth",
+            self.scan_pipeline_queue_depth,
+            MAX_PIPELINE_QUEUE_DEPTH,
+        )
+        _validate_positive_ceiling(
+            "scan_candidate_window_seconds",
+            self.scan_candidate_window_seconds,
+            MAX_CANDIDATE_WINDOW_SECONDS,
+        )
+        _validate_positive_ceiling(
+            "scan_candidate_aspect_tolerance",
+            self.scan_candidate_aspect_tolerance,
+            MAX_CANDIDATE_ASPECT_TOLERANCE,
+        )
+        _validate_positive_ceiling(
+            "scan_candidate_max_set_items",
+            self.scan_candidate_max_set_items,
+            PICKER_MAX_ITEMS,
+        )
+        _validate_positive_ceiling(
+            "scan_candidate_max_comparisons",
+            self.scan_candidate_max_comparisons,
+            PICKER_MAX_ITEMS * (PICKER_MAX_ITEMS - 1) // 2,
+        )
+        _validate_positive_ceiling(
+            "scan_candidate_geohash_precision",
+            self.scan_candidate_geohash_precision,
+            MAX_CANDIDATE_GEOHASH_PRECISION,
+        )
+        if self.scan_candidate_geo_window_seconds is not None:
+            _validate_positive_ceiling(
+                "scan_candidate_geo_window_seconds",
+                self.scan_candidate_geo_window_seconds,
+                MAX_CANDIDATE_WINDOW_SECONDS,
+            )
+        _validate_positive_ceiling(
+            "scan_candidate_exposure_stops",
+            self.scan_candidate_exposure_stops,
+            MAX_CANDIDATE_EXPOSURE_STOPS,
+        )
+        _validate_positive_ceiling(
+            "scan_global_lsh_bands",
+            self.scan_global_lsh_bands,
+            MAX_GLOBAL_LSH_BANDS,
+        )
+        _validate_positive_ceiling(
+            "scan_job_result_ttl_seconds",
+            self.scan_job_result_ttl_seconds,
+            MAX_SCAN_JOB_RESULT_TTL_SECONDS,
+        )
+        _validate_positive_ceiling("scan_job_shards", self.scan_job_shards, MAX_SCAN_SHARDS)
+        _validate_positive_ceiling(
+            "scan_progress_interval_seconds",
+            self.scan_progress_interval_seconds,
+            MAX_SCAN_PROGRESS_INTERVAL_SECONDS,
+        )
+        if self.scan_jpeg_draft_min_edge < MIN_JPEG_DRAFT_EDGE:
+            raise ValueError(
+                "scan_jpeg_draft_min_edge must be at least the perceptual hash resolution"
+            )
 
         if self.environment != RuntimeEnvironment.PRODUCTION:
             return self
@@ -7,7 +7,7 @@ import re
 import threading
 import time
 from collections import deque
-from collections.abc import Iterator, Mapping, Sequence
+from collections.abc import Callable, Iterator, Mapping, Sequence
 from contextlib import contextmanager
 from dataclasses import dataclass
 from typing import Any, Protocol
@@ -73,6 +73,17 @@ class ScanAdmissionController:
 
     @contextmanager
     def lease(self) -> Iterator[None]:
+        release = self.acquire()
+        try:
+            yield
+        finally:
+            release()
+
+    def acquire(self) -> Callable[[], None]:
+        """Admit one scan and return the callable that frees its slot; extra calls are no-ops.
+
+        For scans that outlive the request admitting them, such as queued scan jobs.
+        """
         retry_after = self._rate_limiter.admit()
         if retry_after is not None:
             raise AdmissionError(
@@ -90,11 +101,16 @@ class ScanAdmissionController:
                     retry_after=1,
                 )
             self._active += 1
-        try:
-            yield
-        finally:
+        released = False
+
+        def release() -> None:
+            nonlocal released
             with self._lock:
-                self._active -= 1
+                if not released:
+                    released = True
+                    self._active -= 1
+
+        return release
 
 
 class CorrelationIdMiddleware:
@@ -1,15 +1,37 @@
 from __future__ import annotations
 
-from collections import Counter, defaultdict
-from collections.abc import Sequence
+import math
+from collections import Counter, defaultdict, deque
+from collections.abc import Callable, Hashable, Mapping, Sequence
 from dataclasses import dataclass
 
-from app.engine.models import PhotoItem
+from app.engine.grouping import DisjointSet
+from app.engine.hamming_index import pairs_within
+from app.engine.models import GPSLocation, PhotoItem
 
+# Coarse-hash bits two near-duplicates may differ by and still be compared in full.
+COARSE_HASH_RADIUS = 3
 
-def build_candidate_sets(items: Sequence[PhotoItem]) -> list[list[PhotoItem]]:
-    candidate_sets, _ = build_candidate_sets_with_debug(items)
-    return candidate_sets
+
+GeoCell = tuple[int, int]
+# Camera model and ISO-normalised exposure value, either possibly unknown.
+_Capture = tuple[str | None, float | None]
+# Capture time, log aspect ratio, geohash cell and capture data of a swept item.
+_WindowEntry = tuple[float, float | None, GeoCell | None, _Capture, PhotoItem]
+
+
+def build_candidate_sets(
+    items: Sequence[PhotoItem],
+    *,
+    geohash_precision: int | None = None,
+    exposure_stops: float | None = None,
+) -> tuple[list[list[PhotoItem]], list[tuple[PhotoItem, PhotoItem]]]:
+    candidate_sets, candidate_pairs, _ = build_candidate_sets_with_debug(
+        items,
+        geohash_precision=geohash_precision,
+        exposure_stops=exposure_stops,
+    )
+    return candidate_sets, candidate_pairs
 
 
 @dataclass(frozen=True)
@@ -18,11 +40,84 @@ class CandidateDebug:
     missing_dims_ids: list[str]
     time_bucket_mismatch_ids: list[str]
     mime_mismatch_ids: list[str]
+    window_seconds: float | None = None
+    window_pairs: int = 0
+    window_peak_items: int = 0
+    window_aspect_rejections: int = 0
+    geo_cells: int = 0
+    geo_rejections: int = 0
+    geo_extended_pairs: int = 0
+    camera_rejections: int = 0
+
+
+@dataclass(frozen=True)
+class GeohashGrid:
+    """Geohash cells of ``precision`` characters as ``(row, column)`` indices.
+
+    A geohash interleaves ``5 * precision`` bits, longitude first, so each cell is fixed by
+    its leading latitude and longitude bits. Cells one row or column apart are neighbours,
+    wrapping at the antimeridian.
+    """
+
+    precision: int
+
+    @property
+    def rows(self) -> int:
+        return 1 << (5 * self.precision // 2)
+
+    @property
+    def columns(self) -> int:
+        return 1 << ((5 * self.precision + 1) // 2)
+
+    def cell(self, location: GPSLocation | None) -> GeoCell | None:
+        if location is None:
+            return None
+        latitude, longitude = location.latitude, location.longitude
+        if not (math.isfinite(latitude) and math.isfinite(longitude)) or abs(latitude) > 90:
+            return None
+        row = min(int((latitude + 90) / 180 * self.rows), self.rows - 1)
+        return row, int((longitude + 180) / 360 * self.columns) % self.columns
+
+    def adjacent(self, left: GeoCell, right: GeoCell) -> bool:
+        column_gap = abs(left[1] - right[1])
+        return abs(left[0] - right[0]) <= 1 and min(column_gap, self.columns - column_gap) <= 1
+
+    def neighbours(self, cell: GeoCell) -> list[GeoCell]:
+        """The cell itself and the up to eight cells around it."""
+        row, column = cell
+        return [
+            (row + row_step, (column + column_step) % self.columns)
+            for row_step in (-1, 0, 1)
+            for column_step in (-1, 0, 1)
+            if 0 <= row + row_step < self.rows
+        ]
+
+
+@dataclass(frozen=True)
+class CandidateSplit:
+    sets_split: int = 0
+    items_split: int = 0
+    items_without_coarse_hash: int = 0
+    comparisons_before: int = 0
+    pairs_kept: int = 0
 
 
 def build_candidate_sets_with_debug(
     items: Sequence[PhotoItem],
-) -> tuple[list[list[PhotoItem]], CandidateDebug]:
+    *,
+    geohash_precision: int | None = None,
+    exposure_stops: float | None = None,
+) -> tuple[list[list[PhotoItem]], list[tuple[PhotoItem, PhotoItem]], CandidateDebug]:
+    """Sets of items sharing a capture date, orientation and megapixel class.
+
+    With a ``geohash_precision``, each bucket is further split into runs of neighbouring
+    geohash cells. With ``exposure_stops``, it is split by camera model and then into runs
+    of exposure values no more than that many stops apart. Items missing the location or
+    capture data for a split form one set of their own and are paired with every item of
+    the sets it produces; with ``exposure_stops``, those pairs are kept when their camera
+    and exposure are compatible, as in window mode.
+    """
+    grid = GeohashGrid(geohash_precision) if geohash_precision else None
     buckets: dict[str, list[PhotoItem]] = defaultdict(list)
     date_counts: Counter[str] = Counter()
     mime_counts: Counter[str] = Counter()
@@ -35,15 +130,48 @@ def build_candidate_sets_with_debug(
             missing_dims_ids.append(item.id)
 
     candidate_sets: list[list[PhotoItem]] = []
+    candidate_pairs: list[tuple[PhotoItem, PhotoItem]] = []
     bucket_size_counts: Counter[int] = Counter()
+    geo_rejections = camera_rejections = 0
     for key in sorted(buckets.keys()):
         bucket_items = sorted(
             buckets[key],
             key=lambda entry: (entry.create_time, entry.id),
         )
         bucket_size_counts[len(bucket_items)] += 1
-        if len(bucket_items) >= 2:
-            candidate_sets.append(bucket_items)
+        if len(bucket_items) < 2:
+            continue
+        bucket_sets: list[list[PhotoItem]] = [bucket_items]
+        bucket_pairs: list[tuple[PhotoItem, PhotoItem]] = []
+        if grid is not None:
+            bucket_sets, bucket_pairs = _split_by_region(
+                bucket_items, _location_regions(bucket_items, grid)
+            )
+            geo_rejections += _pair_count(len(bucket_items)) - _pair_total(
+                bucket_sets, bucket_pairs
+            )
+        if exposure_stops is not None:
+            before = _pair_total(bucket_sets, bucket_pairs)
+            camera_sets: list[list[PhotoItem]] = []
+            camera_pairs = list(bucket_pairs)
+            for group in bucket_sets:
+                model_sets, model_pairs = _split_by_region(group, _camera_regions(group))
+                camera_pairs.extend(model_pairs)
+                for model_set in model_sets:
+                    exposure_sets, exposure_pairs = _split_by_region(
+                        model_set, _exposure_regions(model_set, exposure_stops)
+                    )
+                    camera_sets.extend(exposure_sets)
+                    camera_pairs.extend(exposure_pairs)
+            bucket_sets = camera_sets
+            bucket_pairs = [
+                (left, right)
+                for left, right in camera_pairs
+                if _captures_compatible(_capture(left), _capture(right), exposure_stops)
+            ]
+            camera_rejections += before - _pair_total(bucket_sets, bucket_pairs)
+        candidate_sets.extend(bucket_sets)
+        candidate_pairs.extend(bucket_pairs)
 
     time_bucket_mismatch_ids = [item.id for item in items if date_counts[_date_bucket(item)] <= 1]
     mime_mismatch_ids = [item.id for item in items if mime_counts[_mime_bucket(item)] <= 1]
@@ -52,8 +180,311 @@ def build_candidate_sets_with_debug(
         missing_dims_ids=missing_dims_ids,
         time_bucket_mismatch_ids=time_bucket_mismatch_ids,
         mime_mismatch_ids=mime_mismatch_ids,
+        geo_cells=_count_cells(items, grid),
+        geo_rejections=geo_rejections,
+        camera_rejections=camera_rejections,
+    )
+    return candidate_sets, candidate_pairs, debug
+
+
+def build_candidate_pairs(
+    items: Sequence[PhotoItem],
+    *,
+    window_seconds: float,
+    aspect_tolerance: float | None = None,
+    geohash_precision: int | None = None,
+    geo_window_seconds: float | None = None,
+    exposure_stops: float | None = None,
+) -> list[tuple[PhotoItem, PhotoItem]]:
+    pairs, _ = build_candidate_pairs_with_debug(
+        items,
+        window_seconds=window_seconds,
+        aspect_tolerance=aspect_tolerance,
+        geohash_precision=geohash_precision,
+        geo_window_seconds=geo_window_seconds,
+        exposure_stops=exposure_stops,
     )
-    return candidate_sets, debug
+    return pairs
+
+
+def build_candidate_pairs_with_debug(
+    items: Sequence[PhotoItem],
+    *,
+    window_seconds: float,
+    aspect_tolerance: float | None = None,
+    geohash_precision: int | None = None,
+    geo_window_seconds: float | None = None,
+    exposure_stops: float | None = None,
+) -> tuple[list[tuple[PhotoItem, PhotoItem]], CandidateDebug]:
+    """Pairs taken within ``window_seconds`` of each other, earlier item first.
+
+    Items are swept in capture order against the ones still inside the window, so the cost
+    is one sort plus the pairs examined, and bursts are not split at midnight. With an
+    ``aspect_tolerance``, pairs whose log aspect ratios differ by more than it are skipped;
+    items without dimensions pair with everything.
+
+    With a ``geohash_precision``, located pairs outside neighbouring geohash cells are
+    skipped; items without a location pair with everything in the window. Setting
+    ``geo_window_seconds`` as well also pairs located items in neighbouring cells up to that
+    far apart, looked up per cell so items elsewhere or without a location add no work. With
+    ``exposure_stops``, pairs from different camera models or more than that many stops of
+    exposure apart are skipped when both items report them.
+    """
+    grid = GeohashGrid(geohash_precision) if geohash_precision else None
+    geo_reach = geo_window_seconds if grid and geo_window_seconds else 0.0
+    ordered = sorted(items, key=lambda entry: (entry.create_time, entry.id))
+    window: deque[_WindowEntry] = deque()
+    same_place: dict[GeoCell, deque[_WindowEntry]] = defaultdict(deque)
+    pairs: list[tuple[PhotoItem, PhotoItem]] = []
+    paired_ids: set[str] = set()
+    mime_counts: Counter[str] = Counter()
+    peak_items = 0
+    aspect_rejections = geo_rejections = geo_extended_pairs = camera_rejections = 0
+    for item in ordered:
+        timestamp = item.create_time.timestamp()
+        aspect = _log_aspect_ratio(item.width, item.height)
+        cell = grid.cell(item.gps) if grid else None
+        capture = _capture(item)
+        while window and timestamp - window[0][0] > window_seconds:
+            window.popleft()
+        earlier_entries: list[tuple[_WindowEntry, bool]] = []
+        if geo_reach > window_seconds and cell is not None and grid is not None:
+            extended: list[_WindowEntry] = []
+            for neighbour in grid.neighbours(cell):
+                located = same_place.get(neighbour)
+                while located and timestamp - located[0][0] > geo_reach:
+                    located.popleft()
+                extended.extend(
+                    recent for recent in located or () if timestamp - recent[0] > window_seconds
+                )
+            extended.sort(key=lambda recent: (recent[0], recent[4].id))
+            earlier_entries.extend((recent, True) for recent in extended)
+        for recent in window:
+            recent_cell = recent[2]
+            if grid is not None and cell is not None and recent_cell is not None:
+                if not grid.adjacent(cell, recent_cell):
+                    geo_rejections += 1
+                    continue
+            paired_ids.update((recent[4].id, item.id))
+            earlier_entries.append((recent, False))
+        for (_, earlier_aspect, _, earlier_capture, earlier), extends in earlier_entries:
+            if exposure_stops is not None and not _captures_compatible(
+                capture, earlier_capture, exposure_stops
+            ):
+                camera_rejections += 1
+                continue
+            if (
+                aspect_tolerance is not None
+                and aspect is not None
+                and earlier_aspect is not None
+                and abs(aspect - earlier_aspect) > aspect_tolerance
+            ):
+                aspect_rejections += 1
+                continue
+            pairs.append((earlier, item))
+            geo_extended_pairs += extends
+        entry = (timestamp, aspect, cell, capture, item)
+        window.append(entry)
+        if geo_reach > window_seconds and cell is not None:
+            same_place[cell].append(entry)
+        peak_items = max(peak_items, len(window))
+        mime_counts[_mime_bucket(item)] += 1
+
+    debug = CandidateDebug(
+        bucket_size_counts={},
+        missing_dims_ids=[item.id for item in items if not item.width or not item.height],
+        time_bucket_mismatch_ids=[item.id for item in items if item.id not in paired_ids],
+        mime_mismatch_ids=[item.id for item in items if mime_counts[_mime_bucket(item)] <= 1],
+        window_seconds=window_seconds,
+        window_pairs=len(pairs),
+        window_peak_items=peak_items,
+        window_aspect_rejections=aspect_rejections,
+        geo_cells=_count_cells(items, grid),
+        geo_rejections=geo_rejections,
+        geo_extended_pairs=geo_extended_pairs,
+        camera_rejections=camera_rejections,
+    )
+    return pairs, debug
+
+
+def split_oversized_sets(
+    candidate_sets: Sequence[list[PhotoItem]],
+    coarse_hash: Callable[[PhotoItem], int | None],
+    *,
+    max_items: int,
+    max_comparisons: int,
+    radius: int = COARSE_HASH_RADIUS,
+) -> tuple[list[list[PhotoItem]], list[tuple[PhotoItem, PhotoItem]], CandidateSplit]:
+    """Replace oversized sets with the pairs whose coarse hashes are within ``radius``.
+
+    Coarse hashes miss some real near-duplicates, so a set above ``max_items`` is still
+    compared in full while the comparisons of every set stay within ``max_comparisons``;
+    only the largest sets that would exceed it are split. Items without a coarse hash pair
+    with every other item of their set, so splitting never drops a pair it cannot rule out.
+    """
+    budget = max_comparisons - sum(
+        _pair_count(len(group)) for group in candidate_sets if len(group) <= max_items
+    )
+    oversized = sorted(
+        (index for index, group in enumerate(candidate_sets) if len(group) > max_items),
+        key=lambda index: len(candidate_sets[index]),
+    )
+    whole: set[int] = set()
+    for index in oversized:
+        if _pair_count(len(candidate_sets[index])) > budget:
+            break
+        budget -= _pair_count(len(candidate_sets[index]))
+        whole.add(index)
+    kept: list[list[PhotoItem]] = []
+    pairs: list[tuple[PhotoItem, PhotoItem]] = []
+    sets_split = items_split = unhashed_count = comparisons_before = 0
+    for index, group in enumerate(candidate_sets):
+        if len(group) <= max_items or index in whole:
+            kept.append(group)
+            continue
+        hashed: list[PhotoItem] = []
+        values: list[int] = []
+        unhashed: list[PhotoItem] = []
+        for item in group:
+            value = coarse_hash(item)
+            if value is None:
+                unhashed.append(item)
+            else:
+                hashed.append(item)
+                values.append(value)
+        for block in pairs_within([values], [radius]):
+            pairs.extend(
+                (hashed[left], hashed[right])
+                for left, right in zip(block.left.tolist(), block.right.tolist(), strict=True)
+            )
+        for index, item in enumerate(unhashed):
+            pairs.extend((item, other) for other in [*hashed, *unhashed[index + 1 :]])
+        sets_split += 1
+        items_split += len(group)
+        unhashed_count += len(unhashed)
+        comparisons_before += len(group) * (len(group) - 1) // 2
+    split = CandidateSplit(
+        sets_split=sets_split,
+        items_split=items_split,
+        items_without_coarse_hash=unhashed_count,
+        comparisons_before=comparisons_before,
+        pairs_kept=len(pairs),
+    )
+    return kept, pairs, split
+
+
+def _split_by_region(
+    items: list[PhotoItem], region_of: Mapping[str, Hashable]
+) -> tuple[list[list[PhotoItem]], list[tuple[PhotoItem, PhotoItem]]]:
+    """Items per region in first-appearance order, then the items without a region.
+
+    An item without a region may match any region, so it is paired with every item that has
+    one, earlier item first, instead of joining every region and being compared with the
+    other such items once per region.
+    """
+    roots = list(dict.fromkeys(region_of[item.id] for item in items if item.id in region_of))
+    if len(roots) <= 1:
+        return [items], []
+    regions = [
+        [item for item in items if item.id in region_of and region_of[item.id] == root]
+        for root in roots
+    ]
+    placed = [position for position, item in enumerate(items) if item.id in region_of]
+    unplaced = [position for position, item in enumerate(items) if item.id not in region_of]
+    sets = [group for group in [*regions, [items[index] for index in unplaced]] if len(group) >= 2]
+    pairs = [
+        (items[left], items[right])
+        for left, right in sorted(
+            (min(outside, inside), max(outside, inside))
+            for outside in unplaced
+            for inside in placed
+        )
+    ]
+    return sets, pairs
+
+
+def _location_regions(items: list[PhotoItem], grid: GeohashGrid) -> dict[str, int]:
+    """Runs of neighbouring geohash cells, so a region boundary never splits a cell pair."""
+    cells = {item.id: cell for item in items if (cell := grid.cell(item.gps)) is not None}
+    index = {cell: position for position, cell in enumerate(sorted(set(cells.values())))}
+    regions = DisjointSet(len(index))
+    for cell, position in index.items():
+        for neighbour in grid.neighbours(cell):
+            if neighbour in index:
+                regions.union(position, index[neighbour])
+    return {item_id: regions.find(index[cell]) for item_id, cell in cells.items()}
+
+
+def _camera_regions(items: list[PhotoItem]) -> dict[str, str]:
+    return {item.id: identity for item in items if (identity := _camera_identity(item))}
+
+
+def _exposure_regions(items: list[PhotoItem], stops: float) -> dict[str, int]:
+    """Runs of exposure values with no gap wider than ``stops``."""
+    values = sorted(
+        (value, item.id) for item in items if (value := _exposure_value(item)) is not None
+    )
+    regions: dict[str, int] = {}
+    region = 0
+    for position, (value, item_id) in enumerate(values):
+        if position and value - values[position - 1][0] > stops:
+            region += 1
+        regions[item_id] = region
+    return regions
+
+
+def _capture(item: PhotoItem) -> _Capture:
+    return _camera_identity(item), _exposure_value(item)
+
+
+def _camera_identity(item: PhotoItem) -> str | None:
+    """Normalised camera model; the make is left out since some exports drop it."""
+    capture = item.capture
+    if capture is None or not capture.camera_model or not capture.camera_model.strip():
+        return None
+    return " ".join(capture.camera_model.split()).casefold()
+
+
+def _exposure_value(item: PhotoItem) -> float | None:
+    """Exposure value normalised to ISO 100, in stops; brighter scenes score higher."""
+    capture = item.capture
+    if (
+        capture is None
+        or capture.aperture_f_number is None
+        or capture.exposure_seconds is None
+        or capture.iso_equivalent is None
+    ):
+        return None
+    return math.log2(capture.aperture_f_number**2 / capture.exposure_seconds) - math.log2(
+        capture.iso_equivalent / 100
+    )
+
+
+def _captures_compatible(left: _Capture, right: _Capture, stops: float) -> bool:
+    (left_identity, left_exposure), (right_identity, right_exposure) = left, right
+    if left_identity is not None and right_identity is not None and left_identity != right_identity:
+        return False
+    return (
+        left_exposure is None
+        or right_exposure is None
+        or abs(left_exposure - right_exposure) <= stops
+    )
+
+
+def _pair_total(
+    sets: Sequence[list[PhotoItem]], pairs: Sequence[tuple[PhotoItem, PhotoItem]] = ()
+) -> int:
+    return sum(_pair_count(len(group)) for group in sets) + len(pairs)
+
+
+def _count_cells(items: Sequence[PhotoItem], grid: GeohashGrid | None) -> int:
+    if grid is None:
+        return 0
+    return len({cell for cell in (grid.cell(item.gps) for item in items) if cell is not None})
+
+
+def _pair_count(size: int) -> int:
+    return size * (size - 1) // 2
 
 
 def _bucket_key(item: PhotoItem) -> str:
@@ -82,6 +513,12 @@ def _aspect_ratio_class(width: int | None, height: int | None) -> str:
     return "square"
 
 
+def _log_aspect_ratio(width: int | None, height: int | None) -> float | None:
+    if not width or not height:
+        return None
+    return math.log(width / height)
+
+
 def _resolution_bucket(width: int | None, height: int | None) -> str:
     if not width or not height:
         return "unknown"
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import hashlib
 import http.client
 import ipaddress
 import os
@@ -8,13 +9,21 @@ import socket
 import ssl
 import threading
 import time
-from collections.abc import Callable, Mapping
+from collections import OrderedDict
+from collections.abc import Callable, Mapping, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, replace
-from queue import Empty, Queue
-from typing import Protocol
+from functools import lru_cache
+from typing import NamedTuple, Protocol
 from urllib.parse import SplitResult, urljoin, urlsplit, urlunsplit
 
 from app.core.config import (
+    DEFAULT_DNS_CACHE_TTL_SECONDS,
+    DEFAULT_DOWNLOAD_CACHE_BYTES,
+    DEFAULT_DOWNLOAD_CONCURRENCY,
+    DEFAULT_DOWNLOAD_PER_HOST_CONCURRENCY,
+    DEFAULT_DOWNLOAD_POOL_IDLE_SECONDS,
+    DEFAULT_DOWNLOAD_POOL_MAX_IDLE,
     MAX_DOWNLOAD_BYTES_PER_ITEM,
     MAX_DOWNLOAD_BYTES_PER_SCAN,
     MAX_DOWNLOAD_REDIRECTS,
@@ -37,6 +46,8 @@ SENSITIVE_REQUEST_HEADERS = {
 }
 CHUNK_SIZE = 64 * 1024
 MAX_URL_LENGTH = 4096
+RESOLVER_WORKERS = 4
+MAX_TLS_SESSIONS = 256
 
 
 class DownloadSecurityError(ValueError):
@@ -53,6 +64,17 @@ class DownloadSecurityError(ValueError):
         self.fatal_to_scan = fatal_to_scan
 
 
+class DownloadedPayload(NamedTuple):
+    """Response body plus the SHA-256 computed while it streamed in.
+
+    ``data`` is ``None`` when the caller only needed the digest and the body was discarded.
+    """
+
+    data: bytes | None
+    sha256: str
+    size: int
+
+
 @dataclass(frozen=True)
 class AuthorizedTarget:
     url: str
@@ -97,27 +119,23 @@ class Connector(Protocol):
 
 
 class SocketResolver:
+    """``getaddrinfo`` on a small shared pool, so callers never wait past their deadline.
+
+    A caller that times out abandons its lookup rather than waiting on it. Callers for a host
+    whose lookup is still running wait on that lookup instead of starting another, so a host
+    whose lookups hang holds at most one pool thread until the system resolver gives up.
+    """
+
     def resolve(
         self,
         hostname: str,
         port: int,
         timeout_seconds: float = MAX_DOWNLOAD_TIMEOUT_SECONDS,
     ) -> frozenset[IPAddress]:
-        outcomes: Queue[object] = Queue(maxsize=1)
-
-        def lookup() -> None:
-            try:
-                outcomes.put(
-                    socket.getaddrinfo(hostname, port, type=socket.SOCK_STREAM),
-                    block=False,
-                )
-            except Exception as exc:
-                outcomes.put(exc, block=False)
-
-        threading.Thread(target=lookup, daemon=True).start()
+        lookup = _shared_lookups().submit(hostname, port)
         try:
-            outcome = outcomes.get(timeout=max(0.0, timeout_seconds))
-        except Empty as exc:
+            outcome = lookup.result(timeout=max(0.0, timeout_seconds))
+        except TimeoutError as exc:
             raise DownloadSecurityError(
                 "download_timeout",
                 "The selected photo download timed out.",
@@ -151,6 +169,98 @@ class SocketResolver:
         return frozenset(addresses)
 
 
+class _SharedLookups:
+    """Process-wide lookup pool that runs one ``getaddrinfo`` per host and port at a time."""
+
+    def __init__(self, workers: int) -> None:
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="download-dns")
+        self._lock = threading.Lock()
+        self._running: dict[tuple[str, int], Future[object]] = {}
+
+    def submit(self, hostname: str, port: int) -> Future[object]:
+        key = (hostname, port)
+        with self._lock:
+            lookup = self._running.get(key)
+            if lookup is not None:
+                return lookup
+            lookup = self._running[key] = self._executor.submit(
+                _getaddrinfo_outcome, hostname, port
+            )
+        # Outside the lock, since a lookup that is already done runs the callback right here.
+        lookup.add_done_callback(lambda done: self._forget(key, done))
+        return lookup
+
+    def _forget(self, key: tuple[str, int], lookup: Future[object]) -> None:
+        with self._lock:
+            if self._running.get(key) is lookup:
+                del self._running[key]
+
+
+class CachingResolver:
+    """Remembers approved address sets for a bounded TTL and shares in-flight lookups.
+
+    Only successful answers are cached. Callers still run ``DownloadPolicy.validate_addresses``
+    on every result, cached or not.
+    """
+
+    def __init__(
+        self,
+        resolver: Resolver,
+        *,
+        ttl_seconds: float = DEFAULT_DNS_CACHE_TTL_SECONDS,
+        clock: Clock = time.monotonic,
+    ) -> None:
+        self._resolver = resolver
+        self._ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._answers: dict[tuple[str, int], tuple[frozenset[IPAddress], float]] = {}
+        self._in_flight: dict[tuple[str, int], Future[frozenset[IPAddress]]] = {}
+        self.lookups = 0
+        self.cache_hits = 0
+
+    def resolve(
+        self,
+        hostname: str,
+        port: int,
+        timeout_seconds: float,
+    ) -> frozenset[IPAddress]:
+        key = (hostname, port)
+        with self._lock:
+            answer = self._answers.get(key)
+            if answer is not None and self._clock() < answer[1]:
+                self.cache_hits += 1
+                return answer[0]
+            pending = self._in_flight.get(key)
+            owner = pending is None
+            if pending is None:
+                pending = self._in_flight[key] = Future()
+                self.lookups += 1
+            else:
+                self.cache_hits += 1
+        if not owner:
+            try:
+                return pending.result(timeout=max(0.0, timeout_seconds))
+            except TimeoutError as exc:
+                raise DownloadSecurityError(
+                    "download_timeout",
+                    "The selected photo download timed out.",
+                    fatal_to_scan=True,
+                ) from exc
+        try:
+            addresses = self._resolver.resolve(hostname, port, timeout_seconds)
+        except BaseException as exc:
+            with self._lock:
+                del self._in_flight[key]
+            pending.set_exception(exc)
+            raise
+        with self._lock:
+            self._answers[key] = (addresses, self._clock() + self._ttl_seconds)
+            del self._in_flight[key]
+        pending.set_result(addresses)
+        return addresses
+
+
 class _PinnedHTTPConnection(http.client.HTTPConnection):
     def __init__(
         self,
@@ -159,6 +269,7 @@ class _PinnedHTTPConnection(http.client.HTTPConnection):
         timeout_seconds: float,
         ssl_context: ssl.SSLContext,
         clock: Clock = time.monotonic,
+        tls_session: ssl.SSLSession | None = None,
     ) -> None:
         super().__init__(target.hostname, target.port, timeout=timeout_seconds)
         self._target = target
@@ -166,6 +277,12 @@ class _PinnedHTTPConnection(http.client.HTTPConnection):
         self._ssl_context = ssl_context
         self._clock = clock
         self._deadline = clock() + timeout_seconds
+        self._tls_session = tls_session
+
+    def start_attempt(self, timeout_seconds: float) -> None:
+        """Give a reused connection a fresh per-attempt deadline."""
+        self.timeout = timeout_seconds
+        self._deadline = self._clock() + timeout_seconds
 
     def connect(self) -> None:
         raw_socket = socket.create_connection(
@@ -180,6 +297,7 @@ class _PinnedHTTPConnection(http.client.HTTPConnection):
                 self.sock = self._ssl_context.wrap_socket(
                     raw_socket,
                     server_hostname=self._target.hostname,
+                    session=self._tls_session,
                 )
             except Exception:
                 raw_socket.close()
@@ -203,6 +321,8 @@ class _StandardConnectedResponse:
     connection: _PinnedHTTPConnection
     response: http.client.HTTPResponse
     peer_ip: IPAddress
+    pool: PinnedHttpConnector | None = None
+    pool_key: _PoolKey | None = None
 
     @property
     def status(self) -> int:
@@ -219,21 +339,93 @@ class _StandardConnectedResponse:
             self.connection.sock.settimeout(timeout_seconds)
 
     def close(self) -> None:
+        # Only a fully read body leaves the connection at a clean request boundary.
+        reusable = self.response.isclosed() and not self.response.will_close
         self.response.close()
-        self.connection.close()
+        if reusable and self.pool is not None and self.pool_key is not None:
+            self.pool.release(self.pool_key, self.connection)
+        else:
+            self.connection.close()
+
+
+class _PoolKey(NamedTuple):
+    scheme: str
+    hostname: str
+    port: int
+    address: IPAddress
+
+
+@dataclass
+class _IdleConnection:
+    key: _PoolKey
+    connection: _PinnedHTTPConnection
+    idle_since: float
+
+
+class TlsSessionCache:
+    """Most recent TLS session per pinned host, so repeat connections can resume.
+
+    Sessions only resume under the context that created them; share a cache only between
+    connectors that share an ``SSLContext``.
+    """
+
+    def __init__(self, max_entries: int = MAX_TLS_SESSIONS) -> None:
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._sessions: OrderedDict[_PoolKey, ssl.SSLSession] = OrderedDict()
+
+    def get(self, key: _PoolKey) -> ssl.SSLSession | None:
+        with self._lock:
+            return self._sessions.get(key)
+
+    def put(self, key: _PoolKey, session: ssl.SSLSession) -> None:
+        with self._lock:
+            self._sessions[key] = session
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self._max_entries:
+                self._sessions.popitem(last=False)
 
 
 class PinnedHttpConnector:
+    """Opens pinned connections and keeps finished ones alive for the same host and address.
+
+    A pooled connection is reused only for the (host, port, pinned address) it was opened
+    for, and its peer is checked against the approved address set again on every checkout.
+    """
+
     def __init__(
         self,
         *,
         headers: Mapping[str, str] | None = None,
         ssl_context: ssl.SSLContext | None = None,
         clock: Clock = time.monotonic,
+        max_idle_connections: int = DEFAULT_DOWNLOAD_POOL_MAX_IDLE,
+        idle_timeout_seconds: float = DEFAULT_DOWNLOAD_POOL_IDLE_SECONDS,
+        tls_sessions: TlsSessionCache | None = None,
     ) -> None:
         self._headers = _sanitize_headers(headers or {})
-        self._ssl_context = ssl_context or _create_isolated_ssl_context()
+        # The default context and its session cache are built once and shared by every scan.
+        if ssl_context is None:
+            self._ssl_context = _shared_ssl_context()
+            self._tls_sessions = tls_sessions or _shared_tls_sessions()
+        else:
+            self._ssl_context = ssl_context
+            self._tls_sessions = tls_sessions or TlsSessionCache()
         self._clock = clock
+        self._max_idle_connections = max_idle_connections
+        self._idle_timeout_seconds = idle_timeout_seconds
+        self._lock = threading.Lock()
+        self._idle: list[_IdleConnection] = []
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self.tls_handshakes_full = 0
+        self.tls_handshakes_resumed = 0
+
+    @property
+    def reuse_ratio(self) -> float:
+        with self._lock:
+            total = self.connections_opened + self.connections_reused
+            return self.connections_reused / total if total else 0.0
 
     def open(
         self,
@@ -251,15 +443,73 @@ class PinnedHttpConnector:
             key=lambda address: (address.version, address),
         )
         selected_address = ordered_addresses[0]
+        key = _PoolKey(target.scheme, target.hostname, target.port, selected_address)
+        pooled = self._checkout(key)
+        if pooled is not None:
+            pooled.start_attempt(timeout_seconds)
+            try:
+                return self._exchange(pooled, target, key, approved_addresses, reused=True)
+            except DownloadSecurityError as exc:
+                if not isinstance(exc.__cause__, ConnectionError):
+                    raise
+                # The server dropped the idle connection; replay the GET on a fresh one.
         connection = _PinnedHTTPConnection(
             target,
             selected_address,
             timeout_seconds,
             self._ssl_context,
             self._clock,
+            self._tls_sessions.get(key) if target.scheme == "https" else None,
         )
+        return self._exchange(connection, target, key, approved_addresses, reused=False)
+
+    def release(self, key: _PoolKey, connection: _PinnedHTTPConnection) -> None:
+        with self._lock:
+            self._idle.append(_IdleConnection(key, connection, self._clock()))
+            overflow = self._idle[: max(0, len(self._idle) - self._max_idle_connections)]
+            del self._idle[: len(overflow)]
+        for entry in overflow:
+            entry.connection.close()
+
+    def close_idle(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            entry.connection.close()
+
+    def _checkout(self, key: _PoolKey) -> _PinnedHTTPConnection | None:
+        now = self._clock()
+        with self._lock:
+            expired: list[_IdleConnection] = []
+            fresh: list[_IdleConnection] = []
+            for entry in self._idle:
+                is_expired = now - entry.idle_since >= self._idle_timeout_seconds
+                (expired if is_expired else fresh).append(entry)
+            selected = next((entry for entry in reversed(fresh) if entry.key == key), None)
+            self._idle = [entry for entry in fresh if entry is not selected]
+        for entry in expired:
+            entry.connection.close()
+        return selected.connection if selected is not None else None
+
+    def _exchange(
+        self,
+        connection: _PinnedHTTPConnection,
+        target: AuthorizedTarget,
+        key: _PoolKey,
+        approved_addresses: frozenset[IPAddress],
+        *,
+        reused: bool,
+    ) -> ConnectedResponse:
         try:
-            connection.connect()
+            if not reused:
+                connection.connect()
+                resumed = getattr(connection.sock, "session_reused", None)
+                with self._lock:
+                    self.connections_opened += 1
+                    if resumed is True:
+                        self.tls_handshakes_resumed += 1
+                    elif resumed is False:
+                        self.tls_handshakes_full += 1
             connection.apply_remaining_timeout()
             if connection.sock is None:
                 raise OSError("connection did not provide a socket")
@@ -269,14 +519,18 @@ class PinnedHttpConnector:
                     "download_address",
                     "The selected photo could not be retrieved safely.",
                 )
-            connection.request(
-                "GET",
-                target.request_target,
-                headers={**self._headers, "Connection": "close"},
-            )
+            connection.request("GET", target.request_target, headers=self._headers)
             connection.apply_remaining_timeout()
+            tls_socket = connection.sock
             response = connection.getresponse()
-            return _StandardConnectedResponse(connection, response, peer_ip)
+            # TLS 1.3 tickets arrive with the first read, so the session is complete only now.
+            session = getattr(tls_socket, "session", None)
+            if isinstance(session, ssl.SSLSession):
+                self._tls_sessions.put(key, session)
+            if reused:
+                with self._lock:
+                    self.connections_reused += 1
+            return _StandardConnectedResponse(connection, response, peer_ip, self, key)
         except DownloadSecurityError:
             connection.close()
             raise
@@ -306,6 +560,7 @@ class ScanDownloadBudget:
         self._max_bytes = max_bytes
         self._clock = clock
         self._deadline = clock() + wall_seconds
+        self._lock = threading.Lock()
         self.bytes_charged = 0
 
     def check_deadline(self) -> None:
@@ -323,16 +578,19 @@ class ScanDownloadBudget:
 
     def charge(self, count: int) -> None:
         self.check_deadline()
-        if count < 0 or self.bytes_charged + count > self._max_bytes:
-            raise DownloadSecurityError(
-                "download_size",
-                "The scan exceeded its download size limit.",
-                fatal_to_scan=True,
-            )
-        self.bytes_charged += count
+        # Check and add under one lock so concurrent downloads can never overshoot the budget.
+        with self._lock:
+            if count < 0 or self.bytes_charged + count > self._max_bytes:
+                raise DownloadSecurityError(
+                    "download_size",
+                    "The scan exceeded its download size limit.",
+                    fatal_to_scan=True,
+                )
+            self.bytes_charged += count
 
     def remaining_bytes(self) -> int:
-        return self._max_bytes - self.bytes_charged
+        with self._lock:
+            return self._max_bytes - self.bytes_charged
 
     def ensure_can_accept(self, count: int) -> None:
         if count < 0 or count > self.remaining_bytes():
@@ -347,6 +605,7 @@ class ItemDownloadBudget:
     def __init__(self, max_bytes: int, scan_budget: ScanDownloadBudget) -> None:
         self._max_bytes = max_bytes
         self._scan_budget = scan_budget
+        self._lock = threading.Lock()
         self.bytes_charged = 0
 
     def check_deadline(self) -> None:
@@ -356,17 +615,19 @@ class ItemDownloadBudget:
         return self._scan_budget.remaining_seconds()
 
     def charge(self, count: int) -> None:
-        if count < 0 or self.bytes_charged + count > self._max_bytes:
-            raise DownloadSecurityError(
-                "download_size",
-                "The selected photo exceeded the download size limit.",
-                fatal_to_scan=True,
-            )
-        self._scan_budget.charge(count)
-        self.bytes_charged += count
+        with self._lock:
+            if count < 0 or self.bytes_charged + count > self._max_bytes:
+                raise DownloadSecurityError(
+                    "download_size",
+                    "The selected photo exceeded the download size limit.",
+                    fatal_to_scan=True,
+                )
+            self._scan_budget.charge(count)
+            self.bytes_charged += count
 
     def can_accept(self, count: int) -> bool:
-        return count >= 0 and self.bytes_charged + count <= self._max_bytes
+        with self._lock:
+            return count >= 0 and self.bytes_charged + count <= self._max_bytes
 
     def ensure_can_accept(self, count: int) -> None:
         if not self.can_accept(count):
@@ -378,10 +639,45 @@ class ItemDownloadBudget:
         self._scan_budget.ensure_can_accept(count)
 
     def remaining_bytes(self) -> int:
-        return min(
-            self._max_bytes - self.bytes_charged,
-            self._scan_budget.remaining_bytes(),
-        )
+        with self._lock:
+            item_remaining = self._max_bytes - self.bytes_charged
+        return min(item_remaining, self._scan_budget.remaining_bytes())
+
+
+class ByteCache:
+    """Least-recently-used image bytes, bounded by total size rather than item count."""
+
+    def __init__(self, max_bytes: int = DEFAULT_DOWNLOAD_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self.bytes_held = 0
+        self.peak_bytes_held = 0
+        self.eviction_count = 0
+
+    def get(self, key: str) -> bytes | None:
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        self.release(key)
+        self._entries[key] = data
+        self.bytes_held += len(data)
+        # The newest entry always stays: its caller is about to use it.
+        while self.bytes_held > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes_held -= len(evicted)
+            self.eviction_count += 1
+        self.peak_bytes_held = max(self.peak_bytes_held, self.bytes_held)
+
+    def release(self, key: str) -> None:
+        data = self._entries.pop(key, None)
+        if data is not None:
+            self.bytes_held -= len(data)
+
+    def has_room_for(self, count: int) -> bool:
+        return self.bytes_held + count <= self.max_bytes
 
 
 class DownloadPolicy:
@@ -433,6 +729,13 @@ class DownloadPolicy:
             )
 
 
+@dataclass
+class _CacheReservation:
+    """Byte-cache room held by one in-flight download until its bytes are stored."""
+
+    size: int
+
+
 class DownloadManager:
     def __init__(
         self,
@@ -448,8 +751,23 @@ class DownloadManager:
         scan_budget: ScanDownloadBudget | None = None,
         max_item_bytes: int = MAX_DOWNLOAD_BYTES_PER_ITEM,
         max_redirects: int = MAX_DOWNLOAD_REDIRECTS,
+        cache_max_bytes: int = DEFAULT_DOWNLOAD_CACHE_BYTES,
+        max_concurrency: int = DEFAULT_DOWNLOAD_CONCURRENCY,
+        max_per_host_concurrency: int = DEFAULT_DOWNLOAD_PER_HOST_CONCURRENCY,
+        pool_max_idle: int = DEFAULT_DOWNLOAD_POOL_MAX_IDLE,
+        pool_idle_seconds: float = DEFAULT_DOWNLOAD_POOL_IDLE_SECONDS,
+        dns_ttl_seconds: float = DEFAULT_DNS_CACHE_TTL_SECONDS,
     ) -> None:
-        self._cache: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._room = threading.Condition(self._lock)
+        self._cache = ByteCache(cache_max_bytes)
+        self._reserved_bytes = 0
+        self._in_flight = 0
+        self._pool: ThreadPoolExecutor | None = None
+        self._digests: dict[str, str] = {}
+        self._max_concurrency = max_concurrency
+        self._max_per_host_concurrency = max_per_host_concurrency
+        self._host_slots: dict[str, threading.BoundedSemaphore] = {}
         self._fetcher = fetcher
         self._timeout_seconds = timeout_seconds
         self._policy = DownloadPolicy(
@@ -457,22 +775,259 @@ class DownloadManager:
             host_overrides=host_overrides,
             allow_override_exceptions=allow_override_exceptions,
         )
-        self._resolver = resolver or SocketResolver()
-        self._connector = connector or PinnedHttpConnector(headers=headers)
+        self._resolver = CachingResolver(resolver or SocketResolver(), ttl_seconds=dns_ttl_seconds)
+        self._connector = connector or PinnedHttpConnector(
+            headers=headers,
+            max_idle_connections=pool_max_idle,
+            idle_timeout_seconds=pool_idle_seconds,
+        )
         self._scan_budget = scan_budget or ScanDownloadBudget()
         self._max_item_bytes = max_item_bytes
         self._max_redirects = max_redirects
         self.download_count = 0
+        self.bytes_downloaded = 0
+
+    @property
+    def peak_bytes_held(self) -> int:
+        return self._cache.peak_bytes_held
+
+    @property
+    def cache_eviction_count(self) -> int:
+        return self._cache.eviction_count
+
+    @property
+    def connections_opened(self) -> int:
+        connector = self._connector
+        return connector.connections_opened if isinstance(connector, PinnedHttpConnector) else 0
+
+    @property
+    def connections_reused(self) -> int:
+        connector = self._connector
+        return connector.connections_reused if isinstance(connector, PinnedHttpConnector) else 0
+
+    @property
+    def tls_handshakes_full(self) -> int:
+        connector = self._connector
+        return connector.tls_handshakes_full if isinstance(connector, PinnedHttpConnector) else 0
+
+    @property
+    def tls_handshakes_resumed(self) -> int:
+        connector = self._connector
+        return connector.tls_handshakes_resumed if isinstance(connector, PinnedHttpConnector) else 0
+
+    @property
+    def dns_lookups(self) -> int:
+        return self._resolver.lookups
+
+    @property
+    def dns_cache_hits(self) -> int:
+        return self._resolver.cache_hits
+
+    def close_idle_connections(self) -> None:
+        """Close idle sockets and stop the download threads; later fetches start new ones."""
+        if isinstance(self._connector, PinnedHttpConnector):
+            self._connector.close_idle()
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
 
     def get_bytes(self, item: PhotoItem) -> bytes:
-        if item.id in self._cache:
-            return self._cache[item.id]
-        data = self._fetcher(item) if self._fetcher else self._download(item)
-        self._cache[item.id] = data
-        self.download_count += 1
-        return data
+        with self._lock:
+            cached = self._cache.get(item.id)
+        if cached is not None:
+            return cached
+        return self._fetch(item, buffer=True).data or b""
+
+    def get_sha256(self, item: PhotoItem) -> str:
+        """Digest of the item's bytes; streams and discards them if they were never fetched."""
+        with self._lock:
+            digest = self._digests.get(item.id)
+        return digest if digest is not None else self._fetch(item, buffer=False).sha256
+
+    def fetch_many(
+        self, items: Sequence[PhotoItem], *, buffer: bool = True
+    ) -> dict[str, Exception]:
+        """Fetch items concurrently within the global and per-host limits.
+
+        Each item goes through ``get_bytes`` (or ``get_sha256`` without ``buffer``). Failures are
+        returned by item id so callers can classify them in their own order. Once a failure is
+        fatal to the scan no further downloads start; items skipped that way report that error.
+        """
+        pending: dict[str, PhotoItem] = {}
+        with self._lock:
+            for item in items:
+                fetched = self._cache.get(item.id) if buffer else self._digests.get(item.id)
+                if fetched is None:
+                    pending.setdefault(item.id, item)
+        fetch_one: Callable[[PhotoItem], object] = self.get_bytes if buffer else self.get_sha256
+        failures: dict[str, Exception] = {}
+        fatal: list[DownloadSecurityError] = []
+
+        def run(item: PhotoItem) -> None:
+            if fatal:
+                failures[item.id] = fatal[0]
+                return
+            self._attempt_fetch(item, fetch_one, failures, fatal)
+
+        if len(pending) <= 1 or self._max_concurrency <= 1:
+            for item in pending.values():
+                run(item)
+        else:
+            list(self._executor().map(run, pending.values()))
+        return failures
+
+    def fetch_while_room(self, items: Sequence[PhotoItem]) -> tuple[int, dict[str, Exception]]:
+        """Buffer leading items concurrently for as long as the byte cache has room for them.
+
+        A download reserves a maximum-size item until its response declares a Content-Length,
+        and then only that length, so further downloads start as soon as headers arrive
+        instead of per maximum-size item. The first item always starts; later ones stop once
+        nothing is in flight and held bytes leave no room. Returns how many leading items
+        were taken together with their failures by item id, as ``fetch_many`` reports them.
+        """
+        failures: dict[str, Exception] = {}
+        fatal: list[DownloadSecurityError] = []
+        futures: list[Future[None]] = []
+        started: set[str] = set()
+        taken = 0
+
+        def run(item: PhotoItem, reservation: _CacheReservation) -> None:
+            try:
+                self._attempt_fetch(
+                    item,
+                    lambda entry: self._fetch(entry, buffer=True, reservation=reservation),
+                    failures,
+                    fatal,
+                )
+            finally:
+                with self._room:
+                    self._reserved_bytes -= reservation.size
+                    self._in_flight -= 1
+                    self._room.notify_all()
+
+        for item in items:
+            with self._room:
+                if item.id in started or self._cache.get(item.id) is not None:
+                    taken += 1
+                    continue
+                self._room.wait_for(
+                    lambda: bool(fatal)
+                    or self._in_flight == 0
+                    or (self._in_flight < self._max_concurrency and self._has_download_room())
+                )
+                if fatal:
+                    break
+                if taken and not self._has_download_room():
+                    break
+                reservation = _CacheReservation(self._max_item_bytes)
+                self._reserved_bytes += reservation.size
+                self._in_flight += 1
+            started.add(item.id)
+            taken += 1
+            if self._max_concurrency <= 1:
+                run(item, reservation)
+            else:
+                futures.append(self._executor().submit(run, item, reservation))
+        for future in futures:
+            future.result()
+        if fatal:
+            for item in items[taken:]:
+                failures.setdefault(item.id, fatal[0])
+            taken = len(items)
+        return taken, failures
+
+    def has_download_room(self) -> bool:
+        """Whether a maximum-size download fits the byte cache without evicting held bytes."""
+        with self._lock:
+            return self._has_download_room()
+
+    def _has_download_room(self) -> bool:
+        used = self._cache.bytes_held + self._reserved_bytes
+        return used + self._max_item_bytes <= self._cache.max_bytes
+
+    def _attempt_fetch(
+        self,
+        item: PhotoItem,
+        fetch_one: Callable[[PhotoItem], object],
+        failures: dict[str, Exception],
+        fatal: list[DownloadSecurityError],
+    ) -> None:
+        try:
+            fetch_one(item)
+        except Exception as exc:
+            failures[item.id] = exc
+            if isinstance(exc, DownloadSecurityError) and exc.fatal_to_scan:
+                with self._room:
+                    fatal.append(exc)
+                    self._room.notify_all()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        """Download threads shared by every batch of this manager's scan."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    self._max_concurrency, thread_name_prefix="scan-download"
+                )
+            return self._pool
+
+    def _reserve_declared(self, reservation: _CacheReservation, declared_length: int) -> None:
+        with self._room:
+            size = min(reservation.size, declared_length)
+            self._reserved_bytes -= reservation.size - size
+            reservation.size = size
+            self._room.notify_all()
 
-    def _download(self, item: PhotoItem) -> bytes:
+    def _fetch(
+        self,
+        item: PhotoItem,
+        *,
+        buffer: bool,
+        reservation: _CacheReservation | None = None,
+    ) -> DownloadedPayload:
+        with self._host_slot(item):
+            if self._fetcher is not None:
+                data = self._fetcher(item)
+                payload = DownloadedPayload(
+                    data if buffer else None, hashlib.sha256(data).hexdigest(), len(data)
+                )
+            else:
+                payload = self._download(
+                    item,
+                    buffer=buffer,
+                    on_declared_length=(
+                        None
+                        if reservation is None
+                        else lambda length: self._reserve_declared(reservation, length)
+                    ),
+                )
+        with self._lock:
+            self._digests[item.id] = payload.sha256
+            self.download_count += 1
+            self.bytes_downloaded += payload.size
+            if payload.data is not None:
+                self._cache.put(item.id, payload.data)
+        return payload
+
+    def _host_slot(self, item: PhotoItem) -> threading.BoundedSemaphore:
+        host = urlsplit(item.download_url or "").hostname or ""
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self._max_per_host_concurrency)
+            return self._host_slots[host]
+
+    def release(self, item: PhotoItem) -> None:
+        with self._room:
+            self._cache.release(item.id)
+            self._room.notify_all()
+
+    def _download(
+        self,
+        item: PhotoItem,
+        *,
+        buffer: bool = True,
+        on_declared_length: Callable[[int], None] | None = None,
+    ) -> DownloadedPayload:
         if not item.download_url:
             raise DownloadSecurityError(
                 "download_url",
@@ -536,6 +1091,8 @@ class DownloadManager:
                     response,
                     item_budget,
                     read_timeout_seconds=self._timeout_seconds,
+                    buffer=buffer,
+                    on_declared_length=on_declared_length,
                 )
             finally:
                 response.close()
@@ -568,7 +1125,9 @@ def _read_bounded_response(
     budget: ItemDownloadBudget,
     *,
     read_timeout_seconds: float,
-) -> bytes:
+    buffer: bool = True,
+    on_declared_length: Callable[[int], None] | None = None,
+) -> DownloadedPayload:
     content_encodings = response.header_values("Content-Encoding")
     if content_encodings and (
         len(content_encodings) != 1 or content_encodings[0].strip().lower() != "identity"
@@ -586,12 +1145,17 @@ def _read_bounded_response(
             declared_length = None
         if declared_length is not None and declared_length >= 0:
             budget.ensure_can_accept(declared_length)
+            if on_declared_length is not None:
+                on_declared_length(declared_length)
             if declared_length == 0:
-                return b""
+                return DownloadedPayload(b"" if buffer else None, hashlib.sha256().hexdigest(), 0)
         else:
             declared_length = None
 
+    # Hash each chunk as it arrives so the digest never needs another pass over the body.
+    digest = hashlib.sha256()
     data = bytearray()
+    received = 0
     while True:
         remaining_seconds = budget.remaining_seconds()
         response.set_timeout(min(read_timeout_seconds, remaining_seconds))
@@ -601,7 +1165,7 @@ def _read_bounded_response(
         try:
             read_size = min(CHUNK_SIZE, remaining_bytes)
             if declared_length is not None:
-                read_size = min(read_size, declared_length - len(data))
+                read_size = min(read_size, declared_length - received)
             chunk = response.read(read_size)
         except (OSError, http.client.HTTPException) as exc:
             category = "download_timeout" if isinstance(exc, TimeoutError) else "download_network"
@@ -616,14 +1180,18 @@ def _read_bounded_response(
                 fatal_to_scan=category == "download_timeout",
             ) from exc
         if not chunk:
-            return bytes(data)
+            break
         budget.ensure_can_accept(len(chunk))
         budget.charge(len(chunk))
-        data.extend(chunk)
-        if declared_length is not None and len(data) >= declared_length:
-            return bytes(data)
+        digest.update(chunk)
+        received += len(chunk)
+        if buffer:
+            data.extend(chunk)
+        if declared_length is not None and received >= declared_length:
+            break
         if budget.remaining_bytes() == 0:
             budget.ensure_can_accept(1)
+    return DownloadedPayload(bytes(data) if buffer else None, digest.hexdigest(), received)
 
 
 def _parse_target(url: str, *, allow_fixture_http: bool) -> AuthorizedTarget:
@@ -760,6 +1328,28 @@ def _sanitize_headers(headers: Mapping[str, str]) -> dict[str, str]:
     }
 
 
+@lru_cache(maxsize=1)
+def _shared_lookups() -> _SharedLookups:
+    return _SharedLookups(RESOLVER_WORKERS)
+
+
+def _getaddrinfo_outcome(hostname: str, port: int) -> object:
+    try:
+        return socket.getaddrinfo(hostname, port, type=socket.SOCK_STREAM)
+    except Exception as exc:
+        return exc
+
+
+@lru_cache(maxsize=1)
+def _shared_ssl_context() -> ssl.SSLContext:
+    return _create_isolated_ssl_context()
+
+
+@lru_cache(maxsize=1)
+def _shared_tls_sessions() -> TlsSessionCache:
+    return TlsSessionCache()
+
+
 def _create_isolated_ssl_context() -> ssl.SSLContext:
     context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
     tls_version = getattr(ssl, "TLSVersion", None)
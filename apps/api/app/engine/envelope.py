@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from typing import Any
+
+from app.engine.schemas import ScanResult
+
+
+def to_envelope(scan_result: ScanResult) -> dict[str, Any]:
+    groups: list[dict[str, Any]] = []
+    for bucket, confidence, reason, group_type in [
+        (scan_result.groups_exact, "HIGH", ["HASH_MATCH"], "EXACT"),
+        (scan_result.groups_very_similar, "MEDIUM", ["PHASH_CLOSE"], "NEAR_DUPLICATE"),
+        (scan_result.groups_possibly_similar, "LOW", ["DHASH_CLOSE"], "NEAR_DUPLICATE"),
+    ]:
+        for group in bucket:
+            group_items = []
+            for item in group.items:
+                group_items.append(
+                    {
+                        "itemId": item.id,
+                        "type": "PHOTO",
+                        "createTime": item.create_time.isoformat(),
+                        "filename": item.filename or item.id,
+                        "mimeType": item.mime_type or "image/jpeg",
+                        "dimensions": {
+                            "width": item.width or 300,
+                            "height": item.height or 300,
+                        },
+                        "thumbnail": {
+                            "baseUrl": "https://placehold.co/300x300/png?text=Photo",
+                            "suggestedSizePx": 300,
+                        },
+                        "links": {
+                            "googlePhotos": {
+                                "url": item.google_photos_deep_link,
+                            }
+                        },
+                    }
+                )
+            groups.append(
+                {
+                    "groupId": group.group_id,
+                    "groupType": group_type,
+                    "confidence": confidence,
+                    "reasonCodes": reason,
+                    "itemsCount": len(group.items),
+                    "representativeItemIds": [group.representative_pair.earliest.id],
+                    "items": group_items,
+                }
+            )
+
+    grouped_items = {item["itemId"] for group in groups for item in group["items"]}
+    failed_count = len(scan_result.failed_items)
+    accepted_count = max(0, scan_result.input_count - failed_count)
+    return {
+        "schemaVersion": "2.2.0",
+        "run": {
+            "runId": scan_result.run_id,
+            "status": "COMPLETED",
+            "startedAt": "",
+            "finishedAt": "",
+            "selection": {
+                "requestedCount": scan_result.input_count,
+                "acceptedCount": accepted_count,
+                "rejectedCount": failed_count,
+            },
+        },
+        "progress": {
+            "stage": "FINALIZE",
+            "message": "Scan completed",
+            "counts": {"processed": scan_result.input_count, "total": scan_result.input_count},
+        },
+        "telemetry": {
+            "cost": {
+                "apiCalls": 0,
+                "estimatedUnits": int(scan_result.cost_estimate.total_cost * 100000),
+                "softCapUnits": 1200,
+                "hardCapUnits": 2000,
+                "hitSoftCap": False,
+                "hitHardCap": False,
+            },
+            "timingMs": int(sum(scan_result.stage_metrics.timings_ms.values())),
+            "warnings": [],
+        },
+        "results": {
+            "summary": {
+                "groupsCount": len(groups),
+                "groupedItemsCount": len(grouped_items),
+                "ungroupedItemsCount": max(0, accepted_count - len(grouped_items)),
+            },
+            "groups": groups,
+            "skippedItems": [],
+            "failedItems": [issue.model_dump(by_alias=True) for issue in scan_result.failed_items],
+        },
+    }
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import json
+from collections.abc import Mapping
+from dataclasses import dataclass, replace
+
+from app.engine.models import PhotoItem
+
+FINGERPRINT_VERSION = 2
+# Decoder of perceptual hashes taken from a full-resolution decode; JPEG draft decodes
+# are keyed by their minimum edge, since they hash slightly differently.
+FULL_DECODE = "full"
+
+
+@dataclass(frozen=True)
+class ItemFingerprint:
+    """Hashes of one media item, valid while ``validator`` still matches the item.
+
+    Perceptual hashes are only kept for items that took part in near matching, together
+    with the ``decoder`` they were computed with.
+    """
+
+    validator: str
+    sha256: str
+    byte_length: int
+    dhash: int | None = None
+    phash: int | None = None
+    decoder: str | None = None
+
+    @property
+    def has_perceptual_hashes(self) -> bool:
+        return self.dhash is not None and self.phash is not None
+
+
+class FingerprintStore:
+    """Per-scan view of persisted fingerprints plus the records this scan produced.
+
+    Picker base URLs expire between sessions, so records are keyed by media id and
+    validated against the item's own metadata instead of anything that needs a request.
+    """
+
+    def __init__(self, known: Mapping[str, ItemFingerprint] | None = None) -> None:
+        self._known = dict(known or {})
+        self.updated: dict[str, ItemFingerprint] = {}
+
+    def lookup(self, item: PhotoItem, *, decoder: str = FULL_DECODE) -> ItemFingerprint | None:
+        """The item's record, without perceptual hashes taken by a different ``decoder``."""
+        fingerprint = self.updated.get(item.id) or self._known.get(item.id)
+        validator = content_validator(item)
+        if fingerprint is None or validator is None or fingerprint.validator != validator:
+            return None
+        if fingerprint.has_perceptual_hashes and fingerprint.decoder != decoder:
+            return replace(fingerprint, dhash=None, phash=None, decoder=None)
+        return fingerprint
+
+    def record(
+        self,
+        item: PhotoItem,
+        *,
+        sha256: str,
+        byte_length: int,
+        dhash: int | None = None,
+        phash: int | None = None,
+        decoder: str = FULL_DECODE,
+    ) -> None:
+        validator = content_validator(item)
+        if validator is None:
+            return
+        perceptual = dhash is not None and phash is not None
+        self.updated[item.id] = ItemFingerprint(
+            validator=validator,
+            sha256=sha256,
+            byte_length=byte_length,
+            dhash=dhash if perceptual else None,
+            phash=phash if perceptual else None,
+            decoder=decoder if perceptual else None,
+        )
+
+
+def content_validator(item: PhotoItem) -> str | None:
+    """Metadata that changes whenever the media bytes do; ``None`` when too sparse to trust.
+
+    Besides the type, size, capture time and name, the location and camera settings are
+    included, so edits that rewrite the photo's metadata also invalidate its record. An
+    edit that leaves all of these untouched is still served from the record.
+    """
+    if not item.mime_type or not item.width or not item.height:
+        return None
+    gps = item.gps
+    capture = item.capture
+    return "|".join(
+        [
+            item.mime_type,
+            f"{item.width}x{item.height}",
+            item.create_time.isoformat(),
+            item.filename or "",
+            f"{gps.latitude!r},{gps.longitude!r}" if gps else "",
+            (
+                ",".join(
+                    "" if value is None else repr(value)
+                    for value in (
+                        capture.camera_make,
+                        capture.camera_model,
+                        capture.focal_length,
+                        capture.aperture_f_number,
+                        capture.iso_equivalent,
+                        capture.exposure_seconds,
+                    )
+                )
+                if capture
+                else ""
+            ),
+        ]
+    )
+
+
+def dump_fingerprint(fingerprint: ItemFingerprint) -> str:
+    return json.dumps(
+        {
+            "version": FINGERPRINT_VERSION,
+            "validator": fingerprint.validator,
+            "sha256": fingerprint.sha256,
+            "byteLength": fingerprint.byte_length,
+            "dhash": _dump_hash(fingerprint.dhash),
+            "phash": _dump_hash(fingerprint.phash),
+            "decoder": fingerprint.decoder,
+        },
+        sort_keys=True,
+    )
+
+
+def load_fingerprint(value: str | None) -> ItemFingerprint | None:
+    """Parse a stored record, treating unknown versions and damaged rows as a miss."""
+    if not value:
+        return None
+    try:
+        payload = json.loads(value)
+        if payload.get("version") != FINGERPRINT_VERSION:
+            return None
+        return ItemFingerprint(
+            validator=str(payload["validator"]),
+            sha256=str(payload["sha256"]),
+            byte_length=int(payload["byteLength"]),
+            dhash=_load_hash(payload.get("dhash")),
+            phash=_load_hash(payload.get("phash")),
+            decoder=None if payload.get("decoder") is None else str(payload["decoder"]),
+        )
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+def _dump_hash(value: int | None) -> str | None:
+    return None if value is None else f"{value:016x}"
+
+
+def _load_hash(value: object) -> int | None:
+    return None if value is None else int(str(value), 16)
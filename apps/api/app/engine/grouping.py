@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 import hashlib
-from collections import defaultdict, deque
+from collections import defaultdict
+from collections.abc import Sequence
 from dataclasses import dataclass
 
 from app.engine.deeplinks import build_google_photos_deep_link
+from app.engine.hamming_index import KERNEL_MIN_ITEMS, pairs_within
 from app.engine.hashing import PerceptualHashes, hamming_distance
 from app.engine.models import PhotoItem
 from app.engine.schemas import GroupRepresentativePair, GroupResult, PhotoItemSummary
@@ -18,6 +20,38 @@ class SimilarityThresholds:
     phash_possible: int
 
 
+class DisjointSet:
+    """Union-find over nodes ``0..size-1`` with path halving and union by rank."""
+
+    def __init__(self, size: int) -> None:
+        self._parent = list(range(size))
+        self._rank = [0] * size
+
+    def find(self, node: int) -> int:
+        parent = self._parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(self, left: int, right: int) -> None:
+        left, right = self.find(left), self.find(right)
+        if left == right:
+            return
+        if self._rank[left] < self._rank[right]:
+            left, right = right, left
+        self._parent[right] = left
+        if self._rank[left] == self._rank[right]:
+            self._rank[left] += 1
+
+    def components(self, min_size: int = 2) -> list[list[int]]:
+        """Sets of at least ``min_size`` nodes, ascending within and by smallest node."""
+        members: dict[int, list[int]] = defaultdict(list)
+        for node in range(len(self._parent)):
+            members[self.find(node)].append(node)
+        return [group for group in members.values() if len(group) >= min_size]
+
+
 def group_exact_duplicates(
     items: list[PhotoItem],
     byte_hashes: dict[str, str],
@@ -42,46 +76,94 @@ def group_near_duplicates(
     candidate_sets: list[list[PhotoItem]],
     perceptual_hashes: dict[str, PerceptualHashes],
     thresholds: SimilarityThresholds,
+    *,
+    pairs: Sequence[tuple[PhotoItem, PhotoItem]] = (),
 ) -> tuple[list[GroupResult], list[GroupResult], int]:
+    """Group candidates by perceptual distance.
+
+    ``pairs`` are compared as given, alongside every pair within each candidate set.
+    Returns the VERY and POSSIBLY groups and the pairs whose distances were computed.
+    """
     comparisons = 0
-    edges_very: dict[str, set[str]] = defaultdict(set)
-    edges_possible: dict[str, set[str]] = defaultdict(set)
-    seen_pairs: set[tuple[str, str]] = set()
+    # A pair can only form an edge within the wider of each hash's two thresholds.
+    radii = (
+        max(thresholds.dhash_very, thresholds.dhash_possible),
+        max(thresholds.phash_very, thresholds.phash_possible),
+    )
     id_to_item: dict[str, PhotoItem] = {
-        item.id: item for candidate in candidate_sets for item in candidate
+        item.id: item for candidate in [*candidate_sets, *pairs] for item in candidate
     }
+    # Nodes are numbered in id order so the smallest node of a component is its smallest id.
+    ids = sorted(id_to_item)
+    node_of = {item_id: node for node, item_id in enumerate(ids)}
+    very_sets = DisjointSet(len(ids))
+    # VERY members drop out of the POSSIBLY tier, which is only known once every pair is seen.
+    possible_edges: list[tuple[int, int]] = []
+    seen_pairs: set[int] = set()
+
+    def link(left: int, right: int, dhash_distance: int, phash_distance: int) -> bool:
+        pair = left * len(ids) + right if left < right else right * len(ids) + left
+        if pair in seen_pairs:
+            return False
+        seen_pairs.add(pair)
+        edge = _classify(thresholds, dhash_distance, phash_distance)
+        if edge:
+            very_sets.union(left, right)
+        elif edge is not None:
+            possible_edges.append((left, right))
+        return True
+
     for candidates in candidate_sets:
-        for i, left in enumerate(candidates):
-            for right in candidates[i + 1 :]:
-                pair = (left.id, right.id) if left.id < right.id else (right.id, left.id)
-                if pair in seen_pairs:
-                    continue
-                seen_pairs.add(pair)
-                comparisons += 1
-                left_hashes = perceptual_hashes[left.id]
-                right_hashes = perceptual_hashes[right.id]
-                dhash_distance = hamming_distance(left_hashes.dhash, right_hashes.dhash)
-                phash_distance = hamming_distance(left_hashes.phash, right_hashes.phash)
-                if (
-                    dhash_distance <= thresholds.dhash_very
-                    or phash_distance <= thresholds.phash_very
+        nodes = [node_of[item.id] for item in candidates]
+        hashes = [perceptual_hashes[item.id] for item in candidates]
+        if len(candidates) >= KERNEL_MIN_ITEMS:
+            # Vectorized distances for every pair beat pruning them one by one in Python.
+            comparisons += len(candidates) * (len(candidates) - 1) // 2
+            columns = ([entry.dhash for entry in hashes], [entry.phash for entry in hashes])
+            for block in pairs_within(columns, radii):
+                dhash_distances, phash_distances = block.distances
+                for i, j, dhash_distance, phash_distance in zip(
+                    block.left.tolist(),
+                    block.right.tolist(),
+                    dhash_distances.tolist(),
+                    phash_distances.tolist(),
+                    strict=True,
                 ):
-                    _add_edge(edges_very, left.id, right.id)
-                elif (
-                    dhash_distance <= thresholds.dhash_possible
-                    or phash_distance <= thresholds.phash_possible
+                    link(nodes[i], nodes[j], dhash_distance, phash_distance)
+            continue
+        for i in range(len(candidates)):
+            for j in range(i + 1, len(candidates)):
+                if link(
+                    nodes[i],
+                    nodes[j],
+                    hamming_distance(hashes[i].dhash, hashes[j].dhash),
+                    hamming_distance(hashes[i].phash, hashes[j].phash),
                 ):
-                    _add_edge(edges_possible, left.id, right.id)
-    very_groups, very_ids = _connected_components(edges_very, id_to_item)
-    possible_groups, _ = _connected_components(
-        edges_possible,
-        id_to_item,
-        exclude_ids=very_ids,
-    )
+                    comparisons += 1
+    for left_item, right_item in pairs:
+        left_hashes = perceptual_hashes[left_item.id]
+        right_hashes = perceptual_hashes[right_item.id]
+        if link(
+            node_of[left_item.id],
+            node_of[right_item.id],
+            hamming_distance(left_hashes.dhash, right_hashes.dhash),
+            hamming_distance(left_hashes.phash, right_hashes.phash),
+        ):
+            comparisons += 1
+    very_groups = very_sets.components()
+    very_nodes = {node for group in very_groups for node in group}
+    possible_sets = DisjointSet(len(ids))
+    for left, right in possible_edges:
+        if left not in very_nodes and right not in very_nodes:
+            possible_sets.union(left, right)
     return (
-        _build_groups(very_groups, category="VERY_SIMILAR", explanation=_explain(thresholds, True)),
         _build_groups(
-            possible_groups,
+            [[id_to_item[ids[node]] for node in group] for group in very_groups],
+            category="VERY_SIMILAR",
+            explanation=_explain(thresholds, True),
+        ),
+        _build_groups(
+            [[id_to_item[ids[node]] for node in group] for group in possible_sets.components()],
             category="POSSIBLY_SIMILAR",
             explanation=_explain(thresholds, False),
         ),
@@ -89,6 +171,17 @@ def group_near_duplicates(
     )
 
 
+def build_near_groups(
+    groups: list[list[PhotoItem]], thresholds: SimilarityThresholds, *, very: bool
+) -> list[GroupResult]:
+    """VERY or POSSIBLY groups of known members, as ``group_near_duplicates`` builds them."""
+    return _build_groups(
+        groups,
+        category="VERY_SIMILAR" if very else "POSSIBLY_SIMILAR",
+        explanation=_explain(thresholds, very),
+    )
+
+
 def select_representative_pair(items: list[PhotoItem]) -> GroupRepresentativePair:
     ordered = sorted(items, key=lambda entry: (entry.create_time, entry.id))
     earliest = ordered[0]
@@ -99,44 +192,15 @@ def select_representative_pair(items: list[PhotoItem]) -> GroupRepresentativePai
     )
 
 
-def _add_edge(edges: dict[str, set[str]], left: str, right: str) -> None:
-    edges[left].add(right)
-    edges[right].add(left)
-
-
-def _connected_components(
-    edges: dict[str, set[str]],
-    id_to_item: dict[str, PhotoItem],
-    *,
-    exclude_ids: set[str] | None = None,
-) -> tuple[list[list[PhotoItem]], set[str]]:
-    visited: set[str] = set()
-    exclude = exclude_ids or set()
-    groups: list[list[PhotoItem]] = []
-    grouped_ids: set[str] = set()
-    for node in sorted(edges.keys()):
-        if node in visited or node in exclude:
-            continue
-        queue = deque([node])
-        visited.add(node)
-        component_ids: list[str] = []
-        while queue:
-            current = queue.popleft()
-            if current in exclude:
-                continue
-            component_ids.append(current)
-            for neighbor in sorted(edges.get(current, set())):
-                if neighbor not in visited:
-                    visited.add(neighbor)
-                    queue.append(neighbor)
-        if len(component_ids) >= 2:
-            component_items = [
-                id_to_item[item_id] for item_id in component_ids if item_id in id_to_item
-            ]
-            if len(component_items) >= 2:
-                groups.append(component_items)
-                grouped_ids.update(component_ids)
-    return groups, grouped_ids
+def _classify(
+    thresholds: SimilarityThresholds, dhash_distance: int, phash_distance: int
+) -> bool | None:
+    """``True`` for a VERY edge, ``False`` for a POSSIBLY edge, ``None`` for no edge."""
+    if dhash_distance <= thresholds.dhash_very or phash_distance <= thresholds.phash_very:
+        return True
+    if dhash_distance <= thresholds.dhash_possible or phash_distance <= thresholds.phash_possible:
+        return False
+    return None
 
 
 def _build_groups(
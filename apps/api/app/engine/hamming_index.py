@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+import numpy.typing as npt
+
+HASH_BITS = 64
+# Smallest set worth packing into arrays; below it the scalar loop is faster.
+KERNEL_MIN_ITEMS = 16
+# XOR cells computed per block, which bounds kernel memory at a few MiB per hash column.
+KERNEL_BLOCK_CELLS = 1 << 18
+_BYTE_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+@dataclass(frozen=True)
+class NearPairs:
+    """Index pairs from one kernel block with their distance on each hash column."""
+
+    left: npt.NDArray[np.intp]
+    right: npt.NDArray[np.intp]
+    distances: tuple[npt.NDArray[np.uint8], ...]
+
+
+def banded_pairs(values: Sequence[int], bands: int, radius: int) -> Iterator[tuple[int, int]]:
+    """Index pairs ``(i, j)`` with ``i < j`` that may be within ``radius`` bits.
+
+    Locality-sensitive banding splits each hash into ``bands`` runs of bits. A pair within
+    ``radius`` bits differs in at most ``radius // bands`` bits of some band (pigeonhole),
+    so probing each band within that sub-radius finds every such pair, while unrelated
+    hashes rarely collide and the work grows with the near matches instead of every pair.
+    """
+    chunks = _split_bits(HASH_BITS, bands)
+    masks = [_flip_masks(width, radius // bands) for _shift, width in chunks]
+    tables: list[defaultdict[int, list[int]]] = [defaultdict(list) for _ in chunks]
+    for position, value in enumerate(values):
+        keys = [(value >> shift) & ((1 << width) - 1) for shift, width in chunks]
+        found: set[int] = set()
+        for table, key, band_masks in zip(tables, keys, masks, strict=True):
+            for mask in band_masks:
+                positions = table.get(key ^ mask)
+                if positions:
+                    found.update(positions)
+        for earlier in sorted(found):
+            yield earlier, position
+        for table, key in zip(tables, keys, strict=True):
+            table[key].append(position)
+
+
+def _split_bits(bits: int, count: int) -> list[tuple[int, int]]:
+    chunks: list[tuple[int, int]] = []
+    shift = 0
+    for index in range(count):
+        width = bits // count + (1 if index < bits % count else 0)
+        chunks.append((shift, width))
+        shift += width
+    return chunks
+
+
+@lru_cache(maxsize=64)
+def _flip_masks(width: int, radius: int) -> tuple[int, ...]:
+    masks = [0]
+    for flipped in range(1, min(radius, width) + 1):
+        for positions in combinations(range(width), flipped):
+            masks.append(sum(1 << position for position in positions))
+    return tuple(masks)
+
+
+def pairs_within(
+    hash_columns: Sequence[Sequence[int]],
+    radii: Sequence[int],
+    *,
+    block_cells: int = KERNEL_BLOCK_CELLS,
+    use_bitwise_count: bool = True,
+) -> Iterator[NearPairs]:
+    """Every pair ``(i, j)`` with ``i < j`` within radius on any column, computed in blocks.
+
+    Each block XORs a run of rows against every later item and popcounts the result, so the
+    whole upper triangle is measured without a Python-level loop over pairs.
+    """
+    packed = [np.asarray(column, dtype=np.uint64) for column in hash_columns]
+    size = len(packed[0]) if packed else 0
+    rows_per_block = max(1, block_cells // max(size, 1))
+    for start in range(0, size, rows_per_block):
+        stop = min(start + rows_per_block, size)
+        distances = [
+            popcount64(column[start:stop, None] ^ column[None, start:], use_bitwise_count)
+            for column in packed
+        ]
+        keep = np.arange(start, size)[None, :] > np.arange(start, stop)[:, None]
+        within = np.zeros_like(keep)
+        for distance, radius in zip(distances, radii, strict=True):
+            within |= distance <= radius
+        rows, columns = np.nonzero(keep & within)
+        yield NearPairs(
+            left=rows + start,
+            right=columns + start,
+            distances=tuple(distance[rows, columns] for distance in distances),
+        )
+
+
+def popcount64(
+    values: npt.NDArray[np.uint64], use_bitwise_count: bool = True
+) -> npt.NDArray[np.uint8]:
+    bitwise_count = getattr(np, "bitwise_count", None) if use_bitwise_count else None
+    if bitwise_count is not None:
+        return np.asarray(bitwise_count(values), dtype=np.uint8)
+    as_bytes = np.ascontiguousarray(values).view(np.uint8).reshape(*values.shape, 8)
+    return np.asarray(_BYTE_POPCOUNT[as_bytes].sum(axis=-1, dtype=np.uint8), dtype=np.uint8)
@@ -1,57 +1,391 @@
 from __future__ import annotations
 
-import hashlib
 import math
+import multiprocessing
+import threading
+import time
+import weakref
+from collections.abc import Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
 from io import BytesIO
 from typing import TYPE_CHECKING, NamedTuple
 
+import numpy as np
+import numpy.typing as npt
+
+from app.core.config import PhashBackend
 from app.engine.downloads import DownloadManager
+from app.engine.fingerprints import (
+    FULL_DECODE,
+    FingerprintStore,
+    ItemFingerprint,
+    content_validator,
+)
 from app.engine.models import PhotoItem
 
+# Matrix products sum DCT terms in a different order than the reference loop, so a
+# coefficient within this distance of the median may land on the other side of it.
+# The observed reordering error for 8-bit pixels is several orders of magnitude smaller.
+PHASH_TIE_TOLERANCE = 1e-6
+
+
+DHASH_SIZE = 8
+PHASH_SIZE = 32
+PHASH_HASH_SIZE = 8
+# Cells per edge of the coarse average hash used to split oversized candidate sets.
+COARSE_HASH_SIZE = 4
+# Items per process-pool work unit: large enough to amortise the IPC round trip, small
+# enough that one byte-cache window of photos still spreads across every worker.
+DECODE_BATCH_SIZE = 4
+
 
 class PerceptualHashes(NamedTuple):
     dhash: int
     phash: int
 
 
+class DecodedImage(NamedTuple):
+    """Oriented grayscale derivatives of one image, decoded a single time.
+
+    ``width``/``height`` describe the decoded image, which is ``draft_scale`` times smaller
+    than the source when libjpeg reduced the decode.
+    """
+
+    width: int
+    height: int
+    dhash_pixels: bytes
+    phash_pixels: bytes
+    draft_scale: int = 1
+
+
 if TYPE_CHECKING:
     from PIL import Image as PilImage
 
 
 class HashingService:
-    def __init__(self, download_manager: DownloadManager) -> None:
+    def __init__(
+        self,
+        download_manager: DownloadManager,
+        *,
+        phash_backend: PhashBackend = PhashBackend.NUMPY,
+        jpeg_draft_min_edge: int | None = None,
+        executor: Executor | None = None,
+        batch_size: int = DECODE_BATCH_SIZE,
+        fingerprint_store: FingerprintStore | None = None,
+    ) -> None:
         self._download_manager = download_manager
+        self._phash_backend = phash_backend
+        self._jpeg_draft_min_edge = jpeg_draft_min_edge
+        self._executor = executor
+        self._batch_size = batch_size
+        self._fingerprint_store = fingerprint_store
+        self._decoder = (
+            FULL_DECODE if jpeg_draft_min_edge is None else f"jpeg-draft-{jpeg_draft_min_edge}"
+        )
         self._byte_hash_cache: dict[str, str] = {}
+        self._decoded_cache: dict[str, DecodedImage] = {}
         self._perceptual_cache: dict[str, PerceptualHashes] = {}
+        self._coarse_cache: dict[str, int] = {}
         self.byte_hash_count = 0
+        self.decode_count = 0
+        self.draft_decode_count = 0
         self.perceptual_hash_count = 0
+        self.decode_seconds = 0.0
+        self.perceptual_hash_seconds = 0.0
+
+    def get_stored_fingerprint(self, item: PhotoItem) -> ItemFingerprint | None:
+        if self._fingerprint_store is None:
+            return None
+        return self._fingerprint_store.lookup(item, decoder=self._decoder)
 
     def get_byte_hash(self, item: PhotoItem) -> str:
         if item.id in self._byte_hash_cache:
             return self._byte_hash_cache[item.id]
-        digest = hashlib.sha256(self._download_manager.get_bytes(item)).hexdigest()
+        stored = self.get_stored_fingerprint(item)
+        if stored is not None:
+            self._byte_hash_cache[item.id] = stored.sha256
+            return stored.sha256
+        digest = self._download_manager.get_sha256(item)
         self._byte_hash_cache[item.id] = digest
         self.byte_hash_count += 1
         return digest
 
+    def get_decoded_image(self, item: PhotoItem) -> DecodedImage:
+        if item.id in self._decoded_cache:
+            return self._decoded_cache[item.id]
+        data = self._download_manager.get_bytes(item)
+        start = time.perf_counter()
+        decoded = decode_image(data, draft_min_edge=self._jpeg_draft_min_edge)
+        self.decode_seconds += time.perf_counter() - start
+        self._store_decoded(item.id, decoded)
+        return decoded
+
+    def decode_images(self, items: Sequence[PhotoItem]) -> dict[str, Exception]:
+        """Decode every uncached item, fanning batches out to the executor when one is set.
+
+        Results are collected in submission order, so caches and counters end up the same
+        as decoding serially. Unreadable images are returned by item id instead of raised.
+        """
+        pending: dict[str, PhotoItem] = {}
+        for item in items:
+            if item.id not in self._decoded_cache and item.id not in self._perceptual_cache:
+                pending.setdefault(item.id, item)
+        payload = [
+            (item_id, self._download_manager.get_bytes(item)) for item_id, item in pending.items()
+        ]
+        start = time.perf_counter()
+        if self._executor is None or len(payload) <= 1:
+            outcomes = _decode_batch(payload, self._jpeg_draft_min_edge)
+        else:
+            try:
+                outcomes = self._decode_on_executor(self._executor, payload)
+            except BrokenProcessPool:
+                # A worker died, for instance killed for memory. The shared pool is rebuilt
+                # for every later scan, and this window is retried on the new pool once.
+                replacement = replace_broken_hashing_executor(self._executor)
+                if replacement is None:
+                    raise
+                self._executor = replacement
+                outcomes = self._decode_on_executor(replacement, payload)
+        self.decode_seconds += time.perf_counter() - start
+        failures: dict[str, Exception] = {}
+        for item_id, outcome in outcomes:
+            if isinstance(outcome, DecodedImage):
+                self._store_decoded(item_id, outcome)
+            else:
+                failures[item_id] = outcome
+        return failures
+
+    def _decode_on_executor(
+        self, executor: Executor, payload: list[tuple[str, bytes]]
+    ) -> list[tuple[str, DecodedImage | Exception]]:
+        futures = [
+            executor.submit(
+                _decode_batch,
+                payload[offset : offset + self._batch_size],
+                self._jpeg_draft_min_edge,
+            )
+            for offset in range(0, len(payload), self._batch_size)
+        ]
+        return [outcome for future in futures for outcome in future.result()]
+
     def get_perceptual_hashes(self, item: PhotoItem) -> PerceptualHashes:
         if item.id in self._perceptual_cache:
             return self._perceptual_cache[item.id]
-        data = self._download_manager.get_bytes(item)
-        dhash_value = compute_dhash(data)
-        phash_value = compute_phash(data)
-        hashes = PerceptualHashes(dhash=dhash_value, phash=phash_value)
+        stored = self.get_stored_fingerprint(item)
+        if stored is not None and stored.dhash is not None and stored.phash is not None:
+            self._perceptual_cache[item.id] = PerceptualHashes(stored.dhash, stored.phash)
+            return self._perceptual_cache[item.id]
+        decoded = self.get_decoded_image(item)
+        start = time.perf_counter()
+        hashes = PerceptualHashes(
+            dhash=_dhash_from_pixels(decoded.dhash_pixels, DHASH_SIZE),
+            phash=_phash_from_pixels(
+                decoded.phash_pixels,
+                PHASH_SIZE,
+                PHASH_HASH_SIZE,
+                self._phash_backend,
+            ),
+        )
+        self.perceptual_hash_seconds += time.perf_counter() - start
         self._perceptual_cache[item.id] = hashes
+        self._decoded_cache.pop(item.id, None)
         self.perceptual_hash_count += 1
         return hashes
 
+    def get_coarse_hash(self, item: PhotoItem) -> int | None:
+        """4x4 average hash of an image decoded in this scan; ``None`` for stored items."""
+        return self._coarse_cache.get(item.id)
+
     def validate_image(self, item: PhotoItem) -> None:
-        _load_image(self._download_manager.get_bytes(item))
+        self.get_decoded_image(item)
+
+    def record_fingerprint(self, item: PhotoItem, *, perceptual: bool) -> None:
+        """Hand a freshly validated item's hashes to the store so later scans skip it.
+
+        Perceptual hashes are only taken when ``perceptual`` is set, for items that take
+        part in near matching; the others are stored with their byte hash alone.
+        """
+        store = self._fingerprint_store
+        if store is None or content_validator(item) is None:
+            return
+        stored = self.get_stored_fingerprint(item)
+        if stored is not None and (stored.has_perceptual_hashes or not perceptual):
+            return
+        hashes = self.get_perceptual_hashes(item) if perceptual else None
+        store.record(
+            item,
+            sha256=self.get_byte_hash(item),
+            byte_length=len(self._download_manager.get_bytes(item)),
+            dhash=hashes.dhash if hashes else None,
+            phash=hashes.phash if hashes else None,
+            decoder=self._decoder,
+        )
+
+    def _store_decoded(self, item_id: str, decoded: DecodedImage) -> None:
+        self._decoded_cache[item_id] = decoded
+        self._coarse_cache[item_id] = _coarse_hash_from_pixels(
+            decoded.phash_pixels, PHASH_SIZE, COARSE_HASH_SIZE
+        )
+        self.decode_count += 1
+        if decoded.draft_scale > 1:
+            self.draft_decode_count += 1
+
+
+_hashing_pool_lock = threading.Lock()
+_hashing_pool: tuple[int, ProcessPoolExecutor] | None = None
+# Every pool handed out as the shared one, so a broken one can be told from a caller's own.
+_shared_pools: weakref.WeakSet[Executor] = weakref.WeakSet()
+
+
+def get_hashing_executor(workers: int) -> Executor | None:
+    """Process pool shared by every scan; ``None`` keeps decoding on the request thread.
+
+    The pool is kept for one worker count at a time: asking for another count shuts down
+    the pool it replaces instead of leaving its processes behind. Workers are spawned rather
+    than forked so they never inherit locks held by the API's other threads.
+    """
+    global _hashing_pool
+    if workers <= 1:
+        return None
+    with _hashing_pool_lock:
+        replaced = _hashing_pool
+        if replaced is not None and replaced[0] == workers:
+            return replaced[1]
+        pool = _new_hashing_pool(workers)
+        _hashing_pool = (workers, pool)
+    if replaced is not None:
+        replaced[1].shutdown(wait=False)
+    return pool
+
+
+def shutdown_hashing_executor() -> None:
+    """Stop the shared pool; the next ``get_hashing_executor`` call starts a new one."""
+    global _hashing_pool
+    with _hashing_pool_lock:
+        current, _hashing_pool = _hashing_pool, None
+    if current is not None:
+        current[1].shutdown()
+
+
+def replace_broken_hashing_executor(broken: Executor) -> Executor | None:
+    """The shared pool to use once ``broken`` failed; ``None`` when it was never shared.
+
+    The first scan to find the shared pool broken replaces it, so later scans, and others
+    that were using the broken pool, all move to the same fresh pool.
+    """
+    global _hashing_pool
+    if broken not in _shared_pools:
+        return None
+    with _hashing_pool_lock:
+        if _hashing_pool is None:
+            return None
+        workers, pool = _hashing_pool
+        if pool is broken:
+            pool = _new_hashing_pool(workers)
+            _hashing_pool = (workers, pool)
+    broken.shutdown(wait=False)
+    return pool
+
+
+def _new_hashing_pool(workers: int) -> ProcessPoolExecutor:
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    _shared_pools.add(pool)
+    return pool
+
+
+def decode_image(image_bytes: bytes, *, draft_min_edge: int | None = None) -> DecodedImage:
+    """Decode once, optionally letting libjpeg scale down while keeping ``draft_min_edge``.
+
+    Formats without draft support (and JPEGs already near the minimum edge) fall back to a
+    full decode, so their hashes match ``compute_dhash``/``compute_phash`` exactly.
+    """
+    image, draft_scale = _open_image(image_bytes, draft_min_edge=draft_min_edge)
+    width, height = image.size
+    return DecodedImage(
+        width=width,
+        height=height,
+        dhash_pixels=_resized_pixels(image, (DHASH_SIZE + 1, DHASH_SIZE)),
+        phash_pixels=_resized_pixels(image, (PHASH_SIZE, PHASH_SIZE)),
+        draft_scale=draft_scale,
+    )
+
+
+def _decode_batch(
+    batch: Sequence[tuple[str, bytes]], draft_min_edge: int | None
+) -> list[tuple[str, DecodedImage | Exception]]:
+    """Work unit for the hashing pool: only the small pixel derivatives travel back."""
+    from PIL import Image
+
+    outcomes: list[tuple[str, DecodedImage | Exception]] = []
+    for item_id, image_bytes in batch:
+        try:
+            outcomes.append((item_id, decode_image(image_bytes, draft_min_edge=draft_min_edge)))
+        except (Image.DecompressionBombError, OSError, ValueError) as exc:
+            outcomes.append((item_id, exc))
+    return outcomes
+
+
+def compute_dhash(image_bytes: bytes, *, size: int = DHASH_SIZE) -> int:
+    pixels = _resized_pixels(_load_image(image_bytes), (size + 1, size))
+    return _dhash_from_pixels(pixels, size)
+
+
+def compute_phash(
+    image_bytes: bytes,
+    *,
+    size: int = PHASH_SIZE,
+    hash_size: int = PHASH_HASH_SIZE,
+    backend: PhashBackend = PhashBackend.NUMPY,
+) -> int:
+    pixels = _resized_pixels(_load_image(image_bytes), (size, size))
+    return _phash_from_pixels(pixels, size, hash_size, backend)
+
 
+def hamming_distance(left: int, right: int) -> int:
+    return (left ^ right).bit_count()
+
+
+def _load_image(image_bytes: bytes) -> PilImage.Image:
+    image, _ = _open_image(image_bytes)
+    return image
+
+
+def _open_image(
+    image_bytes: bytes, *, draft_min_edge: int | None = None
+) -> tuple[PilImage.Image, int]:
+    from PIL import Image, ImageOps
+
+    with Image.open(BytesIO(image_bytes)) as img:
+        draft_scale = 1
+        # Only draft when libjpeg can at least halve the decode; a 1:1 draft would still
+        # switch to luma-only decoding and drift from the full decode for no gain.
+        if (
+            draft_min_edge is not None
+            and img.format == "JPEG"
+            and min(img.size) >= 2 * draft_min_edge
+        ):
+            full_width = img.size[0]
+            if img.draft("L", (draft_min_edge, draft_min_edge)) is not None:
+                draft_scale = max(1, round(full_width / img.size[0]))
+        transposed = ImageOps.exif_transpose(img)
+        grayscale = transposed.convert("L")
+        return grayscale.copy(), draft_scale
+
+
+def _resized_pixels(image: PilImage.Image, size: tuple[int, int]) -> bytes:
+    return image.resize(size, resample=_resample_lanczos()).tobytes()
 
-def compute_dhash(image_bytes: bytes, *, size: int = 8) -> int:
-    image = _load_image(image_bytes).resize((size + 1, size), resample=_resample_lanczos())
-    pixels = list(image.getdata())
+
+def _resample_lanczos() -> int:
+    from PIL import Image
+
+    return Image.Resampling.LANCZOS
+
+
+def _dhash_from_pixels(pixels: bytes, size: int) -> int:
     result = 0
     for row in range(size):
         for col in range(size):
@@ -61,10 +395,24 @@ def compute_dhash(image_bytes: bytes, *, size: int = 8) -> int:
     return result
 
 
-def compute_phash(image_bytes: bytes, *, size: int = 32, hash_size: int = 8) -> int:
-    image = _load_image(image_bytes).resize((size, size), resample=_resample_lanczos())
-    pixels = list(image.getdata())
-    matrix = [pixels[i * size : (i + 1) * size] for i in range(size)]
+def _coarse_hash_from_pixels(pixels: bytes, size: int, hash_size: int) -> int:
+    cell = size // hash_size
+    means = (
+        np.frombuffer(pixels, dtype=np.uint8)
+        .reshape(hash_size, cell, hash_size, cell)
+        .mean(axis=(1, 3), dtype=np.float64)
+    )
+    return _pack_bits((means > means.mean()).ravel())
+
+
+def _phash_from_pixels(pixels: bytes, size: int, hash_size: int, backend: PhashBackend) -> int:
+    if backend == PhashBackend.PYTHON:
+        return _phash_python(pixels, size, hash_size)
+    return _phash_numpy(pixels, size, hash_size)
+
+
+def _phash_python(pixels: bytes, size: int, hash_size: int) -> int:
+    matrix = [list(pixels[i * size : (i + 1) * size]) for i in range(size)]
     dct = _dct_2d(matrix)
     dct_low = [row[:hash_size] for row in dct[:hash_size]]
     flat = [coef for row in dct_low for coef in row]
@@ -75,31 +423,76 @@ def compute_phash(image_bytes: bytes, *, size: int = 32, hash_size: int = 8) ->
     return result
 
 
-def hamming_distance(left: int, right: int) -> int:
-    return (left ^ right).bit_count()
+def _phash_numpy(pixels: bytes, size: int, hash_size: int) -> int:
+    matrix = np.frombuffer(pixels, dtype=np.uint8).astype(np.float64).reshape(size, size)
+    basis = _dct_basis(size)[:hash_size]
+    flat = ((basis @ matrix @ basis.T) * _dct_weights(size, hash_size)).ravel()
+    median = _median(flat[1:].tolist())
+    # An odd-length median is itself one of the coefficients; anything else that close
+    # to the median could compare differently under the reference summation order.
+    expected_ties = (flat.size - 1) % 2
+    if np.count_nonzero(np.abs(flat - median) <= PHASH_TIE_TOLERANCE) > expected_ties:
+        flat = _dct_low_exact(matrix, size, hash_size).ravel()
+        median = _median(flat[1:].tolist())
+    return _pack_bits(flat > median)
 
 
-def _load_image(image_bytes: bytes) -> PilImage.Image:
-    from PIL import Image, ImageOps
+def _dct_low_exact(
+    matrix: npt.NDArray[np.float64],
+    size: int,
+    hash_size: int,
+) -> npt.NDArray[np.float64]:
+    """Low-frequency DCT block using the reference loop's exact float operation order."""
+    cos_low = _dct_basis(size)[:hash_size].T
+    terms = (matrix[:, :, None] * cos_low[:, None, :])[..., None] * cos_low[None, :, None, :]
+    totals: npt.NDArray[np.float64] = np.cumsum(
+        terms.reshape(size * size, hash_size, hash_size), axis=0
+    )[-1]
+    low: npt.NDArray[np.float64] = _dct_weights(size, hash_size) * totals
+    return low
 
-    with Image.open(BytesIO(image_bytes)) as img:
-        transposed = ImageOps.exif_transpose(img)
-        grayscale = transposed.convert("L")
-        return grayscale.copy()
 
+def _pack_bits(bits: npt.NDArray[np.bool_]) -> int:
+    packed = np.packbits(bits)
+    return int.from_bytes(packed.tobytes(), "big") >> (packed.size * 8 - bits.size)
 
-def _resample_lanczos() -> int:
-    from PIL import Image
 
-    return Image.Resampling.LANCZOS
+@lru_cache(maxsize=8)
+def _cos_table(size: int) -> tuple[tuple[float, ...], ...]:
+    return tuple(
+        tuple(math.cos(((2 * x + 1) * u * math.pi) / (2 * size)) for x in range(size))
+        for u in range(size)
+    )
+
+
+@lru_cache(maxsize=8)
+def _dct_basis(size: int) -> npt.NDArray[np.float64]:
+    basis = np.asarray(_cos_table(size), dtype=np.float64)
+    basis.setflags(write=False)
+    return basis
+
+
+@lru_cache(maxsize=8)
+def _dct_weights(size: int, hash_size: int) -> npt.NDArray[np.float64]:
+    scale = math.sqrt(2 / size)
+    weights = np.asarray(
+        [
+            [scale * _dct_factor(u) * _dct_factor(v) for v in range(hash_size)]
+            for u in range(hash_size)
+        ],
+        dtype=np.float64,
+    )
+    weights.setflags(write=False)
+    return weights
+
+
+def _dct_factor(index: int) -> float:
+    return 1 / math.sqrt(2) if index == 0 else 1.0
 
 
 def _dct_2d(matrix: list[list[int]]) -> list[list[float]]:
     size = len(matrix)
-    cos_table = [
-        [math.cos(((2 * x + 1) * u * math.pi) / (2 * size)) for x in range(size)]
-        for u in range(size)
-    ]
+    cos_table = _cos_table(size)
     dct: list[list[float]] = [[0.0 for _ in range(size)] for _ in range(size)]
     scale = math.sqrt(2 / size)
     for u in range(size):
@@ -108,8 +501,8 @@ def _dct_2d(matrix: list[list[int]]) -> list[list[float]]:
             for x in range(size):
                 for y in range(size):
                     total += matrix[x][y] * cos_table[u][x] * cos_table[v][y]
-            cu = 1 / math.sqrt(2) if u == 0 else 1.0
-            cv = 1 / math.sqrt(2) if v == 0 else 1.0
+            cu = _dct_factor(u)
+            cv = _dct_factor(v)
             dct[u][v] = scale * cu * cv * total
     return dct
 
@@ -0,0 +1,210 @@
+"""Incremental rescans: only new or changed items are fetched, hashed and compared.
+
+Exact groups are rebuilt from every item's byte hash, which stored fingerprints supply
+without a download. Near-duplicate grouping only reruns for the candidate buckets that hold
+a dirty item: a new or changed one, or a member of a previous group that gained or lost an
+item. The near-duplicate groups of every other bucket are carried over from the previous
+scan, since comparisons between unchanged items still stand. That only holds under the
+settings the previous scan ran with, so a scan records ``grouping_settings_digest`` and a
+rescan under a different digest has to run in full. Oversized candidate sets share one
+comparison budget, so once either scan splits a set every bucket is grouped again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from app.core.config import Settings
+from app.engine.fingerprints import FingerprintStore
+from app.engine.grouping import build_near_groups, group_near_duplicates
+from app.engine.hashing import PerceptualHashes
+from app.engine.models import PhotoItem
+from app.engine.scan import (
+    ScanStages,
+    comparison_bound,
+    connected_units,
+    elapsed_ms,
+    smallest_item_id,
+)
+from app.engine.schemas import ScanResult
+
+NEAR_CATEGORIES = frozenset({"VERY_SIMILAR", "POSSIBLY_SIMILAR"})
+# Settings that decide which items are compared and which comparisons form a group.
+GROUPING_SETTINGS = frozenset(
+    {
+        "scan_dhash_threshold_very",
+        "scan_dhash_threshold_possible",
+        "scan_phash_threshold_very",
+        "scan_phash_threshold_possible",
+        "scan_phash_backend",
+        "scan_jpeg_draft_decode",
+        "scan_jpeg_draft_min_edge",
+        "scan_candidate_strategy",
+        "scan_candidate_window_seconds",
+        "scan_candidate_aspect_match",
+        "scan_candidate_aspect_tolerance",
+        "scan_candidate_max_set_items",
+        "scan_candidate_max_comparisons",
+        "scan_candidate_geo_match",
+        "scan_candidate_geohash_precision",
+        "scan_candidate_geo_window_seconds",
+        "scan_candidate_camera_match",
+        "scan_candidate_exposure_stops",
+        "scan_small_input_fallback_max",
+        "scan_global_near_duplicates",
+        "scan_global_lsh_bands",
+    }
+)
+
+
+@dataclass(frozen=True)
+class PreviousGroup:
+    category: str
+    member_ids: tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class PreviousScan:
+    """Items and groups of the scan an incremental rescan builds on."""
+
+    item_ids: frozenset[str]
+    groups: tuple[PreviousGroup, ...]
+    settings_digest: str | None = None
+    # Candidate sets the previous scan split to fit its comparison budget; None if unknown.
+    sets_split: int | None = None
+
+
+def grouping_settings_digest(settings: Settings) -> str:
+    """Digest of the ``GROUPING_SETTINGS`` values, to tell whether previous groups still hold."""
+    values = settings.model_dump(mode="json", include=set(GROUPING_SETTINGS))
+    return hashlib.sha256(json.dumps(values, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def run_incremental_scan(
+    items: Iterable[PhotoItem],
+    settings: Settings,
+    previous: PreviousScan,
+    *,
+    fingerprint_store: FingerprintStore,
+    explain: bool = False,
+    require_image_bytes: bool = False,
+) -> ScanResult:
+    """``run_scan`` for a rescan, reusing ``previous`` wherever no item changed.
+
+    Items are fresh when ``previous`` did not include them or their stored fingerprint no
+    longer matches; only fresh items are downloaded and decoded.
+    """
+    stages = ScanStages(items, settings, explain=explain, fingerprint_store=fingerprint_store)
+    hashing_service = stages.hashing_service
+    photo_items = stages.photo_items
+    stages.narrow()
+    present_ids = {item.id for item in photo_items}
+    fresh_ids = {
+        item.id
+        for item in photo_items
+        if item.id not in previous.item_ids or hashing_service.get_stored_fingerprint(item) is None
+    }
+    byte_hashes = stages.hash_bytes(require_image_bytes=require_image_bytes)
+    groups_exact = stages.group_exact(byte_hashes)
+    near_sets, near_pairs = stages.split_candidates(byte_hashes)
+
+    start = time.perf_counter()
+    decode_seconds_before_hashing = hashing_service.decode_seconds
+    perceptual_hashes: dict[str, PerceptualHashes] = {}
+    pairs = [*near_pairs, *stages.global_pairs(byte_hashes, perceptual_hashes)]
+    buckets = connected_units(near_sets, pairs)
+    # An item is dirty when it is fresh, or its exact or near group may have changed shape.
+    stale_ids = fresh_ids | (present_ids - byte_hashes.keys())
+    dirty_ids = set(fresh_ids)
+    for previous_group in previous.groups:
+        if stale_ids.intersection(previous_group.member_ids) or not present_ids.issuperset(
+            previous_group.member_ids
+        ):
+            dirty_ids.update(previous_group.member_ids)
+    for exact_group in groups_exact:
+        member_ids = [item.id for item in exact_group.items]
+        if fresh_ids.intersection(member_ids):
+            dirty_ids.update(member_ids)
+    if previous.sets_split != 0 or stages.candidate_split.sets_split != 0:
+        # Oversized sets share one comparison budget, so a change anywhere can split or
+        # rejoin a set whose items did not change.
+        dirty_ids = present_ids
+    regrouped, carried = _regrouped_buckets(
+        [
+            {item.id for index in set_ids for item in near_sets[index]}
+            | {item.id for index in pair_ids for item in pairs[index]}
+            for set_ids, pair_ids in buckets
+        ],
+        [group for group in previous.groups if group.category in NEAR_CATEGORIES],
+        dirty_ids & present_ids,
+    )
+    regrouped_sets = [near_sets[index] for bucket in regrouped for index in buckets[bucket][0]]
+    regrouped_pairs = [pairs[index] for bucket in regrouped for index in buckets[bucket][1]]
+    for unit in [*regrouped_sets, *regrouped_pairs]:
+        for item in unit:
+            if item.id not in perceptual_hashes:
+                perceptual_hashes[item.id] = hashing_service.get_perceptual_hashes(item)
+    stages.record_perceptual_hashing(time.perf_counter() - start, decode_seconds_before_hashing)
+    stages.counts["comparisons_bound"] = comparison_bound(regrouped_sets, regrouped_pairs)
+
+    start = time.perf_counter()
+    groups_very, groups_possible, comparisons = group_near_duplicates(
+        regrouped_sets, perceptual_hashes, stages.thresholds, pairs=regrouped_pairs
+    )
+    items_by_id = {item.id: item for item in photo_items}
+    for category, groups in [("VERY_SIMILAR", groups_very), ("POSSIBLY_SIMILAR", groups_possible)]:
+        groups.extend(
+            build_near_groups(
+                [
+                    [items_by_id[member_id] for member_id in group.member_ids]
+                    for group in carried
+                    if group.category == category
+                ],
+                stages.thresholds,
+                very=category == "VERY_SIMILAR",
+            )
+        )
+        # Buckets share no item, so this is the order a single grouping pass returns.
+        groups.sort(key=smallest_item_id)
+    stages.timings["near_grouping_ms"] = elapsed_ms(start)
+    stages.counts["incremental_fresh_items"] = len(fresh_ids)
+    stages.counts["incremental_removed_items"] = len(previous.item_ids - present_ids)
+    stages.counts["incremental_buckets_regrouped"] = len(regrouped)
+    stages.counts["incremental_groups_carried"] = len(carried)
+    return stages.finish(
+        groups_exact=groups_exact,
+        groups_very=groups_very,
+        groups_possible=groups_possible,
+        comparisons=comparisons,
+    )
+
+
+def _regrouped_buckets(
+    bucket_item_ids: list[set[str]],
+    near_groups: list[PreviousGroup],
+    dirty_ids: set[str],
+) -> tuple[list[int], list[PreviousGroup]]:
+    """Buckets to group again, in order, and the previous near groups that stand.
+
+    A previous group stands only if none of its members is dirty or in a regrouped bucket;
+    otherwise its members become dirty too, until no standing group is left half-regrouped.
+    """
+    bucket_of = {
+        item_id: bucket for bucket, item_ids in enumerate(bucket_item_ids) for item_id in item_ids
+    }
+    dirty = set(dirty_ids)
+    while True:
+        regrouped = sorted({bucket_of[item_id] for item_id in dirty if item_id in bucket_of})
+        covered = dirty.union(*(bucket_item_ids[bucket] for bucket in regrouped))
+        carried: list[PreviousGroup] = []
+        for group in near_groups:
+            if covered.isdisjoint(group.member_ids):
+                carried.append(group)
+            else:
+                dirty.update(group.member_ids)
+        if dirty <= covered:
+            return regrouped, carried
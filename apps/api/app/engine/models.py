@@ -10,6 +10,18 @@ class GPSLocation:
     longitude: float
 
 
+@dataclass(frozen=True)
+class CaptureSettings:
+    """Camera identity and exposure reported by the picker; any field may be missing."""
+
+    camera_make: str | None = None
+    camera_model: str | None = None
+    focal_length: float | None = None
+    aperture_f_number: float | None = None
+    iso_equivalent: int | None = None
+    exposure_seconds: float | None = None
+
+
 @dataclass(frozen=True)
 class PhotoItem:
     id: str
@@ -21,3 +33,4 @@ class PhotoItem:
     gps: GPSLocation | None
     download_url: str | None
     deep_link: str | None
+    capture: CaptureSettings | None = None
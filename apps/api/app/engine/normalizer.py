@@ -1,11 +1,12 @@
 from __future__ import annotations
 
+import math
 from collections.abc import Iterable
 from datetime import UTC, datetime
 from typing import Any
 
 from app.engine.deeplinks import build_google_photos_deep_link_from_parts
-from app.engine.models import GPSLocation, PhotoItem
+from app.engine.models import CaptureSettings, GPSLocation, PhotoItem
 from app.engine.schemas import PhotoItemPayload, PickerPayload
 
 
@@ -72,6 +73,7 @@ def normalize_picker_payload(payload: PickerPayload | dict[str, Any]) -> list[Ph
                 gps=_extract_gps(item),
                 download_url=_get_first_value(item, ("baseUrl",), ("mediaFile", "baseUrl")),
                 deep_link=deep_link,
+                capture=_extract_capture(item),
             )
         )
     return normalized
@@ -200,6 +202,11 @@ def normalize_picker_selection(items: Iterable[Any]) -> dict[str, Any]:
                 "latitude": latitude_raw,
                 "longitude": longitude_raw,
             }
+        metadata = _get_nested_dict(item, ("mediaFile", "mediaFileMetadata"))
+        for key in ("cameraMake", "cameraModel", "photoMetadata"):
+            value = item.get(key, metadata.get(key))
+            if value is not None:
+                accepted_item[key] = value
 
         accepted.append(accepted_item)
 
@@ -254,6 +261,55 @@ def _coerce_int(value: str | None) -> int | None:
         return None
 
 
+def _coerce_positive_float(value: str | None) -> float | None:
+    if value is None:
+        return None
+    try:
+        parsed = float(value)
+    except ValueError:
+        return None
+    return parsed if math.isfinite(parsed) and parsed > 0 else None
+
+
+def _parse_exposure_seconds(value: str | None) -> float | None:
+    """Picker durations look like ``"0.008s"``; EXIF-style ``"1/125"`` is accepted too."""
+    if value is None:
+        return None
+    cleaned = value.strip().removesuffix("s")
+    numerator, _, denominator = cleaned.partition("/")
+    seconds = _coerce_positive_float(numerator)
+    if seconds is None or not denominator:
+        return seconds
+    divisor = _coerce_positive_float(denominator)
+    return seconds / divisor if divisor else None
+
+
+def _get_nested_dict(item: dict[str, Any], path: tuple[str, ...]) -> dict[str, Any]:
+    cursor: Any = item
+    for key in path:
+        cursor = cursor.get(key) if isinstance(cursor, dict) else None
+    return cursor if isinstance(cursor, dict) else {}
+
+
+def _extract_capture(item: dict[str, Any]) -> CaptureSettings | None:
+    iso = _coerce_int(_get_first_value(item, ("photoMetadata", "isoEquivalent")))
+    capture = CaptureSettings(
+        camera_make=_get_first_value(item, ("cameraMake",)),
+        camera_model=_get_first_value(item, ("cameraModel",)),
+        focal_length=_coerce_positive_float(
+            _get_first_value(item, ("photoMetadata", "focalLength"))
+        ),
+        aperture_f_number=_coerce_positive_float(
+            _get_first_value(item, ("photoMetadata", "apertureFNumber"))
+        ),
+        iso_equivalent=iso if iso is not None and iso > 0 else None,
+        exposure_seconds=_parse_exposure_seconds(
+            _get_first_value(item, ("photoMetadata", "exposureTime"))
+        ),
+    )
+    return None if capture == CaptureSettings() else capture
+
+
 def _build_gps(latitude: float | None, longitude: float | None) -> GPSLocation | None:
     if latitude is None or longitude is None:
         return None
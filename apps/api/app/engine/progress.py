@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class ScanProgress:
+    """Snapshot of an in-flight scan; stages follow the client's INGEST..FINALIZE plan."""
+
+    stage: str
+    processed: int
+    total: int
+    bytes_downloaded: int
+    groups_found: int
+
+
+ProgressCallback = Callable[[ScanProgress], None]
+
+
+class ProgressReporter:
+    """Turns scan milestones into throttled ``ScanProgress`` events.
+
+    Stage changes and the final event are always reported. Within a stage at most one event
+    is sent per ``interval_seconds``, so reporting after every batch costs a clock read.
+    """
+
+    def __init__(
+        self,
+        callback: ProgressCallback | None,
+        *,
+        total: int,
+        bytes_downloaded: Callable[[], int],
+        interval_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._callback = callback
+        self._total = total
+        self._bytes_downloaded = bytes_downloaded
+        self._interval_seconds = interval_seconds
+        self._clock = clock
+        self._stage = ""
+        self._processed = 0
+        self._groups_found = 0
+        self._last_sent = float("-inf")
+
+    def stage(self, stage: str, *, groups_found: int | None = None) -> None:
+        self._stage = stage
+        if groups_found is not None:
+            self._groups_found = groups_found
+        self._send()
+
+    def advance(self, count: int) -> None:
+        self._processed = min(self._total, self._processed + count)
+        if self._callback is not None and self._clock() - self._last_sent >= self._interval_seconds:
+            self._send()
+
+    def finish(self, *, groups_found: int) -> None:
+        self._processed = self._total
+        self.stage("FINALIZE", groups_found=groups_found)
+
+    def _send(self) -> None:
+        if self._callback is None:
+            return
+        self._last_sent = self._clock()
+        self._callback(
+            ScanProgress(
+                stage=self._stage,
+                processed=self._processed,
+                total=self._total,
+                bytes_downloaded=self._bytes_downloaded(),
+                groups_found=self._groups_found,
+            )
+        )
@@ -1,24 +1,249 @@
 from __future__ import annotations
 
+import queue
+import threading
 import time
 from collections import defaultdict
-from collections.abc import Iterable
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
 from http.client import HTTPException as HTTPClientException
 from uuid import uuid4
 
 from PIL import Image
 
-from app.core.config import RuntimeEnvironment, Settings
+from app.core.config import CandidateStrategy, RuntimeEnvironment, Settings
 from app.engine.candidates import (
     CandidateDebug,
+    CandidateSplit,
+    build_candidate_pairs,
+    build_candidate_pairs_with_debug,
     build_candidate_sets,
     build_candidate_sets_with_debug,
+    split_oversized_sets,
 )
 from app.engine.downloads import DownloadManager, DownloadSecurityError, ScanDownloadBudget
-from app.engine.grouping import SimilarityThresholds, group_exact_duplicates, group_near_duplicates
-from app.engine.hashing import HashingService
+from app.engine.fingerprints import FingerprintStore
+from app.engine.grouping import (
+    DisjointSet,
+    SimilarityThresholds,
+    group_exact_duplicates,
+    group_near_duplicates,
+)
+from app.engine.hamming_index import banded_pairs
+from app.engine.hashing import HashingService, PerceptualHashes, get_hashing_executor
 from app.engine.models import PhotoItem
-from app.engine.schemas import CostEstimate, ScanItemIssue, ScanResult, StageMetrics
+from app.engine.progress import ProgressCallback, ProgressReporter
+from app.engine.schemas import (
+    CostEstimate,
+    GroupResult,
+    ScanItemIssue,
+    ScanResult,
+    StageMetrics,
+)
+
+GroupsCallback = Callable[[list[GroupResult]], None]
+
+
+class ScanCancelledError(Exception):
+    """``run_scan`` stopped early because its ``stop`` event was set."""
+
+
+@dataclass
+class CandidateNarrowing:
+    """Candidate sets and pairs for a selection, after the small-input fallback."""
+
+    sets: list[list[PhotoItem]]
+    pairs: list[tuple[PhotoItem, PhotoItem]]
+    debug: CandidateDebug | None
+    has_candidates: bool
+
+
+@dataclass
+class ByteHashing:
+    """Outcome of fetching and byte-hashing a selection, keyed by item id."""
+
+    byte_hashes: dict[str, str] = field(default_factory=dict)
+    issues: dict[str, ScanItemIssue] = field(default_factory=dict)
+    download_errors: list[ValueError] = field(default_factory=list)
+    stored_count: int = 0
+    streamed_count: int = 0
+    downloaded_count: int = 0
+
+
+class ScanStages:
+    """The stages every kind of scan runs, each recording its timing and counts.
+
+    ``run_scan`` and ``run_incremental_scan`` call them in the same order and differ only in
+    which candidate buckets they hand to near-duplicate grouping.
+    """
+
+    def __init__(
+        self,
+        items: Iterable[PhotoItem],
+        settings: Settings,
+        *,
+        explain: bool,
+        download_manager: DownloadManager | None = None,
+        hashing_executor: Executor | None = None,
+        fingerprint_store: FingerprintStore | None = None,
+    ) -> None:
+        self.run_id = uuid4().hex
+        self.settings = settings
+        self.photo_items = list(items)
+        self.download_manager = download_manager or build_download_manager(settings)
+        self.hashing_service = build_hashing_service(
+            settings,
+            self.download_manager,
+            hashing_executor=hashing_executor,
+            fingerprint_store=fingerprint_store,
+        )
+        self.fingerprint_store = fingerprint_store
+        self.explain_enabled = explain and settings.environment != RuntimeEnvironment.PRODUCTION
+        self.thresholds = similarity_thresholds(settings)
+        self.timings: dict[str, float] = {}
+        self.counts: dict[str, int] = {"selected_images": len(self.photo_items)}
+        self.narrowing = CandidateNarrowing(sets=[], pairs=[], debug=None, has_candidates=False)
+        self.candidate_split = CandidateSplit()
+        self.failed_items: list[ScanItemIssue] = []
+
+    def narrow(self) -> CandidateNarrowing:
+        start = time.perf_counter()
+        self.narrowing = narrow_candidates(
+            self.photo_items, self.settings, explain_enabled=self.explain_enabled
+        )
+        self.timings["candidate_narrowing_ms"] = elapsed_ms(start)
+        self.counts.update(narrowing_counts(self.narrowing))
+        return self.narrowing
+
+    def hash_bytes(
+        self,
+        *,
+        require_image_bytes: bool,
+        on_hashed: Callable[[int], None] | None = None,
+    ) -> dict[str, str]:
+        """Byte hashes of every readable item; unreadable ones become ``failed_items``."""
+        start = time.perf_counter()
+        # Items outside every candidate set only take part in exact matching.
+        candidate_ids = (
+            {item.id for item in self.photo_items}
+            if self.settings.scan_global_near_duplicates
+            else candidate_item_ids(self.narrowing.sets, self.narrowing.pairs)
+        )
+        hashed = hash_item_bytes(
+            self.photo_items,
+            candidate_ids,
+            self.hashing_service,
+            self.download_manager,
+            self.settings,
+            require_image_bytes=require_image_bytes,
+            on_hashed=on_hashed,
+        )
+        self.failed_items = [
+            hashed.issues[item.id] for item in self.photo_items if item.id in hashed.issues
+        ]
+        if require_image_bytes:
+            raise_if_unreadable(self.photo_items, hashed.byte_hashes, hashed.download_errors)
+        # Decoding happens inside validation; report it on its own so stage timings stay disjoint.
+        self.timings["byte_hashing_ms"] = _exclusive_ms(start, self.hashing_service.decode_seconds)
+        self.counts["byte_hashes"] = self.hashing_service.byte_hash_count
+        self.counts["byte_hashes_streamed"] = hashed.streamed_count
+        self.counts["hash_store_hits"] = hashed.stored_count
+        self.counts["hash_store_misses"] = (
+            hashed.downloaded_count if self.fingerprint_store is not None else 0
+        )
+        return hashed.byte_hashes
+
+    def group_exact(self, byte_hashes: dict[str, str]) -> list[GroupResult]:
+        start = time.perf_counter()
+        groups_exact = group_exact_duplicates(self.photo_items, byte_hashes)
+        self.timings["exact_grouping_ms"] = elapsed_ms(start)
+        return groups_exact
+
+    def split_candidates(
+        self, byte_hashes: dict[str, str]
+    ) -> tuple[list[list[PhotoItem]], list[tuple[PhotoItem, PhotoItem]]]:
+        start = time.perf_counter()
+        near_sets, near_pairs, self.candidate_split = near_duplicate_candidates(
+            self.narrowing,
+            byte_hashes,
+            self.hashing_service.get_coarse_hash,
+            max_items=self.settings.scan_candidate_max_set_items,
+            max_comparisons=self.settings.scan_candidate_max_comparisons,
+        )
+        self.timings["candidate_splitting_ms"] = elapsed_ms(start)
+        self.counts["candidate_sets_split"] = self.candidate_split.sets_split
+        self.counts["comparisons_skipped"] = (
+            self.candidate_split.comparisons_before - self.candidate_split.pairs_kept
+        )
+        self.counts["comparisons_bound"] = comparison_bound(near_sets, near_pairs)
+        return near_sets, near_pairs
+
+    def global_pairs(
+        self, byte_hashes: dict[str, str], perceptual_hashes: dict[str, PerceptualHashes]
+    ) -> list[tuple[PhotoItem, PhotoItem]]:
+        """Near pairs found across the whole selection, hashing its items into the given map."""
+        if not self.settings.scan_global_near_duplicates:
+            global_pairs: list[tuple[PhotoItem, PhotoItem]] = []
+        else:
+            global_items = near_duplicate_items(self.photo_items, byte_hashes)
+            for item in global_items:
+                if item.id not in perceptual_hashes:
+                    perceptual_hashes[item.id] = self.hashing_service.get_perceptual_hashes(item)
+            global_pairs = global_near_pairs(
+                global_items,
+                perceptual_hashes,
+                self.thresholds,
+                self.settings.scan_global_lsh_bands,
+            )
+        self.counts["global_lsh_pairs"] = len(global_pairs)
+        self.counts["comparisons_bound"] += len(global_pairs)
+        return global_pairs
+
+    def record_perceptual_hashing(self, seconds: float, decode_seconds_before: float) -> None:
+        """Time spent hashing since ``decode_seconds_before``, less the decoding it included."""
+        decode_seconds = self.hashing_service.decode_seconds - decode_seconds_before
+        self.timings["perceptual_hashing_ms"] = max(
+            0.0, round((seconds - decode_seconds) * 1000, 2)
+        )
+        self.timings["image_decoding_ms"] = round(self.hashing_service.decode_seconds * 1000, 2)
+
+    def finish(
+        self,
+        *,
+        groups_exact: list[GroupResult],
+        groups_very: list[GroupResult],
+        groups_possible: list[GroupResult],
+        comparisons: int,
+        first_group_ms: float | None = None,
+    ) -> ScanResult:
+        self.counts.update(service_counts(self.hashing_service, self.download_manager))
+        self.counts["comparisons_executed"] = comparisons
+        debug = build_scan_debug(
+            has_candidates=self.narrowing.has_candidates,
+            candidate_debug=self.narrowing.debug,
+            candidate_split=self.candidate_split,
+            comparisons_bound=self.counts["comparisons_bound"],
+            explain_enabled=self.explain_enabled,
+        )
+        self.counts.update(
+            narrowing_reason_counts(self.narrowing, explain_enabled=self.explain_enabled)
+        )
+        return ScanResult(
+            runId=self.run_id,
+            inputCount=len(self.photo_items),
+            stageMetrics=StageMetrics(
+                timingsMs=self.timings,
+                counts=self.counts,
+                debug=debug,
+                timeToFirstGroupMs=first_group_ms,
+            ),
+            costEstimate=estimate_costs(self.settings, self.counts),
+            groupsExact=groups_exact,
+            groupsVerySimilar=groups_very,
+            groupsPossiblySimilar=groups_possible,
+            failedItems=self.failed_items,
+        )
 
 
 def run_scan(
@@ -28,9 +253,121 @@ def run_scan(
     *,
     explain: bool = False,
     require_image_bytes: bool = False,
+    hashing_executor: Executor | None = None,
+    fingerprint_store: FingerprintStore | None = None,
+    progress: ProgressCallback | None = None,
+    on_groups: GroupsCallback | None = None,
+    stop: threading.Event | None = None,
 ) -> ScanResult:
-    run_id = uuid4().hex
-    photo_items = list(items)
+    """Scan a selection for exact and near duplicates.
+
+    ``progress`` receives throttled ``ScanProgress`` events while the scan runs. With
+    ``on_groups``, groups are handed over as soon as they are final: every exact group once
+    byte hashing is done, then the near-duplicate groups of each candidate bucket in turn.
+    Once ``stop`` is set the scan raises ``ScanCancelledError`` at its next download batch,
+    stage or candidate bucket.
+    """
+    scan_start = time.perf_counter()
+    first_group_ms: float | None = None
+    stages = ScanStages(
+        items,
+        settings,
+        explain=explain,
+        download_manager=download_manager,
+        hashing_executor=hashing_executor,
+        fingerprint_store=fingerprint_store,
+    )
+    hashing_service = stages.hashing_service
+    reporter = ProgressReporter(
+        progress,
+        total=len(stages.photo_items),
+        bytes_downloaded=lambda: stages.download_manager.bytes_downloaded,
+        interval_seconds=settings.scan_progress_interval_seconds,
+    )
+
+    reporter.stage("INGEST")
+    stages.narrow()
+
+    def advance(count: int) -> None:
+        _raise_if_stopped(stop)
+        reporter.advance(count)
+
+    _raise_if_stopped(stop)
+    reporter.stage("HASH")
+    byte_hashes = stages.hash_bytes(require_image_bytes=require_image_bytes, on_hashed=advance)
+    groups_exact = stages.group_exact(byte_hashes)
+    reporter.stage("COMPARE", groups_found=len(groups_exact))
+    if on_groups is not None:
+        on_groups(groups_exact)
+        if groups_exact:
+            first_group_ms = elapsed_ms(scan_start)
+
+    near_sets, near_pairs = stages.split_candidates(byte_hashes)
+
+    _raise_if_stopped(stop)
+    start = time.perf_counter()
+    decode_seconds_before_hashing = hashing_service.decode_seconds
+    # A streamed scan hashes each bucket just before grouping it, so its groups go out sooner.
+    hashed_first = (
+        [] if on_groups else [item for unit in [*near_sets, *near_pairs] for item in unit]
+    )
+    perceptual_hashes = {
+        item.id: hashing_service.get_perceptual_hashes(item) for item in hashed_first
+    }
+    global_pairs = stages.global_pairs(byte_hashes, perceptual_hashes)
+    perceptual_hashing_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bucket_hashing_seconds = 0.0
+    pairs = [*near_pairs, *global_pairs]
+    if on_groups is None:
+        groups_very, groups_possible, comparisons = group_near_duplicates(
+            near_sets, perceptual_hashes, stages.thresholds, pairs=pairs
+        )
+    else:
+        groups_very, groups_possible, comparisons = [], [], 0
+        for set_ids, pair_ids in connected_units(near_sets, pairs):
+            _raise_if_stopped(stop)
+            bucket_sets = [near_sets[index] for index in set_ids]
+            bucket_pairs = [pairs[index] for index in pair_ids]
+            hashing_start = time.perf_counter()
+            for unit in [*bucket_sets, *bucket_pairs]:
+                for item in unit:
+                    if item.id not in perceptual_hashes:
+                        perceptual_hashes[item.id] = hashing_service.get_perceptual_hashes(item)
+            bucket_hashing_seconds += time.perf_counter() - hashing_start
+            very, possible, bucket_comparisons = group_near_duplicates(
+                bucket_sets, perceptual_hashes, stages.thresholds, pairs=bucket_pairs
+            )
+            groups_very.extend(very)
+            groups_possible.extend(possible)
+            comparisons += bucket_comparisons
+            if very or possible:
+                on_groups([*very, *possible])
+                if first_group_ms is None:
+                    first_group_ms = elapsed_ms(scan_start)
+        # Buckets share no item, so this is the order a single grouping pass returns.
+        groups_very.sort(key=smallest_item_id)
+        groups_possible.sort(key=smallest_item_id)
+    near_grouping_ms = _exclusive_ms(start, bucket_hashing_seconds)
+    stages.record_perceptual_hashing(
+        perceptual_hashing_seconds + bucket_hashing_seconds, decode_seconds_before_hashing
+    )
+    stages.timings["near_grouping_ms"] = near_grouping_ms
+    reporter.finish(groups_found=len(groups_exact) + len(groups_very) + len(groups_possible))
+    return stages.finish(
+        groups_exact=groups_exact,
+        groups_very=groups_very,
+        groups_possible=groups_possible,
+        comparisons=comparisons,
+        first_group_ms=first_group_ms,
+    )
+
+
+def build_download_manager(
+    settings: Settings, *, max_bytes_per_scan: int | None = None
+) -> DownloadManager:
+    """Download manager for one scan; ``max_bytes_per_scan`` narrows the byte budget."""
     host_overrides = (
         settings.scan_download_host_overrides
         if settings.environment != RuntimeEnvironment.PRODUCTION
@@ -40,10 +377,14 @@ def run_scan(
         host_overrides
     )
     scan_budget = ScanDownloadBudget(
-        max_bytes=settings.scan_download_max_bytes_per_scan,
+        max_bytes=(
+            settings.scan_download_max_bytes_per_scan
+            if max_bytes_per_scan is None
+            else max_bytes_per_scan
+        ),
         wall_seconds=settings.scan_download_wall_seconds,
     )
-    download_manager = download_manager or DownloadManager(
+    return DownloadManager(
         allowed_hosts=settings.scan_allowed_download_hosts,
         host_overrides=host_overrides,
         allow_override_exceptions=allow_override_exceptions,
@@ -51,170 +392,583 @@ def run_scan(
         scan_budget=scan_budget,
         max_item_bytes=settings.scan_download_max_bytes_per_item,
         max_redirects=settings.scan_download_max_redirects,
+        cache_max_bytes=settings.scan_download_cache_max_bytes,
+        max_concurrency=settings.scan_download_concurrency,
+        max_per_host_concurrency=settings.scan_download_per_host_concurrency,
+        pool_max_idle=settings.scan_download_pool_max_idle,
+        pool_idle_seconds=settings.scan_download_pool_idle_seconds,
+        dns_ttl_seconds=settings.scan_download_dns_ttl_seconds,
     )
-    hashing_service = HashingService(download_manager)
-    timings: dict[str, float] = {}
-    counts: dict[str, int] = {"selected_images": len(photo_items)}
 
-    start = time.perf_counter()
-    explain_enabled = explain and settings.environment != RuntimeEnvironment.PRODUCTION
+
+def build_hashing_service(
+    settings: Settings,
+    download_manager: DownloadManager,
+    *,
+    hashing_executor: Executor | None = None,
+    fingerprint_store: FingerprintStore | None = None,
+) -> HashingService:
+    return HashingService(
+        download_manager,
+        phash_backend=settings.scan_phash_backend,
+        jpeg_draft_min_edge=settings.jpeg_draft_min_edge,
+        executor=hashing_executor or get_hashing_executor(settings.scan_hash_workers),
+        fingerprint_store=fingerprint_store,
+    )
+
+
+def narrow_candidates(
+    photo_items: list[PhotoItem], settings: Settings, *, explain_enabled: bool
+) -> CandidateNarrowing:
     candidate_debug: CandidateDebug | None = None
-    if explain_enabled:
-        candidate_sets, candidate_debug = build_candidate_sets_with_debug(photo_items)
+    candidate_sets: list[list[PhotoItem]] = []
+    candidate_pairs: list[tuple[PhotoItem, PhotoItem]] = []
+    if settings.scan_candidate_strategy == CandidateStrategy.WINDOW:
+        if explain_enabled:
+            candidate_pairs, candidate_debug = build_candidate_pairs_with_debug(
+                photo_items,
+                window_seconds=settings.scan_candidate_window_seconds,
+                aspect_tolerance=settings.candidate_aspect_tolerance,
+                geohash_precision=settings.candidate_geohash_precision,
+                geo_window_seconds=settings.scan_candidate_geo_window_seconds,
+                exposure_stops=settings.candidate_exposure_stops,
+            )
+        else:
+            candidate_pairs = build_candidate_pairs(
+                photo_items,
+                window_seconds=settings.scan_candidate_window_seconds,
+                aspect_tolerance=settings.candidate_aspect_tolerance,
+                geohash_precision=settings.candidate_geohash_precision,
+                geo_window_seconds=settings.scan_candidate_geo_window_seconds,
+                exposure_stops=settings.candidate_exposure_stops,
+            )
+    elif explain_enabled:
+        candidate_sets, candidate_pairs, candidate_debug = build_candidate_sets_with_debug(
+            photo_items,
+            geohash_precision=settings.candidate_geohash_precision,
+            exposure_stops=settings.candidate_exposure_stops,
+        )
     else:
-        candidate_sets = build_candidate_sets(photo_items)
-    timings["candidate_narrowing_ms"] = _elapsed_ms(start)
-    counts["candidate_sets"] = len(candidate_sets)
-    counts["candidate_items"] = sum(len(group) for group in candidate_sets)
-    pre_fallback_candidate_sets = candidate_sets
-
+        candidate_sets, candidate_pairs = build_candidate_sets(
+            photo_items,
+            geohash_precision=settings.candidate_geohash_precision,
+            exposure_stops=settings.candidate_exposure_stops,
+        )
+    has_candidates = bool(candidate_sets or candidate_pairs)
     fallback_sets = _build_small_input_fallback(
-        candidate_sets,
+        has_candidates,
         photo_items,
         settings.scan_small_input_fallback_max,
     )
-    fallback_candidate_items = sum(len(group) for group in fallback_sets)
-    counts["fallback_triggered"] = 1 if fallback_sets else 0
-    counts["fallback_candidate_items"] = fallback_candidate_items
-    if fallback_sets:
-        candidate_sets = fallback_sets
-        counts["candidate_sets"] = len(candidate_sets)
-        counts["candidate_items"] = fallback_candidate_items
+    return CandidateNarrowing(
+        sets=fallback_sets or candidate_sets,
+        pairs=candidate_pairs,
+        debug=candidate_debug,
+        has_candidates=has_candidates,
+    )
 
-    start = time.perf_counter()
-    byte_hashes: dict[str, str] = {}
-    failed_items: list[ScanItemIssue] = []
-    download_errors: list[ValueError] = []
+
+def narrowing_counts(narrowing: CandidateNarrowing) -> dict[str, int]:
+    fallback_triggered = not narrowing.has_candidates and bool(narrowing.sets)
+    return {
+        "candidate_sets": len(narrowing.sets),
+        "candidate_pairs": len(narrowing.pairs),
+        "candidate_items": len(candidate_item_ids(narrowing.sets, narrowing.pairs)),
+        "fallback_triggered": 1 if fallback_triggered else 0,
+        "fallback_candidate_items": (
+            sum(len(group) for group in narrowing.sets) if fallback_triggered else 0
+        ),
+    }
+
+
+def narrowing_reason_counts(
+    narrowing: CandidateNarrowing, *, explain_enabled: bool
+) -> dict[str, int]:
+    candidate_debug = narrowing.debug
+    if not explain_enabled or not candidate_debug:
+        return {}
+    return {
+        "narrowing_reason_dropped_missing_dims": len(candidate_debug.missing_dims_ids),
+        "narrowing_reason_time_bucket_mismatch": len(candidate_debug.time_bucket_mismatch_ids),
+        "narrowing_reason_mime_mismatch": len(candidate_debug.mime_mismatch_ids),
+    }
+
+
+def hash_item_bytes(
+    photo_items: list[PhotoItem],
+    candidate_ids: set[str],
+    hashing_service: HashingService,
+    download_manager: DownloadManager,
+    settings: Settings,
+    *,
+    require_image_bytes: bool,
+    on_hashed: Callable[[int], None] | None = None,
+) -> ByteHashing:
+    """Fetch and byte-hash every item, decoding those that take part in near matching.
+
+    Unreadable items become issues; a download failure fatal to the scan is raised.
+    ``on_hashed`` is told how many more items are done after each batch.
+    """
+    report = on_hashed or _ignore_count
+    hashed = ByteHashing()
+    stream_exact_only = settings.scan_stream_exact_only_items
+    streamed_items: list[PhotoItem] = []
+    buffered_items: list[PhotoItem] = []
     for item in photo_items:
         if item.download_url is None:
             if require_image_bytes:
-                failed_items.append(
-                    ScanItemIssue(
-                        itemId=item.id,
-                        reasonCode="MISSING_DOWNLOAD_URL",
-                        message="This item did not include image bytes for scanning.",
-                    )
-                )
-            continue
-        try:
-            hashing_service.validate_image(item)
-            byte_hashes[item.id] = hashing_service.get_byte_hash(item)
-        except DownloadSecurityError as exc:
-            if exc.fatal_to_scan:
-                raise
-            download_errors.append(exc)
-            failed_items.append(
-                ScanItemIssue(
-                    itemId=item.id,
-                    reasonCode="IMAGE_BYTES_UNAVAILABLE",
-                    message="PhotoPrune could not read this item's image bytes.",
-                )
-            )
-        except ValueError as exc:
-            download_errors.append(exc)
-            failed_items.append(
-                ScanItemIssue(
+                hashed.issues[item.id] = ScanItemIssue(
                     itemId=item.id,
-                    reasonCode="IMAGE_BYTES_UNAVAILABLE",
-                    message="PhotoPrune could not read this item's image bytes.",
-                )
-            )
-        except (HTTPClientException, Image.DecompressionBombError, OSError):
-            failed_items.append(
-                ScanItemIssue(
-                    itemId=item.id,
-                    reasonCode="IMAGE_BYTES_UNAVAILABLE",
-                    message="PhotoPrune could not read this item's image bytes.",
+                    reasonCode="MISSING_DOWNLOAD_URL",
+                    message="This item did not include image bytes for scanning.",
                 )
+            continue
+        # Stored fingerprints were validated when recorded, so these items skip the download
+        # unless they take part in near matching and were stored without perceptual hashes.
+        stored = hashing_service.get_stored_fingerprint(item)
+        if stored is not None and (stored.has_perceptual_hashes or item.id not in candidate_ids):
+            hashed.stored_count += 1
+            hashed.byte_hashes[item.id] = hashing_service.get_byte_hash(item)
+        elif stream_exact_only and item.id not in candidate_ids:
+            streamed_items.append(item)
+        else:
+            buffered_items.append(item)
+
+    # Downloads complete in any order; results are always consumed in selection order.
+    stream_failures = download_manager.fetch_many(streamed_items, buffer=False)
+    for item in streamed_items:
+        if item.id in stream_failures:
+            hashed.issues[item.id] = _unreadable_item_issue(
+                item, stream_failures[item.id], hashed.download_errors
             )
-    if require_image_bytes and photo_items and not byte_hashes:
-        security_error = next(
-            (error for error in download_errors if isinstance(error, DownloadSecurityError)),
-            None,
-        )
-        if security_error is not None:
-            raise security_error
-        raise DownloadSecurityError(
-            "download_content",
-            "None of the selected photos supplied readable image bytes. "
-            "Please select them again and retry.",
-        )
-    timings["byte_hashing_ms"] = _elapsed_ms(start)
-    counts["byte_hashes"] = hashing_service.byte_hash_count
+        else:
+            hashed.byte_hashes[item.id] = hashing_service.get_byte_hash(item)
+    hashed.streamed_count = len(streamed_items) - len(stream_failures)
+    report(len(photo_items) - len(buffered_items))
+    hash_buffered = (
+        _hash_buffered_serially
+        if settings.pipeline_queue_depth is None
+        else _hash_buffered_pipelined
+    )
+    hashed.downloaded_count = hashed.streamed_count + hash_buffered(
+        buffered_items,
+        candidate_ids,
+        hashing_service,
+        download_manager,
+        hashed.byte_hashes,
+        hashed.issues,
+        hashed.download_errors,
+        queue_depth=settings.pipeline_queue_depth or 1,
+        on_hashed=report,
+    )
+    # Every selected item has been fetched; keep-alive sockets are not held through grouping.
+    download_manager.close_idle_connections()
+    return hashed
 
-    start = time.perf_counter()
-    groups_exact = group_exact_duplicates(photo_items, byte_hashes)
-    timings["exact_grouping_ms"] = _elapsed_ms(start)
 
+def raise_if_unreadable(
+    photo_items: list[PhotoItem],
+    byte_hashes: dict[str, str],
+    download_errors: list[ValueError],
+) -> None:
+    """Fail a scan that needed image bytes when not one item supplied readable ones."""
+    if not photo_items or byte_hashes:
+        return
+    security_error = next(
+        (error for error in download_errors if isinstance(error, DownloadSecurityError)),
+        None,
+    )
+    if security_error is not None:
+        raise security_error
+    raise DownloadSecurityError(
+        "download_content",
+        "None of the selected photos supplied readable image bytes. "
+        "Please select them again and retry.",
+    )
+
+
+def near_duplicate_items(
+    photo_items: Iterable[PhotoItem], byte_hashes: dict[str, str]
+) -> list[PhotoItem]:
+    """Hashed items that are not byte-identical to another item of the selection."""
     exact_hash_counts: dict[str, int] = defaultdict(int)
     for digest in byte_hashes.values():
         exact_hash_counts[digest] += 1
-    exact_duplicate_ids = {
-        item_id for item_id, digest in byte_hashes.items() if exact_hash_counts[digest] >= 2
+    return [
+        item
+        for item in photo_items
+        if item.id in byte_hashes and exact_hash_counts[byte_hashes[item.id]] < 2
+    ]
+
+
+def global_near_pairs(
+    global_items: list[PhotoItem],
+    perceptual_hashes: dict[str, PerceptualHashes],
+    thresholds: SimilarityThresholds,
+    bands: int,
+) -> list[tuple[PhotoItem, PhotoItem]]:
+    """Pairs of ``global_items`` that may be within either hash's widest threshold."""
+    found: set[tuple[int, int]] = set()
+    for column, radius in [
+        (
+            [perceptual_hashes[item.id].dhash for item in global_items],
+            max(thresholds.dhash_very, thresholds.dhash_possible),
+        ),
+        (
+            [perceptual_hashes[item.id].phash for item in global_items],
+            max(thresholds.phash_very, thresholds.phash_possible),
+        ),
+    ]:
+        found.update(banded_pairs(column, bands, radius))
+    return [(global_items[left], global_items[right]) for left, right in sorted(found)]
+
+
+def near_duplicate_candidates(
+    narrowing: CandidateNarrowing,
+    byte_hashes: dict[str, str],
+    coarse_hash: Callable[[PhotoItem], int | None],
+    *,
+    max_items: int,
+    max_comparisons: int,
+) -> tuple[list[list[PhotoItem]], list[tuple[PhotoItem, PhotoItem]], CandidateSplit]:
+    """Candidate sets and pairs left to compare once exact duplicates are grouped."""
+    eligible = {
+        item.id
+        for item in near_duplicate_items(
+            (item for group in [*narrowing.sets, *narrowing.pairs] for item in group),
+            byte_hashes,
+        )
     }
+    hashable_sets = [
+        hashable
+        for hashable in (
+            [item for item in group if item.id in eligible] for group in narrowing.sets
+        )
+        if len(hashable) >= 2
+    ]
+    hashable_pairs = [pair for pair in narrowing.pairs if all(item.id in eligible for item in pair)]
+    hashable_sets, split_pairs, candidate_split = split_oversized_sets(
+        hashable_sets, coarse_hash, max_items=max_items, max_comparisons=max_comparisons
+    )
+    return hashable_sets, [*hashable_pairs, *split_pairs], candidate_split
+
+
+def _raise_if_stopped(stop: threading.Event | None) -> None:
+    if stop is not None and stop.is_set():
+        raise ScanCancelledError("The scan was cancelled.")
+
 
-    hashable_candidate_sets = [
-        [item for item in group if item.id in byte_hashes and item.id not in exact_duplicate_ids]
-        for group in candidate_sets
+def connected_units(
+    sets: list[list[PhotoItem]], pairs: list[tuple[PhotoItem, PhotoItem]]
+) -> list[tuple[list[int], list[int]]]:
+    """Set and pair indexes of candidate buckets, where no two buckets share an item.
+
+    No near-duplicate edge crosses buckets, so each can be grouped on its own. Buckets come
+    in order of their first unit and keep their units in the original order. WINDOW pairs
+    overlap from photo to photo, so a busy day chains into a single bucket: its groups are
+    streamed, and a stop request is honoured, only once that whole bucket is grouped.
+    """
+    units: list[Sequence[PhotoItem]] = [*sets, *pairs]
+    connected = DisjointSet(len(units))
+    first_unit: dict[str, int] = {}
+    for index, unit in enumerate(units):
+        for item in unit:
+            connected.union(first_unit.setdefault(item.id, index), index)
+    return [
+        (
+            [index for index in component if index < len(sets)],
+            [index - len(sets) for index in component if index >= len(sets)],
+        )
+        for component in connected.components(min_size=1)
     ]
-    hashable_candidate_sets = [group for group in hashable_candidate_sets if len(group) >= 2]
 
-    start = time.perf_counter()
-    perceptual_hashes = {
-        item.id: hashing_service.get_perceptual_hashes(item)
-        for group in hashable_candidate_sets
-        for item in group
-    }
-    thresholds = SimilarityThresholds(
+
+def comparison_bound(
+    candidate_sets: Sequence[Sequence[PhotoItem]],
+    candidate_pairs: Sequence[tuple[PhotoItem, PhotoItem]],
+) -> int:
+    """Most comparisons grouping the given sets and pairs can take."""
+    return len(candidate_pairs) + sum(
+        len(group) * (len(group) - 1) // 2 for group in candidate_sets
+    )
+
+
+def smallest_item_id(group: GroupResult) -> str:
+    return min(item.id for item in group.items)
+
+
+def similarity_thresholds(settings: Settings) -> SimilarityThresholds:
+    return SimilarityThresholds(
         dhash_very=settings.scan_dhash_threshold_very,
         dhash_possible=settings.scan_dhash_threshold_possible,
         phash_very=settings.scan_phash_threshold_very,
         phash_possible=settings.scan_phash_threshold_possible,
     )
-    groups_very, groups_possible, comparisons = group_near_duplicates(
-        hashable_candidate_sets,
-        perceptual_hashes,
-        thresholds,
-    )
-    timings["perceptual_hashing_ms"] = _elapsed_ms(start)
-    counts["perceptual_hashes"] = hashing_service.perceptual_hash_count
-    counts["comparisons_executed"] = comparisons
-    counts["downloads_performed"] = download_manager.download_count
-
-    debug = _build_scan_debug(
-        candidate_sets=pre_fallback_candidate_sets,
-        candidate_debug=candidate_debug,
-        explain_enabled=explain_enabled,
+
+
+def service_counts(
+    hashing_service: HashingService, download_manager: DownloadManager
+) -> dict[str, int]:
+    """Work counters of one scan's hashing service and download manager."""
+    return {
+        "images_decoded": hashing_service.decode_count,
+        "images_draft_decoded": hashing_service.draft_decode_count,
+        "perceptual_hashes": hashing_service.perceptual_hash_count,
+        "downloads_performed": download_manager.download_count,
+        "download_peak_bytes_held": download_manager.peak_bytes_held,
+        "download_cache_evictions": download_manager.cache_eviction_count,
+        "download_connections_opened": download_manager.connections_opened,
+        "download_connections_reused": download_manager.connections_reused,
+        "tls_handshakes_full": download_manager.tls_handshakes_full,
+        "tls_handshakes_resumed": download_manager.tls_handshakes_resumed,
+        "dns_lookups": download_manager.dns_lookups,
+        "dns_cache_hits": download_manager.dns_cache_hits,
+    }
+
+
+def _hash_buffered_serially(
+    items: list[PhotoItem],
+    candidate_ids: set[str],
+    hashing_service: HashingService,
+    download_manager: DownloadManager,
+    byte_hashes: dict[str, str],
+    issues: dict[str, ScanItemIssue],
+    download_errors: list[ValueError],
+    *,
+    queue_depth: int,
+    on_hashed: Callable[[int], None],
+) -> int:
+    """Alternate between downloading a batch and hashing what the byte cache holds."""
+    downloaded_count = 0
+    window: list[PhotoItem] = []
+    position = 0
+    while position < len(items):
+        # In-flight downloads reserve cache room until stored, so held bytes are never evicted.
+        if window and not download_manager.has_download_room():
+            _hash_window(
+                window,
+                candidate_ids,
+                hashing_service,
+                download_manager,
+                byte_hashes,
+                issues,
+                download_errors,
+            )
+            on_hashed(len(window))
+            window = []
+            continue
+        taken, download_failures = download_manager.fetch_while_room(items[position:])
+        batch = items[position : position + taken]
+        position += taken
+        for item in batch:
+            if item.id in download_failures:
+                issues[item.id] = _unreadable_item_issue(
+                    item, download_failures[item.id], download_errors
+                )
+            else:
+                downloaded_count += 1
+                window.append(item)
+        on_hashed(len(download_failures))
+    _hash_window(
+        window,
+        candidate_ids,
+        hashing_service,
+        download_manager,
+        byte_hashes,
+        issues,
+        download_errors,
     )
-    if explain_enabled and candidate_debug:
-        counts.update(
-            {
-                "narrowing_reason_dropped_missing_dims": len(candidate_debug.missing_dims_ids),
-                "narrowing_reason_time_bucket_mismatch": len(
-                    candidate_debug.time_bucket_mismatch_ids
-                ),
-                "narrowing_reason_mime_mismatch": len(candidate_debug.mime_mismatch_ids),
-            }
+    on_hashed(len(window))
+    return downloaded_count
+
+
+def _hash_buffered_pipelined(
+    items: list[PhotoItem],
+    candidate_ids: set[str],
+    hashing_service: HashingService,
+    download_manager: DownloadManager,
+    byte_hashes: dict[str, str],
+    issues: dict[str, ScanItemIssue],
+    download_errors: list[ValueError],
+    *,
+    queue_depth: int,
+    on_hashed: Callable[[int], None],
+) -> int:
+    """Hash each downloaded batch while the download stage fetches the next ones.
+
+    Batches are consumed in selection order, so caches, counters and issues end up the
+    same as with ``_hash_buffered_serially``.
+    """
+    downloaded_count = 0
+    with _DownloadStage(items, download_manager, queue_depth) as stage:
+        for batch in stage.batches():
+            window: list[PhotoItem] = []
+            for item, failure in batch:
+                if failure is not None:
+                    issues[item.id] = _unreadable_item_issue(item, failure, download_errors)
+                else:
+                    downloaded_count += 1
+                    window.append(item)
+            _hash_window(
+                window,
+                candidate_ids,
+                hashing_service,
+                download_manager,
+                byte_hashes,
+                issues,
+                download_errors,
+            )
+            stage.done(len(batch))
+            on_hashed(len(batch))
+    return downloaded_count
+
+
+class _DownloadStage:
+    """Downloads items on a background thread, ahead of the stage hashing them.
+
+    At most ``depth`` items are downloaded but not yet marked done, and downloads only start
+    while the byte cache has room for them, so held bytes are bounded by the queue rather than
+    by the library. Items come out in selection order together with their download failure.
+    """
+
+    def __init__(
+        self, items: list[PhotoItem], download_manager: DownloadManager, depth: int
+    ) -> None:
+        self._items = items
+        self._download_manager = download_manager
+        self._depth = depth
+        self._held = 0
+        self._stopped = False
+        self._changed = threading.Condition()
+        self._ready: queue.SimpleQueue[list[tuple[PhotoItem, Exception | None]] | None] = (
+            queue.SimpleQueue()
         )
-    stage_metrics = StageMetrics(
-        timingsMs=timings,
-        counts=counts,
-        debug=debug,
-    )
-    cost_estimate = _estimate_costs(settings, counts)
-    return ScanResult(
-        runId=run_id,
-        inputCount=len(photo_items),
-        stageMetrics=stage_metrics,
-        costEstimate=cost_estimate,
-        groupsExact=groups_exact,
-        groupsVerySimilar=groups_very,
-        groupsPossiblySimilar=groups_possible,
-        failedItems=failed_items,
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._run, name="scan-downloads", daemon=True)
+
+    def __enter__(self) -> _DownloadStage:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        with self._changed:
+            self._stopped = True
+            self._changed.notify_all()
+        self._thread.join()
+
+    def batches(self) -> Iterator[list[tuple[PhotoItem, Exception | None]]]:
+        """Every downloaded batch, joining those already waiting so hashing sees larger runs."""
+        finished = False
+        while not finished:
+            batch = self._ready.get()
+            if batch is None:
+                break
+            while True:
+                try:
+                    waiting = self._ready.get_nowait()
+                except queue.Empty:
+                    break
+                if waiting is None:
+                    finished = True
+                    break
+                batch.extend(waiting)
+            yield batch
+        if self._error is not None:
+            raise self._error
+
+    def done(self, count: int) -> None:
+        with self._changed:
+            self._held -= count
+            self._changed.notify_all()
+
+    def _run(self) -> None:
+        try:
+            position = 0
+            while position < len(self._items):
+                size = self._reserve(len(self._items) - position)
+                if size == 0:
+                    return
+                taken, failures = self._download_manager.fetch_while_room(
+                    self._items[position : position + size]
+                )
+                batch = self._items[position : position + taken]
+                position += taken
+                with self._changed:
+                    self._held += taken
+                self._ready.put([(item, failures.get(item.id)) for item in batch])
+                if any(
+                    isinstance(failure, DownloadSecurityError) and failure.fatal_to_scan
+                    for failure in failures.values()
+                ):
+                    return
+        except BaseException as exc:
+            self._error = exc
+        finally:
+            self._ready.put(None)
+
+    def _reserve(self, remaining: int) -> int:
+        """Wait for room to download more and return how many may start; zero once stopped."""
+        with self._changed:
+            # In-flight downloads reserve cache room until stored, so held bytes are never
+            # evicted; with the cache full, one item may still start once nothing is held.
+            self._changed.wait_for(
+                lambda: self._stopped
+                or (
+                    self._held < self._depth
+                    and (self._held == 0 or self._download_manager.has_download_room())
+                )
+            )
+            if self._stopped:
+                return 0
+            return min(remaining, self._depth - self._held)
+
+
+def _hash_window(
+    window: list[PhotoItem],
+    candidate_ids: set[str],
+    hashing_service: HashingService,
+    download_manager: DownloadManager,
+    byte_hashes: dict[str, str],
+    issues: dict[str, ScanItemIssue],
+    download_errors: list[ValueError],
+) -> None:
+    # Decoding validates every image, in worker processes when a pool is configured. After
+    # that only the small pixel derivatives are needed, so the raw bytes are released.
+    decode_failures = hashing_service.decode_images(window)
+    for item in window:
+        if item.id in decode_failures:
+            issues[item.id] = _unreadable_item_issue(
+                item, decode_failures[item.id], download_errors
+            )
+        else:
+            byte_hashes[item.id] = hashing_service.get_byte_hash(item)
+            hashing_service.record_fingerprint(item, perceptual=item.id in candidate_ids)
+        download_manager.release(item)
+
+
+def _ignore_count(_count: int) -> None:
+    return None
+
+
+def _unreadable_item_issue(
+    item: PhotoItem, exc: Exception, download_errors: list[ValueError]
+) -> ScanItemIssue:
+    if isinstance(exc, DownloadSecurityError) and exc.fatal_to_scan:
+        raise exc
+    if not isinstance(
+        exc, HTTPClientException | Image.DecompressionBombError | OSError | ValueError
+    ):
+        raise exc
+    if isinstance(exc, ValueError):
+        download_errors.append(exc)
+    return ScanItemIssue(
+        itemId=item.id,
+        reasonCode="IMAGE_BYTES_UNAVAILABLE",
+        message="PhotoPrune could not read this item's image bytes.",
     )
 
 
-def _estimate_costs(settings: Settings, counts: dict[str, int]) -> CostEstimate:
+def estimate_costs(settings: Settings, counts: dict[str, int]) -> CostEstimate:
     download_cost = counts.get("downloads_performed", 0) * settings.scan_cost_per_download
     hash_cost = (
         counts.get("byte_hashes", 0) * settings.scan_cost_per_byte_hash
@@ -230,25 +984,38 @@ def _estimate_costs(settings: Settings, counts: dict[str, int]) -> CostEstimate:
     )
 
 
-def _elapsed_ms(start: float) -> float:
+def elapsed_ms(start: float) -> float:
     return round((time.perf_counter() - start) * 1000, 2)
 
 
-def _build_small_input_fallback(
+def _exclusive_ms(start: float, excluded_seconds: float) -> float:
+    return max(0.0, round((time.perf_counter() - start - excluded_seconds) * 1000, 2))
+
+
+def candidate_item_ids(
     candidate_sets: list[list[PhotoItem]],
+    candidate_pairs: list[tuple[PhotoItem, PhotoItem]],
+) -> set[str]:
+    return {item.id for group in [*candidate_sets, *candidate_pairs] for item in group}
+
+
+def _build_small_input_fallback(
+    has_candidates: bool,
     photo_items: list[PhotoItem],
     fallback_max: int,
 ) -> list[list[PhotoItem]]:
-    if candidate_sets or len(photo_items) > fallback_max:
+    if has_candidates or len(photo_items) > fallback_max:
         return []
     ordered = sorted(photo_items, key=lambda entry: (entry.create_time, entry.id))
     return [ordered] if len(ordered) >= 2 else []
 
 
-def _build_scan_debug(
+def build_scan_debug(
     *,
-    candidate_sets: list[list[PhotoItem]],
+    has_candidates: bool,
     candidate_debug: CandidateDebug | None,
+    candidate_split: CandidateSplit,
+    comparisons_bound: int,
     explain_enabled: bool,
 ) -> dict[str, object] | None:
     if not explain_enabled or candidate_debug is None:
@@ -256,7 +1023,31 @@ def _build_scan_debug(
     debug: dict[str, object] = {
         "candidate_bucket_sizes": candidate_debug.bucket_size_counts,
     }
-    if not candidate_sets:
+    if candidate_debug.geo_cells:
+        debug["candidate_geo"] = {
+            "cells": candidate_debug.geo_cells,
+            "rejections": candidate_debug.geo_rejections,
+            "extended_pairs": candidate_debug.geo_extended_pairs,
+        }
+    if candidate_debug.camera_rejections:
+        debug["candidate_camera"] = {"rejections": candidate_debug.camera_rejections}
+    if candidate_debug.window_seconds is not None:
+        debug["candidate_window"] = {
+            "seconds": candidate_debug.window_seconds,
+            "pairs": candidate_debug.window_pairs,
+            "peak_items": candidate_debug.window_peak_items,
+            "aspect_rejections": candidate_debug.window_aspect_rejections,
+        }
+    if candidate_split.sets_split:
+        debug["candidate_splits"] = {
+            "sets_split": candidate_split.sets_split,
+            "items_split": candidate_split.items_split,
+            "items_without_coarse_hash": candidate_split.items_without_coarse_hash,
+            "comparisons_before": candidate_split.comparisons_before,
+            "pairs_kept": candidate_split.pairs_kept,
+            "comparisons_bound": comparisons_bound,
+        }
+    if not has_candidates:
         debug["candidate_sets_empty"] = True
         debug["narrowing_reasons"] = {
             "missing_dims": candidate_debug.missing_dims_ids,
@@ -188,6 +188,12 @@ class StageMetrics(BaseModel):
     timings_ms: dict[str, float] = Field(alias="timingsMs")
     counts: dict[str, int]
     debug: dict[str, Any] | None = None
+    # Per-shard stage timings of a sharded scan, keyed like ``hash-0`` or ``group-1``.
+    shard_timings_ms: dict[str, dict[str, float]] | None = Field(
+        default=None, alias="shardTimingsMs"
+    )
+    # Wall time from the start of a streamed scan until its first group was handed over.
+    time_to_first_group_ms: float | None = Field(default=None, alias="timeToFirstGroupMs")
 
 
 class CostEstimate(BaseModel):
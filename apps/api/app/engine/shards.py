@@ -0,0 +1,423 @@
+"""Scatter/gather scans: item shards fetch and hash, bucket shards group near duplicates.
+
+Shard payloads and outcomes are plain JSON so any worker can run them. Candidate sets and
+pairs that share an item always land in the same group shard, so no near-duplicate edge
+crosses shards and the gathered groups equal those of a single-process ``run_scan``.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Iterable, Sequence
+from dataclasses import asdict
+from datetime import datetime
+from enum import StrEnum
+from typing import Any, Protocol
+from uuid import uuid4
+
+from app.core.config import RuntimeEnvironment, Settings
+from app.engine.downloads import DownloadSecurityError
+from app.engine.grouping import (
+    SimilarityThresholds,
+    group_exact_duplicates,
+    group_near_duplicates,
+)
+from app.engine.hashing import PerceptualHashes
+from app.engine.models import CaptureSettings, GPSLocation, PhotoItem
+from app.engine.progress import ProgressCallback, ProgressReporter
+from app.engine.scan import (
+    build_download_manager,
+    build_hashing_service,
+    build_scan_debug,
+    candidate_item_ids,
+    comparison_bound,
+    connected_units,
+    elapsed_ms,
+    estimate_costs,
+    global_near_pairs,
+    hash_item_bytes,
+    narrow_candidates,
+    narrowing_counts,
+    narrowing_reason_counts,
+    near_duplicate_candidates,
+    near_duplicate_items,
+    raise_if_unreadable,
+    service_counts,
+    similarity_thresholds,
+    smallest_item_id,
+)
+from app.engine.schemas import GroupResult, ScanItemIssue, ScanResult, StageMetrics
+
+# Counters that report a high-water mark rather than work done, so shards take the maximum.
+PEAK_COUNTS = frozenset({"download_peak_bytes_held"})
+
+
+class ShardStage(StrEnum):
+    HASH = "hash"
+    GROUP = "group"
+
+
+class ShardRunner(Protocol):
+    def map(self, stage: ShardStage, payloads: Sequence[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Run one shard per payload and return their outcomes in payload order."""
+        ...
+
+
+class LocalShards:
+    """Runs shards one after another in this process; the reference for remote runners."""
+
+    def __init__(self, settings: Settings) -> None:
+        self._settings = settings
+
+    def map(self, stage: ShardStage, payloads: Sequence[dict[str, Any]]) -> list[dict[str, Any]]:
+        return [run_shard(stage, payload, self._settings) for payload in payloads]
+
+
+def run_shard(stage: ShardStage, payload: dict[str, Any], settings: Settings) -> dict[str, Any]:
+    if stage == ShardStage.HASH:
+        return hash_shard(payload, settings)
+    return group_shard(payload)
+
+
+def run_sharded_scan(
+    items: Iterable[PhotoItem],
+    settings: Settings,
+    shards: ShardRunner,
+    *,
+    shard_count: int,
+    explain: bool = False,
+    require_image_bytes: bool = False,
+    progress: ProgressCallback | None = None,
+) -> ScanResult:
+    """``run_scan`` with downloading and hashing split by item and grouping by bucket.
+
+    Each hash shard gets an equal share of the per-scan download budget, since shards
+    cannot draw on a common one. Sizes are not known before downloading, so a shard that
+    happens to hold several large items can exhaust its share and fail the scan with
+    ``download_size`` where a single-process scan of the same selection stays within it.
+    ``timingsMs`` holds the coordinator's wall time per stage and ``shardTimingsMs`` each
+    shard's own.
+    """
+    run_id = uuid4().hex
+    photo_items = list(items)
+    timings: dict[str, float] = {}
+    shard_timings: dict[str, dict[str, float]] = {}
+    counts: dict[str, int] = {"selected_images": len(photo_items)}
+    bytes_downloaded = 0
+    reporter = ProgressReporter(
+        progress,
+        total=len(photo_items),
+        bytes_downloaded=lambda: bytes_downloaded,
+        interval_seconds=settings.scan_progress_interval_seconds,
+    )
+
+    start = time.perf_counter()
+    reporter.stage("INGEST")
+    explain_enabled = explain and settings.environment != RuntimeEnvironment.PRODUCTION
+    narrowing = narrow_candidates(photo_items, settings, explain_enabled=explain_enabled)
+    timings["candidate_narrowing_ms"] = elapsed_ms(start)
+    counts.update(narrowing_counts(narrowing))
+    global_search = settings.scan_global_near_duplicates
+
+    start = time.perf_counter()
+    reporter.stage("HASH")
+    candidate_ids = (
+        {item.id for item in photo_items}
+        if global_search
+        else candidate_item_ids(narrowing.sets, narrowing.pairs)
+    )
+    item_shards = _split_items(photo_items, shard_count)
+    max_bytes = settings.scan_download_max_bytes_per_scan // max(len(item_shards), 1)
+    hash_outcomes = shards.map(
+        ShardStage.HASH,
+        [
+            {
+                "items": [item_to_json(item) for item in shard],
+                "candidateIds": sorted(candidate_ids.intersection(item.id for item in shard)),
+                "maxBytes": max_bytes,
+                "requireImageBytes": require_image_bytes,
+            }
+            for shard in item_shards
+        ],
+    )
+    byte_hashes: dict[str, str] = {}
+    issues: dict[str, ScanItemIssue] = {}
+    perceptual_hashes: dict[str, PerceptualHashes] = {}
+    coarse_hashes: dict[str, int | None] = {}
+    download_errors: list[ValueError] = []
+    for index, outcome in enumerate(hash_outcomes):
+        if "fatal" in outcome:
+            fatal = outcome["fatal"]
+            raise DownloadSecurityError(fatal["category"], fatal["message"], fatal_to_scan=True)
+        byte_hashes.update(outcome["byteHashes"])
+        issues.update(
+            (issue.item_id, issue)
+            for issue in (ScanItemIssue.model_validate(entry) for entry in outcome["issues"])
+        )
+        for item_id, (dhash, phash, coarse_hash) in outcome["hashes"].items():
+            perceptual_hashes[item_id] = PerceptualHashes(dhash=dhash, phash=phash)
+            coarse_hashes[item_id] = coarse_hash
+        if outcome.get("securityError"):
+            error = outcome["securityError"]
+            download_errors.append(DownloadSecurityError(error["category"], error["message"]))
+        _merge_counts(counts, outcome["counts"])
+        shard_timings[f"hash-{index}"] = outcome["timingsMs"]
+        bytes_downloaded += outcome["bytesDownloaded"]
+        reporter.advance(len(item_shards[index]))
+    failed_items = [issues[item.id] for item in photo_items if item.id in issues]
+    if require_image_bytes:
+        raise_if_unreadable(photo_items, byte_hashes, download_errors)
+    timings["shard_hashing_ms"] = elapsed_ms(start)
+    counts["hash_store_hits"] = 0
+    counts["hash_store_misses"] = 0
+
+    start = time.perf_counter()
+    groups_exact = group_exact_duplicates(photo_items, byte_hashes)
+    timings["exact_grouping_ms"] = elapsed_ms(start)
+    reporter.stage("COMPARE", groups_found=len(groups_exact))
+
+    start = time.perf_counter()
+    near_sets, near_pairs, candidate_split = near_duplicate_candidates(
+        narrowing,
+        byte_hashes,
+        lambda item: coarse_hashes[item.id],
+        max_items=settings.scan_candidate_max_set_items,
+        max_comparisons=settings.scan_candidate_max_comparisons,
+    )
+    timings["candidate_splitting_ms"] = elapsed_ms(start)
+    counts["candidate_sets_split"] = candidate_split.sets_split
+    counts["comparisons_skipped"] = candidate_split.comparisons_before - candidate_split.pairs_kept
+    counts["comparisons_bound"] = comparison_bound(near_sets, near_pairs)
+
+    start = time.perf_counter()
+    global_items = near_duplicate_items(photo_items, byte_hashes) if global_search else []
+    global_pairs = global_near_pairs(
+        global_items,
+        perceptual_hashes,
+        similarity_thresholds(settings),
+        settings.scan_global_lsh_bands,
+    )
+    counts["global_lsh_pairs"] = len(global_pairs)
+    counts["comparisons_bound"] += len(global_pairs)
+    pairs = [*near_pairs, *global_pairs]
+    thresholds = asdict(similarity_thresholds(settings))
+    bucket_shards = _split_buckets(near_sets, pairs, shard_count)
+    group_outcomes = shards.map(
+        ShardStage.GROUP,
+        [
+            _group_payload(
+                [near_sets[index] for index in set_ids],
+                [pairs[index] for index in pair_ids],
+                perceptual_hashes,
+                thresholds,
+            )
+            for set_ids, pair_ids in bucket_shards
+        ],
+    )
+    groups_very: list[GroupResult] = []
+    groups_possible: list[GroupResult] = []
+    comparisons = 0
+    for index, outcome in enumerate(group_outcomes):
+        groups_very.extend(GroupResult.model_validate(group) for group in outcome["very"])
+        groups_possible.extend(GroupResult.model_validate(group) for group in outcome["possible"])
+        comparisons += outcome["comparisons"]
+        shard_timings[f"group-{index}"] = outcome["timingsMs"]
+    # A single run orders groups by their smallest item id; shards never share an item.
+    groups_very.sort(key=smallest_item_id)
+    groups_possible.sort(key=smallest_item_id)
+    timings["shard_grouping_ms"] = elapsed_ms(start)
+    reporter.finish(groups_found=len(groups_exact) + len(groups_very) + len(groups_possible))
+    counts["comparisons_executed"] = comparisons
+    counts["shards_hashing"] = len(item_shards)
+    counts["shards_grouping"] = len(bucket_shards)
+
+    debug = build_scan_debug(
+        has_candidates=narrowing.has_candidates,
+        candidate_debug=narrowing.debug,
+        candidate_split=candidate_split,
+        comparisons_bound=counts["comparisons_bound"],
+        explain_enabled=explain_enabled,
+    )
+    counts.update(narrowing_reason_counts(narrowing, explain_enabled=explain_enabled))
+    return ScanResult(
+        runId=run_id,
+        inputCount=len(photo_items),
+        stageMetrics=StageMetrics(
+            timingsMs=timings,
+            counts=counts,
+            debug=debug,
+            shardTimingsMs=shard_timings,
+        ),
+        costEstimate=estimate_costs(settings, counts),
+        groupsExact=groups_exact,
+        groupsVerySimilar=groups_very,
+        groupsPossiblySimilar=groups_possible,
+        failedItems=failed_items,
+    )
+
+
+def hash_shard(payload: dict[str, Any], settings: Settings) -> dict[str, Any]:
+    """Fetch, validate and hash one shard of items.
+
+    Perceptual and coarse hashes are returned for every readable candidate item, since
+    which of them are exact duplicates is only known once every shard is gathered.
+    """
+    items = [item_from_json(entry) for entry in payload["items"]]
+    candidate_ids = set(payload["candidateIds"])
+    download_manager = build_download_manager(settings, max_bytes_per_scan=payload["maxBytes"])
+    hashing_service = build_hashing_service(settings, download_manager)
+    start = time.perf_counter()
+    try:
+        hashed = hash_item_bytes(
+            items,
+            candidate_ids,
+            hashing_service,
+            download_manager,
+            settings,
+            require_image_bytes=payload["requireImageBytes"],
+        )
+    except DownloadSecurityError as exc:
+        if not exc.fatal_to_scan:
+            raise
+        return {"fatal": {"category": exc.category, "message": exc.safe_message}}
+    byte_hashing_ms = max(0.0, elapsed_ms(start) - hashing_service.decode_seconds * 1000)
+
+    start = time.perf_counter()
+    decode_seconds_before_hashing = hashing_service.decode_seconds
+    hashes: dict[str, list[int | None]] = {}
+    for item in items:
+        if item.id in candidate_ids and item.id in hashed.byte_hashes:
+            coarse_hash = hashing_service.get_coarse_hash(item)
+            perceptual = hashing_service.get_perceptual_hashes(item)
+            hashes[item.id] = [perceptual.dhash, perceptual.phash, coarse_hash]
+    perceptual_hashing_ms = max(
+        0.0,
+        elapsed_ms(start) - (hashing_service.decode_seconds - decode_seconds_before_hashing) * 1000,
+    )
+    security_error = next(
+        (error for error in hashed.download_errors if isinstance(error, DownloadSecurityError)),
+        None,
+    )
+    return {
+        "byteHashes": hashed.byte_hashes,
+        "issues": [issue.model_dump(by_alias=True) for issue in hashed.issues.values()],
+        "hashes": hashes,
+        "bytesDownloaded": download_manager.bytes_downloaded,
+        "securityError": (
+            None
+            if security_error is None
+            else {"category": security_error.category, "message": security_error.safe_message}
+        ),
+        "counts": {
+            "byte_hashes": hashing_service.byte_hash_count,
+            "byte_hashes_streamed": hashed.streamed_count,
+            **service_counts(hashing_service, download_manager),
+        },
+        "timingsMs": {
+            "byte_hashing_ms": round(byte_hashing_ms, 2),
+            "perceptual_hashing_ms": round(perceptual_hashing_ms, 2),
+            "image_decoding_ms": round(hashing_service.decode_seconds * 1000, 2),
+        },
+    }
+
+
+def group_shard(payload: dict[str, Any]) -> dict[str, Any]:
+    """Group one shard of candidate sets and pairs by perceptual distance."""
+    start = time.perf_counter()
+    items = [item_from_json(entry) for entry in payload["items"]]
+    groups_very, groups_possible, comparisons = group_near_duplicates(
+        [[items[index] for index in group] for group in payload["sets"]],
+        {
+            item.id: PerceptualHashes(dhash=dhash, phash=phash)
+            for item, (dhash, phash) in zip(items, payload["hashes"], strict=True)
+        },
+        SimilarityThresholds(**payload["thresholds"]),
+        pairs=[(items[left], items[right]) for left, right in payload["pairs"]],
+    )
+    return {
+        "very": [group.model_dump(mode="json", by_alias=True) for group in groups_very],
+        "possible": [group.model_dump(mode="json", by_alias=True) for group in groups_possible],
+        "comparisons": comparisons,
+        "timingsMs": {"near_grouping_ms": elapsed_ms(start)},
+    }
+
+
+def item_to_json(item: PhotoItem) -> dict[str, Any]:
+    return asdict(item) | {"create_time": item.create_time.isoformat()}
+
+
+def item_from_json(data: dict[str, Any]) -> PhotoItem:
+    gps = data.get("gps")
+    capture = data.get("capture")
+    return PhotoItem(
+        **data
+        | {
+            "create_time": datetime.fromisoformat(data["create_time"]),
+            "gps": GPSLocation(**gps) if gps else None,
+            "capture": CaptureSettings(**capture) if capture else None,
+        }
+    )
+
+
+def _group_payload(
+    sets: list[list[PhotoItem]],
+    pairs: list[tuple[PhotoItem, PhotoItem]],
+    perceptual_hashes: dict[str, PerceptualHashes],
+    thresholds: dict[str, int],
+) -> dict[str, Any]:
+    """Each item of the shard once, with sets and pairs as indexes into ``items``."""
+    index_of: dict[str, int] = {}
+    items: list[PhotoItem] = []
+    for unit in [*sets, *pairs]:
+        for item in unit:
+            if item.id not in index_of:
+                index_of[item.id] = len(items)
+                items.append(item)
+    return {
+        "items": [item_to_json(item) for item in items],
+        "hashes": [list(perceptual_hashes[item.id]) for item in items],
+        "sets": [[index_of[item.id] for item in group] for group in sets],
+        "pairs": [[index_of[left.id], index_of[right.id]] for left, right in pairs],
+        "thresholds": thresholds,
+    }
+
+
+def _split_items(items: list[PhotoItem], count: int) -> list[list[PhotoItem]]:
+    """Contiguous runs in selection order, so issues and fatal errors keep their order."""
+    size = -(-len(items) // max(count, 1))
+    return [items[start : start + size] for start in range(0, len(items), max(size, 1))]
+
+
+def _split_buckets(
+    sets: list[list[PhotoItem]],
+    pairs: list[tuple[PhotoItem, PhotoItem]],
+    count: int,
+) -> list[tuple[list[int], list[int]]]:
+    """Set and pair indexes per group shard, keeping units that share an item together.
+
+    Connected units are placed largest first on the least-loaded shard; each shard keeps
+    the units in their original order so pair de-duplication counts match a single run.
+    """
+    buckets = connected_units(sets, pairs)
+    weights = [
+        sum(len(sets[index]) * (len(sets[index]) - 1) // 2 for index in set_ids) + len(pair_ids)
+        for set_ids, pair_ids in buckets
+    ]
+    loads = [0] * max(count, 1)
+    assigned: list[tuple[list[int], list[int]]] = [([], []) for _ in loads]
+    for position in sorted(range(len(buckets)), key=lambda p: -weights[p]):
+        shard = loads.index(min(loads))
+        loads[shard] += weights[position]
+        assigned[shard][0].extend(buckets[position][0])
+        assigned[shard][1].extend(buckets[position][1])
+    return [
+        (sorted(set_ids), sorted(pair_ids)) for set_ids, pair_ids in assigned if set_ids or pair_ids
+    ]
+
+
+def _merge_counts(counts: dict[str, int], shard_counts: dict[str, int]) -> None:
+    for name, value in shard_counts.items():
+        if name in PEAK_COUNTS:
+            counts[name] = max(counts.get(name, 0), value)
+        else:
+            counts[name] = counts.get(name, 0) + value
@@ -0,0 +1 @@
+"""Background scan jobs submitted through the API."""
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import importlib
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+from app.core.config import ScanJobRunner, Settings
+from app.engine.progress import ScanProgress
+from app.engine.shards import ShardStage
+from app.jobs.runner import INTERNAL_ERROR, run_scan_job
+from app.jobs.schemas import ScanJobError, ScanJobProgress, ScanJobStatus
+
+logger = logging.getLogger(__name__)
+
+SCAN_TASK_NAME = "photoprune.scan"
+SHARD_TASK_NAME = "photoprune.scan_shard"
+# Shards run on their own queue and workers: a scan task waits for its shards, so sharing
+# a worker pool with scans could leave every slot waiting on shards nobody can start.
+SHARD_QUEUE = "scan-shards"
+# Time a shard may take beyond the download wall budget, for decoding and grouping.
+SHARD_GRACE_SECONDS = 300.0
+# Finished inline jobs kept for their results; older ones are forgotten first.
+MAX_RETAINED_INLINE_JOBS = 64
+
+
+class ScanJobUnavailableError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class ScanJobRecord:
+    status: ScanJobStatus
+    progress: ScanJobProgress
+    envelope: dict[str, Any] | None = None
+    error: ScanJobError | None = None
+
+    @classmethod
+    def queued(cls, total: int) -> ScanJobRecord:
+        return cls(ScanJobStatus.QUEUED, ScanJobProgress(stage="QUEUED", processed=0, total=total))
+
+    @classmethod
+    def running(cls, total: int) -> ScanJobRecord:
+        return cls(ScanJobStatus.RUNNING, ScanJobProgress(stage="SCAN", processed=0, total=total))
+
+    @classmethod
+    def progressed(cls, progress: ScanProgress) -> ScanJobRecord:
+        return cls(
+            ScanJobStatus.RUNNING,
+            ScanJobProgress(
+                stage=progress.stage,
+                processed=progress.processed,
+                total=progress.total,
+                bytesDownloaded=progress.bytes_downloaded,
+                groupsFound=progress.groups_found,
+            ),
+        )
+
+    @classmethod
+    def finished(cls, outcome: dict[str, Any]) -> ScanJobRecord:
+        """Record for a ``run_scan_job`` outcome."""
+        total = int(outcome.get("total", 0))
+        if "error" in outcome:
+            return cls(
+                ScanJobStatus.FAILED,
+                ScanJobProgress(stage="FINALIZE", processed=0, total=total),
+                error=ScanJobError.model_validate(outcome["error"]),
+            )
+        return cls(
+            ScanJobStatus.SUCCEEDED,
+            ScanJobProgress(
+                stage="FINALIZE",
+                processed=total,
+                total=total,
+                bytesDownloaded=int(outcome.get("bytesDownloaded", 0)),
+                groupsFound=len(outcome["envelope"]["results"]["groups"]),
+            ),
+            envelope=outcome["envelope"],
+        )
+
+    @classmethod
+    def crashed(cls, total: int) -> ScanJobRecord:
+        return cls(
+            ScanJobStatus.FAILED,
+            ScanJobProgress(stage="FINALIZE", processed=0, total=total),
+            error=INTERNAL_ERROR,
+        )
+
+
+class ScanJobBackend(Protocol):
+    def submit(
+        self,
+        job_id: str,
+        payload: dict[str, Any],
+        *,
+        total: int,
+        on_finished: Callable[[], None] | None = None,
+    ) -> None:
+        """Queue a job; ``on_finished`` runs once this process is done tracking it."""
+        ...
+
+    def get(self, job_id: str) -> ScanJobRecord | None: ...
+
+
+class InlineScanJobs:
+    """Runs scan jobs on threads of the API process.
+
+    Meant for local use without a broker: jobs do not survive a restart and share the
+    API's CPU, but requests no longer wait on the scan.
+    """
+
+    def __init__(self, settings: Settings, *, workers: int) -> None:
+        self._settings = settings
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan-job")
+        self._records: OrderedDict[str, ScanJobRecord] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        job_id: str,
+        payload: dict[str, Any],
+        *,
+        total: int,
+        on_finished: Callable[[], None] | None = None,
+    ) -> None:
+        with self._lock:
+            self._records[job_id] = ScanJobRecord.queued(total)
+            self._forget_finished()
+        self._executor.submit(self._run, job_id, payload, total, on_finished)
+
+    def get(self, job_id: str) -> ScanJobRecord | None:
+        with self._lock:
+            return self._records.get(job_id)
+
+    def _run(
+        self,
+        job_id: str,
+        payload: dict[str, Any],
+        total: int,
+        on_finished: Callable[[], None] | None,
+    ) -> None:
+        self._store(job_id, ScanJobRecord.running(total))
+        try:
+            outcome = run_scan_job(
+                payload,
+                self._settings,
+                progress=lambda progress: self._store(job_id, ScanJobRecord.progressed(progress)),
+            )
+            record = ScanJobRecord.finished(outcome)
+        except Exception:
+            logger.exception("scan job failed", extra={"job_id": job_id})
+            record = ScanJobRecord.crashed(total)
+        finally:
+            if on_finished is not None:
+                on_finished()
+        self._store(job_id, record)
+
+    def _store(self, job_id: str, record: ScanJobRecord) -> None:
+        with self._lock:
+            self._records[job_id] = record
+
+    def _forget_finished(self) -> None:
+        finished = [
+            job_id
+            for job_id, record in self._records.items()
+            if record.status in (ScanJobStatus.SUCCEEDED, ScanJobStatus.FAILED)
+        ]
+        for job_id in finished[: max(0, len(finished) - MAX_RETAINED_INLINE_JOBS)]:
+            del self._records[job_id]
+
+
+class CeleryScanJobs:
+    """Queues scan jobs for the Celery scan worker and reads their state back.
+
+    Job states live in the Celery result backend, so any API process can answer for any
+    job. The queued state is stored before the message is sent, because Celery reports an
+    unknown id and a job still waiting in the queue both as ``PENDING``.
+    """
+
+    def __init__(self, celery_app: Any) -> None:
+        self._app = celery_app
+
+    def submit(
+        self,
+        job_id: str,
+        payload: dict[str, Any],
+        *,
+        total: int,
+        on_finished: Callable[[], None] | None = None,
+    ) -> None:
+        # The job runs on a scan worker, whose concurrency bounds running jobs and whose
+        # backlog waits in the broker, so this process stops tracking it once it is sent.
+        queued = ScanJobRecord.queued(total)
+        try:
+            self._app.backend.store_result(job_id, queued.progress.model_dump(), queued.status)
+            self._app.send_task(SCAN_TASK_NAME, args=[payload, total], task_id=job_id)
+        except Exception as exc:
+            raise ScanJobUnavailableError("The scan queue is unavailable.") from exc
+        finally:
+            if on_finished is not None:
+                on_finished()
+
+    def get(self, job_id: str) -> ScanJobRecord | None:
+        try:
+            result = self._app.AsyncResult(job_id)
+            state, info = result.state, result.info
+        except Exception as exc:
+            raise ScanJobUnavailableError("The scan queue is unavailable.") from exc
+        if state in (ScanJobStatus.QUEUED, ScanJobStatus.RUNNING):
+            return ScanJobRecord(ScanJobStatus(state), ScanJobProgress.model_validate(info))
+        if state == "SUCCESS":
+            return ScanJobRecord.finished(info)
+        if state == "FAILURE":
+            return ScanJobRecord.crashed(total=0)
+        return None
+
+
+class CeleryShards:
+    """Runs the shards of a sharded scan as Celery tasks and waits for every outcome."""
+
+    def __init__(self, celery_app: Any, *, timeout_seconds: float) -> None:
+        self._app = celery_app
+        self._timeout_seconds = timeout_seconds
+
+    def map(self, stage: ShardStage, payloads: Sequence[dict[str, Any]]) -> list[dict[str, Any]]:
+        results = [
+            self._app.send_task(SHARD_TASK_NAME, args=[stage.value, payload])
+            for payload in payloads
+        ]
+        # Waiting inside the scan task is safe because shards never run on the scan queue.
+        return [
+            result.get(timeout=self._timeout_seconds, disable_sync_subtasks=False)
+            for result in results
+        ]
+
+
+def create_celery_app(settings: Settings) -> Any:
+    try:
+        celery = importlib.import_module("celery")
+    except ImportError as exc:
+        raise RuntimeError(
+            "SCAN_JOB_RUNNER=celery needs celery and redis installed "
+            "(pinned in apps/api/requirements.lock)."
+        ) from exc
+    app = celery.Celery("photoprune_scans", broker=settings.redis_url, backend=settings.redis_url)
+    app.conf.update(
+        task_serializer="json",
+        result_serializer="json",
+        accept_content=["json"],
+        result_expires=int(settings.scan_job_result_ttl_seconds),
+        # Scans are long; a worker takes the next one only when it is free, and a job is
+        # only acknowledged once finished so a lost worker's scan is delivered again.
+        worker_prefetch_multiplier=1,
+        task_acks_late=True,
+        task_routes={SHARD_TASK_NAME: {"queue": SHARD_QUEUE}},
+    )
+    return app
+
+
+def build_scan_shards(settings: Settings, celery_app: Any) -> CeleryShards | None:
+    if settings.scan_job_shard_count is None:
+        return None
+    return CeleryShards(
+        celery_app,
+        timeout_seconds=settings.scan_download_wall_seconds + SHARD_GRACE_SECONDS,
+    )
+
+
+def build_scan_jobs(settings: Settings) -> ScanJobBackend:
+    if settings.scan_job_runner == ScanJobRunner.CELERY:
+        return CeleryScanJobs(create_celery_app(settings))
+    return InlineScanJobs(settings, workers=settings.scan_concurrency_limit)
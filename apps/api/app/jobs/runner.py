@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+from app.core.config import Settings
+from app.engine.downloads import DownloadSecurityError
+from app.engine.envelope import to_envelope
+from app.engine.models import PhotoItem
+from app.engine.normalizer import normalize_photo_items, normalize_picker_payload
+from app.engine.progress import ProgressCallback, ScanProgress
+from app.engine.scan import run_scan
+from app.engine.schemas import ScanRequest
+from app.engine.shards import ShardRunner, run_sharded_scan
+from app.jobs.schemas import ScanJobError
+
+INTERNAL_ERROR = ScanJobError(
+    category="scan_internal",
+    message="The scan stopped unexpectedly. Start it again.",
+)
+
+
+def normalize_scan_request(request: ScanRequest) -> list[PhotoItem]:
+    if request.photo_items:
+        return normalize_photo_items(request.photo_items)
+    return normalize_picker_payload(request.picker_payload or {})
+
+
+def requires_image_bytes(request: ScanRequest, items: Sequence[PhotoItem]) -> bool:
+    return request.picker_payload is not None or any(
+        item.download_url is not None for item in items
+    )
+
+
+def build_job_payload(request: ScanRequest, *, explain: bool) -> dict[str, Any]:
+    """JSON message for a scan job; the worker validates it again before scanning."""
+    return {
+        "request": request.model_dump(mode="json", by_alias=True, exclude_none=True),
+        "explain": explain,
+    }
+
+
+def run_scan_job(
+    payload: Mapping[str, Any],
+    settings: Settings,
+    *,
+    shards: ShardRunner | None = None,
+    progress: ProgressCallback | None = None,
+) -> dict[str, Any]:
+    """Scan a submitted job payload into a JSON outcome.
+
+    The outcome holds the item ``total`` and either the result ``envelope`` or an ``error``
+    for failures the synchronous endpoint reports as 422; anything else is raised. With
+    ``shards`` and sharding enabled, the scan is spread over them. ``progress`` receives the
+    scan's throttled progress events; the bytes downloaded are kept in the outcome.
+    """
+    request = ScanRequest.model_validate(payload["request"])
+    items = normalize_scan_request(request)
+    outcome: dict[str, Any] = {"total": len(items)}
+    explain = bool(payload.get("explain"))
+    require_bytes = requires_image_bytes(request, items)
+    shard_count = settings.scan_job_shard_count
+    latest: list[ScanProgress] = []
+
+    def report(event: ScanProgress) -> None:
+        latest[:] = [event]
+        if progress is not None:
+            progress(event)
+
+    try:
+        if shards is not None and shard_count is not None:
+            result = run_sharded_scan(
+                items,
+                settings,
+                shards,
+                shard_count=shard_count,
+                explain=explain,
+                require_image_bytes=require_bytes,
+                progress=report,
+            )
+        else:
+            result = run_scan(
+                items,
+                settings,
+                explain=explain,
+                require_image_bytes=require_bytes,
+                progress=report,
+            )
+    except DownloadSecurityError as exc:
+        outcome["error"] = {"category": exc.category, "message": exc.safe_message}
+    except ValueError as exc:
+        outcome["error"] = {"category": "scan_failed", "message": str(exc)}
+    else:
+        outcome["envelope"] = to_envelope(result)
+    if latest:
+        outcome["bytesDownloaded"] = latest[-1].bytes_downloaded
+    return outcome
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from enum import StrEnum
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class ScanJobStatus(StrEnum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+
+
+class ScanJobProgress(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    stage: str
+    processed: int
+    total: int
+    bytes_downloaded: int = Field(default=0, alias="bytesDownloaded")
+    groups_found: int = Field(default=0, alias="groupsFound")
+
+
+class ScanJobError(BaseModel):
+    category: str
+    message: str
+
+
+class ScanJobResponse(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    job_id: str = Field(alias="jobId")
+    status: ScanJobStatus
+    progress: ScanJobProgress
+    error: ScanJobError | None = None
@@ -0,0 +1,45 @@
+"""Celery entry point for scan jobs: ``celery -A app.jobs.worker worker``.
+
+Shards of sharded scans are consumed separately with ``-Q scan-shards``.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from app.core.config import get_settings
+from app.engine.progress import ScanProgress
+from app.engine.shards import ShardStage, run_shard
+from app.jobs.backends import (
+    SCAN_TASK_NAME,
+    SHARD_TASK_NAME,
+    ScanJobRecord,
+    build_scan_shards,
+    create_celery_app,
+)
+from app.jobs.runner import run_scan_job
+
+# Workers scale out as Celery processes, so each decodes on its own thread: a hashing pool
+# per worker would multiply processes, and a daemonic prefork child cannot start one.
+settings = get_settings().model_copy(update={"scan_hash_workers": 1})
+app = create_celery_app(settings)
+shards = build_scan_shards(settings, app)
+
+
+def scan_job(task: Any, payload: dict[str, Any], total: int) -> dict[str, Any]:
+    running = ScanJobRecord.running(total)
+    task.update_state(state=running.status, meta=running.progress.model_dump())
+
+    def report(progress: ScanProgress) -> None:
+        record = ScanJobRecord.progressed(progress)
+        task.update_state(state=record.status, meta=record.progress.model_dump())
+
+    return run_scan_job(payload, settings, shards=shards, progress=report)
+
+
+def scan_shard(stage: str, payload: dict[str, Any]) -> dict[str, Any]:
+    return run_shard(ShardStage(stage), payload, settings)
+
+
+app.task(name=SCAN_TASK_NAME, bind=True)(scan_job)
+app.task(name=SHARD_TASK_NAME)(scan_shard)
@@ -15,6 +15,7 @@ from app.core.security import (
     correlation_id_from_scope,
     safe_validation_errors,
 )
+from app.jobs.backends import build_scan_jobs
 
 
 def create_app(settings: Settings | None = None) -> FastAPI:
@@ -25,6 +26,7 @@ def create_app(settings: Settings | None = None) -> FastAPI:
         rate_limit=settings.scan_admissions_per_minute,
         concurrency_limit=settings.scan_concurrency_limit,
     )
+    app.state.scan_jobs = build_scan_jobs(settings)
 
     @app.exception_handler(RequestValidationError)
     async def request_validation_error(
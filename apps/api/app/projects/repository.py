@@ -5,7 +5,7 @@ import hashlib
 import io
 import json
 import sqlite3
-from collections.abc import Iterator
+from collections.abc import Iterator, Mapping
 from contextlib import contextmanager
 from datetime import UTC, datetime
 from pathlib import Path
@@ -13,12 +13,16 @@ from typing import Any
 from uuid import uuid4
 
 from app.engine.deeplinks import build_google_photos_deep_link_from_parts
+from app.engine.fingerprints import ItemFingerprint, dump_fingerprint, load_fingerprint
+from app.engine.incremental import PreviousGroup, PreviousScan
 from app.engine.models import PhotoItem
 from app.engine.schemas import ScanResult
 from app.projects.schemas import ProjectGroupReviewPatch
 
 DEFAULT_SCOPE = {"type": "picker", "albumIds": []}
 SINGLE_OPERATOR_STORAGE_OWNER = "local-user"
+FINGERPRINT_LOOKUP_CHUNK = 500
+GROUP_CATEGORIES = {"HIGH": "EXACT", "MEDIUM": "VERY_SIMILAR", "LOW": "POSSIBLY_SIMILAR"}
 
 
 class ProjectRepository:
@@ -115,6 +119,7 @@ class ProjectRepository:
                 );
                 """)
             self._ensure_column(conn, "projects", "scope", "TEXT")
+            self._ensure_column(conn, "project_scans", "settings_digest", "TEXT")
             conn.execute(
                 "UPDATE projects SET scope = ? WHERE scope IS NULL",
                 (json.dumps(DEFAULT_SCOPE),),
@@ -283,6 +288,8 @@ class ProjectRepository:
         scan_result: ScanResult,
         input_items: list[PhotoItem],
         envelope: dict[str, Any],
+        fingerprints: Mapping[str, ItemFingerprint] | None = None,
+        settings_digest: str | None = None,
     ) -> str:
         scan_id = str(uuid4())
         now = _now_iso()
@@ -297,8 +304,8 @@ class ProjectRepository:
             conn.execute(
                 """
                 INSERT INTO project_scans (id, project_id, created_at, source_type, source_ref,
-                    scan_envelope_version, metrics)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                    scan_envelope_version, metrics, settings_digest)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                 """,
                 (
                     scan_id,
@@ -308,12 +315,14 @@ class ProjectRepository:
                     json.dumps(source_ref),
                     str(envelope.get("schemaVersion", "2.2.0")),
                     json.dumps(metrics),
+                    settings_digest,
                 ),
             )
             conn.execute("UPDATE projects SET updated_at = ? WHERE id = ?", (now, project_id))
 
             for item in input_items:
                 persisted_link = item.deep_link if source_type != "picker" else None
+                fingerprint = (fingerprints or {}).get(item.id)
                 conn.execute(
                     """
                     INSERT INTO project_items (
@@ -351,7 +360,7 @@ class ProjectRepository:
                         item.mime_type,
                         item.width,
                         item.height,
-                        None,
+                        dump_fingerprint(fingerprint) if fingerprint else None,
                         now,
                     ),
                 )
@@ -403,6 +412,74 @@ class ProjectRepository:
                 )
         return scan_id
 
+    def load_fingerprints(
+        self,
+        project_id: str,
+        media_item_ids: list[str],
+    ) -> dict[str, ItemFingerprint]:
+        fingerprints: dict[str, ItemFingerprint] = {}
+        with self._conn() as conn:
+            # Chunked to stay under SQLite's bound-parameter limit for large albums.
+            for offset in range(0, len(media_item_ids), FINGERPRINT_LOOKUP_CHUNK):
+                chunk = media_item_ids[offset : offset + FINGERPRINT_LOOKUP_CHUNK]
+                placeholders = ",".join("?" for _ in chunk)
+                rows = conn.execute(
+                    f"""
+                    SELECT google_media_item_id, fingerprints FROM project_items
+                    WHERE project_id = ? AND google_media_item_id IN ({placeholders})
+                        AND fingerprints IS NOT NULL
+                    """,
+                    (project_id, *chunk),
+                ).fetchall()
+                for row in rows:
+                    fingerprint = load_fingerprint(row["fingerprints"])
+                    if fingerprint is not None:
+                        fingerprints[row["google_media_item_id"]] = fingerprint
+        return fingerprints
+
+    def load_previous_scan(self, project_id: str) -> PreviousScan | None:
+        """Items and groups of the project's latest scan, for an incremental rescan.
+
+        Returns ``None`` when a stored group has a confidence band this version does not know,
+        since its category, and so whether it may be carried over, cannot be told.
+        """
+        with self._conn() as conn:
+            scan_id = self._latest_scan_id(conn, project_id)
+            if scan_id is None:
+                return None
+            scan_row = conn.execute(
+                "SELECT settings_digest, metrics FROM project_scans WHERE id = ?",
+                (scan_id,),
+            ).fetchone()
+            item_rows = conn.execute(
+                "SELECT google_media_item_id FROM project_scan_items WHERE project_scan_id = ?",
+                (scan_id,),
+            ).fetchall()
+            group_rows = conn.execute(
+                (
+                    "SELECT confidence_band, member_media_item_ids FROM project_groups "
+                    "WHERE project_scan_id = ? ORDER BY rowid ASC"
+                ),
+                (scan_id,),
+            ).fetchall()
+        if any(row["confidence_band"] not in GROUP_CATEGORIES for row in group_rows):
+            return None
+        sets_split = (
+            _load_json(scan_row["metrics"], {}).get("counts", {}).get("candidate_sets_split")
+        )
+        return PreviousScan(
+            item_ids=frozenset(row["google_media_item_id"] for row in item_rows),
+            groups=tuple(
+                PreviousGroup(
+                    category=GROUP_CATEGORIES[row["confidence_band"]],
+                    member_ids=tuple(json.loads(row["member_media_item_ids"])),
+                )
+                for row in group_rows
+            ),
+            settings_digest=scan_row["settings_digest"],
+            sets_split=sets_split if isinstance(sets_split, int) else None,
+        )
+
     def list_scans(self, project_id: str) -> list[dict[str, Any]]:
         with self._conn() as conn:
             rows = conn.execute(
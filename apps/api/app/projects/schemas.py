@@ -203,6 +203,8 @@ class ProjectScanRequest(ScanRequest):
     source_type: Literal["picker", "album_set"] = Field(default="picker", alias="sourceType")
     source_ref: ProjectSourceRef | None = Field(default=None, alias="sourceRef")
     resume: bool = False
+    # Rescan only items that are new or changed since the project's latest scan.
+    incremental: bool = False
 
     @model_validator(mode="after")
     def validate_payload(self) -> ProjectScanRequest:
@@ -0,0 +1,20 @@
+"""Synthetic photos shared by the hashing tests and ``scripts/engine_bench.py``."""
+
+from __future__ import annotations
+
+import io
+
+import numpy as np
+from PIL import Image
+
+
+def render_photo_jpeg(seed: int, width: int, height: int, *, quality: int = 90) -> bytes:
+    """Camera-like JPEG: a smooth colour field with per-pixel sensor grain."""
+    rng = np.random.default_rng(seed)
+    field = Image.fromarray((rng.random((6, 8, 3)) * 255).astype(np.uint8))
+    smooth = np.asarray(field.resize((width, height), Image.Resampling.BICUBIC), dtype=np.int16)
+    grain = rng.integers(-12, 13, size=(height, width, 1), dtype=np.int16)
+    pixels = np.clip(smooth + grain, 0, 255).astype(np.uint8)
+    output = io.BytesIO()
+    Image.fromarray(pixels).save(output, format="JPEG", quality=quality)
+    return output.getvalue()
@@ -1,7 +1,14 @@
 import pytest
 from pydantic import ValidationError
 
-from app.core.config import DeploymentMode, RuntimeEnvironment, Settings
+from app.core.config import (
+    CandidateStrategy,
+    DeploymentMode,
+    PhashBackend,
+    RuntimeEnvironment,
+    ScanJobRunner,
+    Settings,
+)
 
 
 def test_scan_allowed_download_hosts_accepts_json_array(monkeypatch):
@@ -151,6 +158,9 @@ def test_production_allows_disabled_or_explicit_local_cors():
         ("scan_download_timeout_seconds", 31),
         ("scan_download_timeout_seconds", float("nan")),
         ("scan_download_wall_seconds", 601),
+        ("scan_download_pool_max_idle", 65),
+        ("scan_download_pool_idle_seconds", 0),
+        ("scan_download_dns_ttl_seconds", 301),
         ("scan_concurrency_limit", 2),
         ("scan_admissions_per_minute", 6),
         ("api_requests_per_minute", 121),
@@ -159,3 +169,131 @@ def test_production_allows_disabled_or_explicit_local_cors():
 def test_security_budgets_cannot_exceed_contract(field, value):
     with pytest.raises(ValidationError, match=field):
         Settings(**{field: value})
+
+
+def test_scan_phash_backend_defaults_to_numpy_and_accepts_reference(monkeypatch):
+    assert Settings().scan_phash_backend == PhashBackend.NUMPY
+
+    monkeypatch.setenv("SCAN_PHASH_BACKEND", "python")
+
+    assert Settings().scan_phash_backend == PhashBackend.PYTHON
+
+
+def test_scan_phash_backend_rejects_unknown_values():
+    with pytest.raises(ValidationError, match="scan_phash_backend"):
+        Settings(scan_phash_backend="opencv")
+
+
+def test_candidate_aspect_tolerance_is_only_applied_when_aspect_match_is_enabled():
+    assert Settings().scan_candidate_strategy == CandidateStrategy.BUCKET
+    assert Settings().candidate_aspect_tolerance == 0.1
+    assert Settings(scan_candidate_aspect_match=False).candidate_aspect_tolerance is None
+    assert Settings().candidate_geohash_precision is None
+    assert Settings(scan_candidate_geo_match=True).candidate_geohash_precision == 6
+    assert Settings().scan_candidate_geo_window_seconds is None
+    assert Settings().candidate_exposure_stops is None
+    assert Settings(scan_candidate_camera_match=True).candidate_exposure_stops == 4.0
+
+
+@pytest.mark.parametrize(
+    "field,value",
+    [
+        ("scan_candidate_window_seconds", 0),
+        ("scan_candidate_window_seconds", 2 * 24 * 60 * 60),
+        ("scan_candidate_aspect_tolerance", 0),
+        ("scan_candidate_aspect_tolerance", 2),
+        ("scan_candidate_max_set_items", 0),
+        ("scan_candidate_max_set_items", 10_000),
+        ("scan_candidate_max_comparisons", 0),
+        ("scan_candidate_max_comparisons", 2_000_000),
+        ("scan_global_lsh_bands", 0),
+        ("scan_global_lsh_bands", 65),
+        ("scan_candidate_geohash_precision", 0),
+        ("scan_candidate_geohash_precision", 13),
+        ("scan_candidate_geo_window_seconds", 0),
+        ("scan_candidate_exposure_stops", 0),
+        ("scan_candidate_exposure_stops", 21),
+    ],
+)
+def test_candidate_window_settings_are_bounded(field, value):
+    with pytest.raises(ValidationError, match=field):
+        Settings(**{field: value})
+
+
+def test_scan_jobs_run_inline_unless_celery_is_configured():
+    assert Settings().scan_job_runner == ScanJobRunner.INLINE
+    assert Settings(scan_job_runner="celery").scan_job_runner == ScanJobRunner.CELERY
+    with pytest.raises(ValidationError, match="scan_job_result_ttl_seconds"):
+        Settings(scan_job_result_ttl_seconds=0)
+
+
+def test_scan_job_shards_are_only_used_when_sharding_is_enabled():
+    assert Settings().scan_job_shard_count is None
+    assert Settings(scan_job_sharding=True, scan_job_shards=8).scan_job_shard_count == 8
+    with pytest.raises(ValidationError, match="scan_job_shards"):
+        Settings(scan_job_shards=65)
+
+
+def test_scan_progress_interval_is_bounded():
+    assert Settings().scan_progress_interval_seconds == 0.5
+    with pytest.raises(ValidationError, match="scan_progress_interval_seconds"):
+        Settings(scan_progress_interval_seconds=0)
+
+
+def test_jpeg_draft_min_edge_is_only_applied_when_draft_decode_is_enabled():
+    assert Settings().jpeg_draft_min_edge is None
+    assert Settings(scan_jpeg_draft_decode=True).jpeg_draft_min_edge == 256
+
+
+def test_pipeline_queue_depth_is_only_applied_when_pipelining_is_enabled():
+    assert Settings().pipeline_queue_depth == 16
+    assert Settings(scan_pipeline_downloads=False).pipeline_queue_depth is None
+    with pytest.raises(ValidationError, match="scan_pipeline_queue_depth"):
+        Settings(scan_pipeline_queue_depth=0)
+
+
+@pytest.mark.parametrize("value", [0, 31, 4097])
+def test_jpeg_draft_min_edge_must_cover_the_hash_resolution(value):
+    with pytest.raises(ValidationError, match="scan_jpeg_draft_min_edge"):
+        Settings(scan_jpeg_draft_min_edge=value)
+
+
+def test_scan_hash_workers_defaults_to_in_process_decoding(monkeypatch):
+    assert Settings().scan_hash_workers == 1
+
+    monkeypatch.setenv("SCAN_HASH_WORKERS", "16")
+
+    assert Settings().scan_hash_workers == 16
+
+
+@pytest.mark.parametrize("value", [0, 33])
+def test_scan_hash_workers_must_stay_within_the_supported_range(value):
+    with pytest.raises(ValidationError, match="scan_hash_workers"):
+        Settings(scan_hash_workers=value)
+
+
+def test_download_cache_must_hold_one_maximum_size_item():
+    assert Settings().scan_download_cache_max_bytes == 128 * 1024 * 1024
+
+    with pytest.raises(ValidationError, match="scan_download_cache_max_bytes"):
+        Settings(scan_download_max_bytes_per_item=1024, scan_download_cache_max_bytes=1023)
+
+
+@pytest.mark.parametrize(
+    ("overrides", "field"),
+    [
+        ({"scan_download_concurrency": 0}, "scan_download_concurrency"),
+        ({"scan_download_concurrency": 33}, "scan_download_concurrency"),
+        ({"scan_download_per_host_concurrency": 0}, "scan_download_per_host_concurrency"),
+        ({"scan_download_per_host_concurrency": 33}, "scan_download_per_host_concurrency"),
+    ],
+)
+def test_download_concurrency_must_stay_within_the_supported_range(overrides, field):
+    settings = Settings()
+    assert (settings.scan_download_concurrency, settings.scan_download_per_host_concurrency) == (
+        8,
+        4,
+    )
+
+    with pytest.raises(ValidationError, match=field):
+        Settings(**overrides)
@@ -1,18 +1,40 @@
 from __future__ import annotations
 
+from dataclasses import replace
 from datetime import UTC, datetime, timedelta
 
 from app.core.config import Settings
-from app.engine.candidates import build_candidate_sets
+from app.engine.candidates import (
+    CandidateSplit,
+    GeohashGrid,
+    build_candidate_pairs_with_debug,
+    build_candidate_sets,
+    build_candidate_sets_with_debug,
+    split_oversized_sets,
+)
 from app.engine.downloads import DownloadManager
 from app.engine.grouping import (
+    DisjointSet,
     SimilarityThresholds,
     group_exact_duplicates,
     group_near_duplicates,
     select_representative_pair,
 )
 from app.engine.hashing import HashingService, PerceptualHashes
-from app.engine.models import PhotoItem
+from app.engine.models import CaptureSettings, GPSLocation, PhotoItem
+
+PARIS = GPSLocation(latitude=48.8566, longitude=2.3522)
+PARIS_NEARBY = GPSLocation(latitude=48.8590, longitude=2.3630)
+ROME = GPSLocation(latitude=41.9028, longitude=12.4964)
+PIXEL_DAYLIGHT = CaptureSettings(
+    camera_make="Google",
+    camera_model="Pixel 8",
+    aperture_f_number=1.7,
+    exposure_seconds=1 / 1000,
+    iso_equivalent=50,
+)
+PIXEL_NIGHT = replace(PIXEL_DAYLIGHT, exposure_seconds=1 / 10, iso_equivalent=1600)
+IPHONE_DAYLIGHT = replace(PIXEL_DAYLIGHT, camera_make="Apple", camera_model="iPhone 15")
 
 
 def test_candidate_narrowing_is_deterministic():
@@ -23,14 +45,253 @@ def test_candidate_narrowing_is_deterministic():
         _photo_item("c", base_time + timedelta(days=1), 1000, 2000),
     ]
 
-    first = build_candidate_sets(items)
-    second = build_candidate_sets(items)
+    first, _ = build_candidate_sets(items)
+    second, _ = build_candidate_sets(items)
 
     assert [[item.id for item in group] for group in first] == [
         [item.id for item in group] for group in second
     ]
 
 
+def test_window_candidates_pair_items_within_the_window_and_aspect_tolerance():
+    base_time = datetime(2024, 1, 1, 23, 58, tzinfo=UTC)
+    items = [
+        _photo_item("crop", base_time + timedelta(minutes=3), 3900, 3000),
+        _photo_item("wide", base_time + timedelta(minutes=1), 4000, 2000),
+        _photo_item("first", base_time, 4000, 3000),
+        _photo_item("no-dims", base_time + timedelta(minutes=2), 0, 0),
+        _photo_item("late", base_time + timedelta(minutes=20), 4000, 3000),
+    ]
+
+    pairs, debug = build_candidate_pairs_with_debug(items, window_seconds=180, aspect_tolerance=0.1)
+
+    assert [(left.id, right.id) for left, right in pairs] == [
+        ("first", "no-dims"),
+        ("wide", "no-dims"),
+        ("first", "crop"),
+        ("no-dims", "crop"),
+    ]
+    assert debug.window_pairs == 4
+    assert debug.window_peak_items == 4
+    assert debug.window_aspect_rejections == 2
+    assert debug.missing_dims_ids == ["no-dims"]
+    assert debug.time_bucket_mismatch_ids == ["late"]
+    unfiltered, _ = build_candidate_pairs_with_debug(items, window_seconds=180)
+    assert len(unfiltered) == 6
+
+
+def test_geohash_cells_are_adjacent_across_boundaries_and_the_antimeridian():
+    grid = GeohashGrid(6)
+
+    paris, nearby, rome = (grid.cell(location) for location in (PARIS, PARIS_NEARBY, ROME))
+    east = grid.cell(GPSLocation(latitude=0.0, longitude=179.999))
+    west = grid.cell(GPSLocation(latitude=0.0, longitude=-179.999))
+
+    assert paris is not None and nearby is not None and rome is not None
+    assert east is not None and west is not None
+    assert paris != nearby
+    assert grid.adjacent(paris, nearby)
+    assert not grid.adjacent(paris, rome)
+    assert grid.adjacent(east, west)
+    assert grid.cell(GPSLocation(latitude=float("nan"), longitude=0.0)) is None
+    assert len(grid.neighbours(paris)) == 9
+
+
+def test_window_candidates_skip_distant_places_and_extend_same_place_pairs():
+    base_time = datetime(2024, 5, 1, 12, tzinfo=UTC)
+    items = [
+        replace(_photo_item("paris", base_time, 4000, 3000), gps=PARIS),
+        replace(_photo_item("rome", base_time, 4000, 3000), gps=ROME),
+        replace(
+            _photo_item("paris-later", base_time + timedelta(hours=3), 4000, 3000),
+            gps=PARIS_NEARBY,
+        ),
+        _photo_item("unlocated", base_time + timedelta(hours=3, minutes=1), 4000, 3000),
+    ]
+
+    pairs, debug = build_candidate_pairs_with_debug(
+        items,
+        window_seconds=600,
+        geohash_precision=6,
+        geo_window_seconds=6 * 60 * 60,
+    )
+
+    assert [(left.id, right.id) for left, right in pairs] == [
+        ("paris", "paris-later"),
+        ("paris-later", "unlocated"),
+    ]
+    assert (debug.geo_cells, debug.geo_rejections, debug.geo_extended_pairs) == (3, 1, 1)
+    assert debug.time_bucket_mismatch_ids == ["paris", "rome"]
+
+
+def test_window_candidates_only_widen_for_the_same_place_when_asked():
+    base_time = datetime(2024, 5, 1, 12, tzinfo=UTC)
+    items = [
+        replace(
+            _photo_item(f"paris-{index}", base_time + timedelta(hours=index), 4000, 3000), gps=PARIS
+        )
+        for index in range(4)
+    ] + [
+        _photo_item(f"unlocated-{index}", base_time + timedelta(minutes=index), 4000, 3000)
+        for index in range(3)
+    ]
+
+    pairs, debug = build_candidate_pairs_with_debug(items, window_seconds=600, geohash_precision=6)
+
+    assert len(pairs) == 3 + 3
+    assert (debug.geo_extended_pairs, debug.window_peak_items) == (0, 4)
+
+    pairs, debug = build_candidate_pairs_with_debug(
+        items, window_seconds=600, geohash_precision=6, geo_window_seconds=2 * 60 * 60
+    )
+
+    assert debug.geo_extended_pairs == 5
+    assert ("paris-0", "paris-2") in {(left.id, right.id) for left, right in pairs}
+    assert ("paris-0", "paris-3") not in {(left.id, right.id) for left, right in pairs}
+
+
+def test_bucket_candidates_split_by_location_and_pair_unlocated_items_once():
+    base_time = datetime(2024, 5, 1, 9, tzinfo=UTC)
+    items = [
+        replace(_photo_item("paris", base_time, 4000, 3000), gps=PARIS),
+        replace(_photo_item("rome", base_time + timedelta(hours=1), 4000, 3000), gps=ROME),
+        replace(
+            _photo_item("paris-nearby", base_time + timedelta(hours=2), 4000, 3000),
+            gps=PARIS_NEARBY,
+        ),
+        replace(_photo_item("rome-later", base_time + timedelta(hours=3), 4000, 3000), gps=ROME),
+        _photo_item("unlocated", base_time + timedelta(hours=4), 4000, 3000),
+        _photo_item("unlocated-later", base_time + timedelta(hours=5), 4000, 3000),
+    ]
+
+    candidate_sets, candidate_pairs, debug = build_candidate_sets_with_debug(
+        items, geohash_precision=6
+    )
+
+    assert [[item.id for item in group] for group in candidate_sets] == [
+        ["paris", "paris-nearby"],
+        ["rome", "rome-later"],
+        ["unlocated", "unlocated-later"],
+    ]
+    assert [(left.id, right.id) for left, right in candidate_pairs] == [
+        (located, unlocated)
+        for located in ["paris", "rome", "paris-nearby", "rome-later"]
+        for unlocated in ["unlocated", "unlocated-later"]
+    ]
+    assert (debug.geo_cells, debug.geo_rejections) == (3, 4)
+    assert build_candidate_sets(items) == ([items], [])
+    _, _, comparisons = group_near_duplicates(
+        candidate_sets,
+        {item.id: PerceptualHashes(dhash=0, phash=0) for item in items},
+        SimilarityThresholds(dhash_very=5, dhash_possible=10, phash_very=6, phash_possible=12),
+        pairs=candidate_pairs,
+    )
+    assert comparisons == 15 - debug.geo_rejections
+
+
+def test_window_candidates_skip_other_cameras_and_distant_exposures():
+    base_time = datetime(2024, 5, 1, 12, tzinfo=UTC)
+    items = [
+        replace(_photo_item("pixel", base_time, 4000, 3000), capture=PIXEL_DAYLIGHT),
+        replace(
+            _photo_item("pixel-burst", base_time + timedelta(seconds=1), 4000, 3000),
+            capture=replace(PIXEL_DAYLIGHT, camera_model="PIXEL 8 "),
+        ),
+        replace(
+            _photo_item("iphone", base_time + timedelta(seconds=2), 4000, 3000),
+            capture=IPHONE_DAYLIGHT,
+        ),
+        replace(
+            _photo_item("pixel-night", base_time + timedelta(seconds=3), 4000, 3000),
+            capture=PIXEL_NIGHT,
+        ),
+        _photo_item("no-exif", base_time + timedelta(seconds=4), 4000, 3000),
+    ]
+
+    pairs, debug = build_candidate_pairs_with_debug(items, window_seconds=600, exposure_stops=4)
+
+    assert [(left.id, right.id) for left, right in pairs] == [
+        ("pixel", "pixel-burst"),
+        ("pixel", "no-exif"),
+        ("pixel-burst", "no-exif"),
+        ("iphone", "no-exif"),
+        ("pixel-night", "no-exif"),
+    ]
+    assert debug.camera_rejections == 5
+    unfiltered, _ = build_candidate_pairs_with_debug(items, window_seconds=600)
+    assert len(unfiltered) == 10
+
+
+def test_bucket_candidates_split_by_camera_and_exposure():
+    base_time = datetime(2024, 5, 1, 9, tzinfo=UTC)
+    items = [
+        replace(_photo_item("pixel", base_time, 4000, 3000), capture=PIXEL_DAYLIGHT),
+        replace(
+            _photo_item("iphone", base_time + timedelta(hours=1), 4000, 3000),
+            capture=IPHONE_DAYLIGHT,
+        ),
+        replace(
+            _photo_item("pixel-night", base_time + timedelta(hours=2), 4000, 3000),
+            capture=PIXEL_NIGHT,
+        ),
+        replace(
+            _photo_item("pixel-model-only", base_time + timedelta(hours=3), 4000, 3000),
+            capture=CaptureSettings(camera_model="Pixel 8"),
+        ),
+        replace(
+            _photo_item("iphone-later", base_time + timedelta(hours=4), 4000, 3000),
+            capture=IPHONE_DAYLIGHT,
+        ),
+    ]
+
+    candidate_sets, candidate_pairs, debug = build_candidate_sets_with_debug(
+        items, exposure_stops=4
+    )
+
+    assert [[item.id for item in group] for group in candidate_sets] == [["iphone", "iphone-later"]]
+    assert [(left.id, right.id) for left, right in candidate_pairs] == [
+        ("pixel", "pixel-model-only"),
+        ("pixel-night", "pixel-model-only"),
+    ]
+    assert debug.camera_rejections == 7
+    assert build_candidate_sets(items) == ([items], [])
+
+
+def test_oversized_sets_keep_only_pairs_with_nearby_coarse_hashes():
+    base_time = datetime(2024, 1, 1, tzinfo=UTC)
+    small = [_photo_item(f"s{index}", base_time, 100, 100) for index in range(2)]
+    large = [_photo_item(f"l{index}", base_time, 100, 100) for index in range(5)]
+    coarse = {"l0": 0b0000, "l1": 0b0111, "l2": 0xFF00, "l3": 0b0001}
+
+    kept, pairs, split = split_oversized_sets(
+        [small, large],
+        lambda item: coarse.get(item.id),
+        max_items=4,
+        max_comparisons=1,
+    )
+
+    assert kept == [small]
+    assert sorted((left.id, right.id) for left, right in pairs) == [
+        ("l0", "l1"),
+        ("l0", "l3"),
+        ("l1", "l3"),
+        ("l4", "l0"),
+        ("l4", "l1"),
+        ("l4", "l2"),
+        ("l4", "l3"),
+    ]
+    assert split == CandidateSplit(
+        sets_split=1,
+        items_split=5,
+        items_without_coarse_hash=1,
+        comparisons_before=10,
+        pairs_kept=7,
+    )
+    assert split_oversized_sets(
+        [small, large], lambda item: coarse.get(item.id), max_items=4, max_comparisons=11
+    ) == ([small, large], [], CandidateSplit())
+
+
 def test_exact_duplicate_grouping():
     image_bytes = _make_image_bytes()
     items = [
@@ -112,6 +373,52 @@ def test_near_duplicate_grouping_is_very_similar(monkeypatch):
     assert [item.id for item in groups_very[0].items] == ["near1", "near2"]
 
 
+def test_possibly_similar_groups_do_not_bridge_through_very_similar_items():
+    base_time = datetime(2024, 1, 1, tzinfo=UTC)
+    items = [
+        _photo_item(item_id, base_time + timedelta(minutes=offset), 64, 64)
+        for offset, item_id in enumerate("fedcba")
+    ]
+    dhashes = {
+        "a": 0b111100,
+        "b": 0,
+        "c": 0b1,
+        "d": 0b1111 << 20,
+        "e": 0b111100 ^ (0b111 << 40),
+        "f": (0b1111 << 20) ^ (0b1111 << 50),
+    }
+    perceptual_hashes = {
+        item_id: PerceptualHashes(dhash=dhash, phash=index)
+        for index, (item_id, dhash) in enumerate(dhashes.items())
+    }
+    thresholds = SimilarityThresholds(
+        dhash_very=2, dhash_possible=6, phash_very=0, phash_possible=0
+    )
+
+    groups_very, groups_possible, comparisons = group_near_duplicates(
+        [items, items[:3]],
+        perceptual_hashes,
+        thresholds,
+    )
+
+    assert comparisons == 15
+    assert [[item.id for item in group.items] for group in groups_very] == [["c", "b"]]
+    assert [[item.id for item in group.items] for group in groups_possible] == [
+        ["e", "a"],
+        ["f", "d"],
+    ]
+
+
+def test_disjoint_set_components_are_ordered_by_smallest_node():
+    sets = DisjointSet(7)
+    for left, right in [(5, 6), (3, 1), (6, 2), (1, 1)]:
+        sets.union(left, right)
+
+    assert sets.find(2) == sets.find(5)
+    assert sets.components() == [[1, 3], [2, 5, 6]]
+    assert sets.components(min_size=1) == [[0], [1, 3], [2, 5, 6], [4]]
+
+
 def test_representative_pair_selection():
     base_time = datetime(2024, 1, 1, tzinfo=UTC)
     items = [
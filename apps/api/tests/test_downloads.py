@@ -1,9 +1,19 @@
 from __future__ import annotations
 
+import hashlib
 import ipaddress
+import shutil
+import ssl
+import subprocess
+import threading
 import time
+from collections.abc import Iterator
+from dataclasses import replace
 from datetime import UTC, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
 from typing import Any
+from urllib.parse import urlsplit
 
 import pytest
 
@@ -390,13 +400,111 @@ def test_socket_resolver_enforces_its_deadline(monkeypatch):
 
     started = time.monotonic()
     with pytest.raises(downloads.DownloadSecurityError) as caught:
-        downloads.SocketResolver().resolve("photos.google.com", 443, 0.01)
+        downloads.SocketResolver().resolve("slow.example", 443, 0.01)
 
     assert caught.value.category == "download_timeout"
     assert caught.value.fatal_to_scan is True
     assert time.monotonic() - started < 0.5
 
 
+def test_stuck_lookups_do_not_hold_up_other_hosts(monkeypatch):
+    answer = [(None, None, None, "", (str(PUBLIC_IP), 443))]
+    unblock = threading.Event()
+    stuck_lookups = []
+
+    def getaddrinfo(hostname: str, *_args: Any, **_kwargs: Any) -> object:
+        if hostname == "stuck.example":
+            stuck_lookups.append(hostname)
+            unblock.wait(5)
+        return answer
+
+    monkeypatch.setattr(downloads.socket, "getaddrinfo", getaddrinfo)
+    resolver = downloads.SocketResolver()
+    try:
+        for _ in range(8):
+            with pytest.raises(downloads.DownloadSecurityError):
+                resolver.resolve("stuck.example", 443, 0.01)
+
+        assert resolver.resolve("photos.google.com", 443, 1) == {PUBLIC_IP}
+        assert len(stuck_lookups) == 1
+    finally:
+        unblock.set()
+
+
+def test_resolver_cache_reuses_answers_until_ttl_and_skips_failures():
+    now = [0.0]
+    answers: list[object] = [OSError("no answer"), frozenset({PUBLIC_IP}), frozenset({PUBLIC_IP})]
+
+    class ScriptedResolver:
+        calls = 0
+
+        def resolve(self, hostname: str, port: int, timeout_seconds: float) -> Any:
+            ScriptedResolver.calls += 1
+            answer = answers.pop(0)
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+    resolver = downloads.CachingResolver(ScriptedResolver(), ttl_seconds=60, clock=lambda: now[0])
+
+    with pytest.raises(OSError):
+        resolver.resolve("photos.google.com", 443, 5)
+    assert resolver.resolve("photos.google.com", 443, 5) == {PUBLIC_IP}
+    now[0] = 59.9
+    assert resolver.resolve("photos.google.com", 443, 5) == {PUBLIC_IP}
+    now[0] = 60.0
+    assert resolver.resolve("photos.google.com", 443, 5) == {PUBLIC_IP}
+
+    assert ScriptedResolver.calls == 3
+    assert (resolver.lookups, resolver.cache_hits) == (3, 1)
+
+
+def test_resolver_cache_collapses_concurrent_lookups_for_one_host():
+    release = threading.Event()
+    calls: list[str] = []
+
+    class SlowResolver:
+        def resolve(self, hostname: str, port: int, timeout_seconds: float) -> Any:
+            calls.append(hostname)
+            release.wait(2)
+            return frozenset({PUBLIC_IP})
+
+    resolver = downloads.CachingResolver(SlowResolver())
+    results: list[frozenset[downloads.IPAddress]] = []
+    workers = [
+        threading.Thread(
+            target=lambda: results.append(resolver.resolve("photos.google.com", 443, 5))
+        )
+        for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    time.sleep(0.05)
+    release.set()
+    for worker in workers:
+        worker.join()
+
+    assert calls == ["photos.google.com"]
+    assert results == [frozenset({PUBLIC_IP})] * 4
+    assert (resolver.lookups, resolver.cache_hits) == (1, 3)
+
+
+def test_cached_addresses_are_still_validated_for_every_download():
+    resolver = FakeResolver({"photos.google.com": frozenset({PUBLIC_IP})})
+    connector = FakeConnector(FakeResponse(), FakeResponse())
+    manager = _manager(resolver=resolver, connector=connector)
+
+    manager.get_bytes(_photo_item("one", "https://photos.google.com/one"))
+    manager._resolver._answers[("photos.google.com", 443)] = (frozenset({PRIVATE_IP}), 1e12)
+    with pytest.raises(downloads.DownloadSecurityError) as caught:
+        manager.get_bytes(_photo_item("two", "https://photos.google.com/two"))
+
+    assert caught.value.category == "download_address"
+    assert resolver.calls == [("photos.google.com", 443)]
+    assert (manager.dns_lookups, manager.dns_cache_hits) == (1, 1)
+    assert len(connector.calls) == 1
+
+
 def test_read_timeout_never_exceeds_per_attempt_ceiling():
     response = FakeResponse(chunks=[b"image", b""])
     manager = _manager(
@@ -478,9 +586,12 @@ def test_pinned_connection_preserves_original_tls_hostname(monkeypatch):
     seen: dict[str, Any] = {}
 
     class FakeContext:
-        def wrap_socket(self, sock: object, *, server_hostname: str) -> object:
+        def wrap_socket(
+            self, sock: object, *, server_hostname: str, session: object = None
+        ) -> object:
             seen["socket"] = sock
             seen["server_hostname"] = server_hostname
+            seen["session"] = session
             return wrapped_socket
 
     monkeypatch.setenv("HTTPS_PROXY", "http://127.0.0.1:9999")
@@ -499,9 +610,180 @@ def test_pinned_connection_preserves_original_tls_hostname(monkeypatch):
     assert seen == {
         "socket": raw_socket,
         "server_hostname": "photos.google.com",
+        "session": None,
     }
 
 
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:  # noqa: N802 - BaseHTTPRequestHandler signature
+        self.server.client_ports.add(self.client_address[1])  # type: ignore[attr-defined]
+        payload = b"x" * 1024
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        # Drop the connection without announcing it, as an idle-timing-out server would.
+        self.close_connection = self.path == "/drop"
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        return
+
+
+class PeerOverride:
+    def __init__(self, sock: Any, peer: str) -> None:
+        self._sock = sock
+        self._peer = peer
+
+    def getpeername(self) -> tuple[str, int]:
+        return (self._peer, 0)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._sock, name)
+
+
+@pytest.fixture
+def keep_alive_server() -> Iterator[ThreadingHTTPServer]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    server.client_ports = set()  # type: ignore[attr-defined]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join(timeout=2)
+
+
+def test_pooled_connector_reuses_keep_alive_connections(keep_alive_server):
+    connector = downloads.PinnedHttpConnector()
+    target = _local_target(keep_alive_server, "/one")
+
+    for _ in range(3):
+        assert _fetch_body(connector, target) == b"x" * 1024
+
+    assert (connector.connections_opened, connector.connections_reused) == (1, 2)
+    assert connector.reuse_ratio == pytest.approx(2 / 3)
+    assert len(keep_alive_server.client_ports) == 1  # type: ignore[attr-defined]
+    connector.close_idle()
+
+
+def test_pooled_connection_peer_is_rechecked_on_checkout(keep_alive_server):
+    connector = downloads.PinnedHttpConnector()
+    target = _local_target(keep_alive_server, "/one")
+    _fetch_body(connector, target)
+    pooled = connector._idle[0].connection
+    pooled.sock = PeerOverride(pooled.sock, "10.0.0.9")
+
+    with pytest.raises(downloads.DownloadSecurityError) as caught:
+        connector.open(target, frozenset({PRIVATE_IP}), 5)
+
+    assert caught.value.category == "download_address"
+    assert pooled.sock is None
+    assert connector.connections_reused == 0
+
+
+def test_pool_drops_partial_expired_and_overflow_connections(keep_alive_server):
+    now = [0.0]
+    connector = downloads.PinnedHttpConnector(
+        clock=lambda: now[0], max_idle_connections=1, idle_timeout_seconds=10
+    )
+    first = _local_target(keep_alive_server, "/one", hostname="first.test")
+    second = _local_target(keep_alive_server, "/one", hostname="second.test")
+
+    partial = connector.open(first, frozenset({PRIVATE_IP}), 5)
+    partial.read(10)
+    partial.close()
+    held = [connector.open(target, frozenset({PRIVATE_IP}), 5) for target in (first, second)]
+    for response in held:
+        response.read(2048)
+        response.close()
+    assert [entry.key.hostname for entry in connector._idle] == ["second.test"]
+
+    now[0] = 10.0
+    _fetch_body(connector, second)
+
+    assert (connector.connections_opened, connector.connections_reused) == (4, 0)
+    connector.close_idle()
+
+
+def test_connection_dropped_while_idle_is_replayed_on_a_fresh_one(keep_alive_server):
+    connector = downloads.PinnedHttpConnector()
+
+    assert _fetch_body(connector, _local_target(keep_alive_server, "/drop")) == b"x" * 1024
+    assert _fetch_body(connector, _local_target(keep_alive_server, "/one")) == b"x" * 1024
+
+    assert (connector.connections_opened, connector.connections_reused) == (2, 0)
+    connector.close_idle()
+
+
+class CloseEachResponseHandler(KeepAliveHandler):
+    protocol_version = "HTTP/1.0"
+
+
+@pytest.fixture
+def tls_server(tmp_path: Path) -> Iterator[tuple[ThreadingHTTPServer, ssl.SSLContext]]:
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl is needed to issue a local test certificate")
+    cert, key = tmp_path / "cert.pem", tmp_path / "key.pem"
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+            "-keyout", str(key), "-out", str(cert), "-subj", "/CN=fixture.test",
+            "-addext", "subjectAltName=DNS:fixture.test",
+        ],
+        check=True,
+        capture_output=True,
+    )  # fmt: skip
+    server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server_context.load_cert_chain(cert, key)
+    client_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    client_context.load_verify_locations(cert)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CloseEachResponseHandler)
+    server.client_ports = set()  # type: ignore[attr-defined]
+    server.socket = server_context.wrap_socket(server.socket, server_side=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server, client_context
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join(timeout=2)
+
+
+def test_default_tls_context_is_built_once_per_process(monkeypatch):
+    built: list[ssl.SSLContext] = []
+    create = downloads._create_isolated_ssl_context
+    monkeypatch.setattr(
+        downloads, "_create_isolated_ssl_context", lambda: built.append(create()) or built[-1]
+    )
+    downloads._shared_ssl_context.cache_clear()
+    try:
+        first = downloads.PinnedHttpConnector()
+        second = downloads.PinnedHttpConnector()
+
+        assert len(built) == 1
+        assert first._ssl_context is second._ssl_context is built[0]
+        assert first._tls_sessions is second._tls_sessions
+    finally:
+        downloads._shared_ssl_context.cache_clear()
+
+
+def test_repeat_tls_connections_resume_the_pinned_host_session(tls_server):
+    server, client_context = tls_server
+    connector = downloads.PinnedHttpConnector(ssl_context=client_context)
+    target = replace(_local_target(server, "/one"), scheme="https")
+
+    for _ in range(3):
+        assert _fetch_body(connector, target) == b"x" * 1024
+
+    assert (connector.connections_opened, connector.connections_reused) == (3, 0)
+    assert (connector.tls_handshakes_full, connector.tls_handshakes_resumed) == (1, 2)
+
+
 def test_custom_fetcher_is_cached():
     calls: list[str] = []
     manager = downloads.DownloadManager(fetcher=lambda item: calls.append(item.id) or b"payload")
@@ -513,6 +795,226 @@ def test_custom_fetcher_is_cached():
     assert manager.download_count == 1
 
 
+def test_sha256_is_computed_while_streaming_and_can_skip_buffering():
+    resolver = FakeResolver({"photos.google.com": frozenset({PUBLIC_IP})})
+    manager = _manager(
+        resolver=resolver,
+        connector=FakeConnector(
+            FakeResponse(chunks=[b"12", b"34", b""]),
+            FakeResponse(chunks=[b"5678", b""]),
+        ),
+    )
+    buffered = _photo_item("buffered", "https://photos.google.com/one")
+    streamed = _photo_item("streamed", "https://photos.google.com/two")
+
+    assert manager.get_bytes(buffered) == b"1234"
+    assert manager.get_sha256(buffered) == hashlib.sha256(b"1234").hexdigest()
+    assert manager.get_sha256(streamed) == hashlib.sha256(b"5678").hexdigest()
+    assert manager.get_sha256(streamed) == hashlib.sha256(b"5678").hexdigest()
+
+    assert manager.download_count == 2
+    assert manager.peak_bytes_held == 4
+
+
+def test_byte_cache_evicts_least_recently_used_bytes_and_tracks_peak():
+    cache = downloads.ByteCache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+
+    cache.put("c", b"cccc")
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (b"aaaa", b"cccc")
+    assert (cache.bytes_held, cache.peak_bytes_held, cache.eviction_count) == (8, 8, 1)
+    cache.release("a")
+    assert cache.bytes_held == 4
+    assert cache.has_room_for(6) and not cache.has_room_for(7)
+
+
+def test_released_and_evicted_bytes_are_downloaded_again():
+    calls: list[str] = []
+    manager = downloads.DownloadManager(
+        fetcher=lambda item: calls.append(item.id) or b"four",
+        cache_max_bytes=8,
+    )
+    one, two, three = (_photo_item(item_id, None) for item_id in ("one", "two", "three"))
+
+    manager.get_bytes(one)
+    manager.release(one)
+    for item in (one, two, three, one):
+        manager.get_bytes(item)
+
+    assert calls == ["one", "one", "two", "three", "one"]
+    assert manager.cache_eviction_count == 2
+    assert manager.peak_bytes_held == 8
+
+
+def test_scan_budget_charges_are_exact_under_concurrent_downloads():
+    budget = downloads.ScanDownloadBudget(max_bytes=1000)
+    rejected: list[downloads.DownloadSecurityError] = []
+
+    def charge_many() -> None:
+        for _ in range(50):
+            try:
+                budget.charge(3)
+            except downloads.DownloadSecurityError as exc:
+                rejected.append(exc)
+
+    workers = [threading.Thread(target=charge_many) for _ in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert budget.bytes_charged == 999
+    assert len(rejected) == 8 * 50 - 333
+    assert budget.remaining_bytes() == 1
+
+
+def test_fetch_many_respects_global_and_per_host_limits():
+    lock = threading.Lock()
+    active: dict[str, int] = {}
+    peaks = {"total": 0, "a.example": 0, "b.example": 0}
+
+    def fetcher(item: PhotoItem) -> bytes:
+        host = urlsplit(item.download_url or "").hostname or ""
+        with lock:
+            active[host] = active.get(host, 0) + 1
+            peaks[host] = max(peaks[host], active[host])
+            peaks["total"] = max(peaks["total"], sum(active.values()))
+        time.sleep(0.01)
+        with lock:
+            active[host] -= 1
+        return item.id.encode()
+
+    manager = downloads.DownloadManager(
+        fetcher=fetcher, max_concurrency=3, max_per_host_concurrency=2
+    )
+    items = [
+        _photo_item(f"{host}-{index}", f"https://{host}/{index}")
+        for index in range(6)
+        for host in ("a.example", "b.example")
+    ]
+
+    assert manager.fetch_many(items) == {}
+    assert manager.download_count == 12
+    assert peaks["total"] <= 3
+    assert peaks["a.example"] <= 2 and peaks["b.example"] <= 2
+    assert all(manager.get_bytes(item) == item.id.encode() for item in items)
+
+
+def test_fetch_many_returns_failures_and_starts_nothing_after_a_fatal_error():
+    calls: list[str] = []
+    slow_started = threading.Event()
+    fatal_raised = threading.Event()
+
+    def fetcher(item: PhotoItem) -> bytes:
+        calls.append(item.id)
+        if item.id == "fatal":
+            slow_started.wait(1)
+            fatal_raised.set()
+            raise downloads.DownloadSecurityError(
+                "download_size",
+                "The scan exceeded its download size limit.",
+                fatal_to_scan=True,
+            )
+        if item.id == "slow":
+            slow_started.set()
+            # Hold this worker until the fatal error is on its way out of the other one.
+            fatal_raised.wait(1)
+            time.sleep(0.05)
+            return b"slow"
+        raise OSError("connection reset")
+
+    manager = downloads.DownloadManager(fetcher=fetcher, max_concurrency=2)
+    items = [_photo_item(item_id, None) for item_id in ("fatal", "slow", "later")]
+
+    failures = manager.fetch_many(items)
+
+    assert sorted(calls) == ["fatal", "slow"]
+    assert failures.keys() == {"fatal", "later"}
+    assert failures["later"] is failures["fatal"]
+
+
+def test_buffered_downloads_reserve_the_declared_length_instead_of_a_maximum_item():
+    lock = threading.Lock()
+    active = [0]
+    peak = [0]
+
+    class SlowResponse(FakeResponse):
+        def read(self, size: int) -> bytes:
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return super().read(size)
+
+    class RepeatingConnector(FakeConnector):
+        def __init__(self, headers: dict[str, list[str]]) -> None:
+            super().__init__()
+            self.headers = headers
+
+        def open(self, *_args: Any) -> FakeResponse:
+            return SlowResponse(headers=self.headers, chunks=[b"x" * 10, b""])
+
+    items = [
+        _photo_item(f"item-{index}", f"https://photos.google.com/{index}") for index in range(6)
+    ]
+    # Two maximum-size items fit the cache; declared 10-byte bodies leave room for every worker.
+    for headers, expected_peak in (({"Content-Length": ["10"]}, 4), ({}, 2)):
+        peak[0] = 0
+        manager = downloads.DownloadManager(
+            resolver=FakeResolver({"photos.google.com": frozenset({PUBLIC_IP})}),
+            connector=RepeatingConnector(headers),
+            allowed_hosts=["photos.google.com"],
+            max_item_bytes=100,
+            cache_max_bytes=250,
+            max_concurrency=4,
+            max_per_host_concurrency=4,
+        )
+
+        assert manager.fetch_while_room(items) == (6, {})
+        assert peak[0] == expected_peak
+        assert manager.peak_bytes_held == 60
+
+
+def test_fetch_while_room_stops_once_held_bytes_leave_no_room():
+    manager = downloads.DownloadManager(
+        fetcher=lambda item: b"x" * 40, max_item_bytes=50, cache_max_bytes=100
+    )
+    items = [_photo_item(f"item-{index}", None) for index in range(4)]
+
+    assert manager.fetch_while_room(items) == (2, {})
+    assert not manager.has_download_room()
+
+    manager.release(items[0])
+
+    assert manager.has_download_room()
+    assert manager.fetch_while_room(items[2:]) == (1, {})
+
+
+def test_download_batches_share_one_pool_of_download_threads():
+    threads: set[threading.Thread] = set()
+
+    def fetcher(item: PhotoItem) -> bytes:
+        threads.add(threading.current_thread())
+        time.sleep(0.01)
+        return item.id.encode()
+
+    manager = downloads.DownloadManager(fetcher=fetcher, max_concurrency=2)
+    for batch in range(3):
+        items = [_photo_item(f"{batch}-{index}", None) for index in range(4)]
+        assert manager.fetch_many(items, buffer=False) == {}
+        assert manager.fetch_while_room(items) == (4, {})
+
+    assert len(threads) == 2
+    manager.close_idle_connections()
+    assert _wait_for_exit(threads)
+
+
 def _manager(
     *,
     resolver: FakeResolver,
@@ -530,6 +1032,30 @@ def _manager(
     )
 
 
+def _local_target(
+    server: ThreadingHTTPServer, path: str, *, hostname: str = "fixture.test"
+) -> downloads.AuthorizedTarget:
+    port = server.server_address[1]
+    return downloads.AuthorizedTarget(
+        url=f"http://{hostname}:{port}{path}",
+        scheme="http",
+        hostname=hostname,
+        port=port,
+        request_target=path,
+        allow_non_global=True,
+    )
+
+
+def _fetch_body(
+    connector: downloads.PinnedHttpConnector, target: downloads.AuthorizedTarget
+) -> bytes:
+    response = connector.open(target, frozenset({PRIVATE_IP}), 5)
+    try:
+        return response.read(4096)
+    finally:
+        response.close()
+
+
 def _photo_item(item_id: str, download_url: str | None) -> PhotoItem:
     return PhotoItem(
         id=item_id,
@@ -542,3 +1068,9 @@ def _photo_item(item_id: str, download_url: str | None) -> PhotoItem:
         download_url=download_url,
         deep_link=None,
     )
+
+
+def _wait_for_exit(threads: set[threading.Thread]) -> bool:
+    for thread in threads:
+        thread.join(timeout=1)
+    return all(not thread.is_alive() for thread in threads)
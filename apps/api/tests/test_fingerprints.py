@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from dataclasses import replace
+from datetime import UTC, datetime
+
+import pytest
+
+from app.engine.fingerprints import (
+    FingerprintStore,
+    ItemFingerprint,
+    content_validator,
+    dump_fingerprint,
+    load_fingerprint,
+)
+from app.engine.models import CaptureSettings, GPSLocation, PhotoItem
+
+
+def test_fingerprint_records_round_trip_through_storage():
+    fingerprint = ItemFingerprint(
+        validator="image/jpeg|4x3|2024-01-01T00:00:00+00:00|one.jpg",
+        sha256="ab" * 32,
+        byte_length=1234,
+        dhash=0xFFFF_0000_FFFF_0000,
+        phash=1,
+        decoder="full",
+    )
+    byte_hash_only = replace(fingerprint, dhash=None, phash=None, decoder=None)
+
+    assert load_fingerprint(dump_fingerprint(fingerprint)) == fingerprint
+    assert load_fingerprint(dump_fingerprint(byte_hash_only)) == byte_hash_only
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        None,
+        "",
+        "not-json",
+        "[]",
+        '{"version": 0}',
+        '{"version": 2, "sha256": "ab"}',
+        '{"version": 1, "validator": "v", "sha256": "ab", "byteLength": 1, "dhash": "01",'
+        ' "phash": "02"}',
+    ],
+)
+def test_unreadable_fingerprint_records_are_misses(value):
+    assert load_fingerprint(value) is None
+
+
+def test_store_only_trusts_records_whose_validator_still_matches():
+    item = _photo_item("one")
+    store = FingerprintStore()
+    store.record(item, sha256="ab" * 32, byte_length=10, dhash=1, phash=2)
+
+    assert store.lookup(item) == store.updated["one"]
+    assert FingerprintStore(store.updated).lookup(_photo_item("one", height=5)) is None
+    assert FingerprintStore(store.updated).lookup(_photo_item("two")) is None
+
+
+def test_edits_to_location_or_camera_settings_invalidate_the_record():
+    item = _photo_item("one")
+    located = replace(item, gps=GPSLocation(51.5, -0.12))
+    captured = replace(item, capture=CaptureSettings(camera_model="Pixel 8", iso_equivalent=100))
+    store = FingerprintStore()
+    store.record(item, sha256="ab" * 32, byte_length=10)
+
+    assert store.lookup(item) is not None
+    assert store.lookup(located) is None
+    assert store.lookup(captured) is None
+    assert store.lookup(replace(captured, capture=CaptureSettings(camera_model="Pixel 8"))) is None
+
+
+def test_perceptual_hashes_from_another_decoder_are_dropped():
+    item = _photo_item("one")
+    store = FingerprintStore()
+    store.record(item, sha256="ab" * 32, byte_length=10, dhash=1, phash=2, decoder="full")
+
+    draft = store.lookup(item, decoder="jpeg-draft-256")
+
+    assert store.lookup(item) == store.updated["one"]
+    assert draft is not None
+    assert draft.sha256 == "ab" * 32
+    assert not draft.has_perceptual_hashes
+
+
+def test_items_without_dimensions_are_never_fingerprinted():
+    item = _photo_item("one", height=None)
+    store = FingerprintStore()
+
+    store.record(item, sha256="ab" * 32, byte_length=10, dhash=1, phash=2)
+
+    assert content_validator(item) is None
+    assert store.updated == {}
+
+
+def _photo_item(item_id: str, *, height: int | None = 3) -> PhotoItem:
+    return PhotoItem(
+        id=item_id,
+        create_time=datetime(2024, 1, 1, tzinfo=UTC),
+        filename=f"{item_id}.jpg",
+        mime_type="image/jpeg",
+        width=4,
+        height=height,
+        gps=None,
+        download_url="memory://",
+        deep_link=None,
+    )
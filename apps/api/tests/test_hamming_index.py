@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import random
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.engine import grouping, hamming_index
+from app.engine.grouping import SimilarityThresholds, group_near_duplicates
+from app.engine.hashing import PerceptualHashes, hamming_distance
+from app.engine.models import PhotoItem
+
+THRESHOLDS = SimilarityThresholds(dhash_very=5, dhash_possible=10, phash_very=6, phash_possible=12)
+
+
+@pytest.mark.parametrize("bands,radius", [(8, 7), (8, 12), (4, 10)])
+def test_banded_pairs_find_every_pair_within_the_radius(bands, radius):
+    values = _clustered_hashes(random.Random(5), 600, max_flips=radius + 4)
+
+    found = list(hamming_index.banded_pairs(values, bands, radius))
+
+    expected = {
+        (left, right)
+        for right in range(len(values))
+        for left in range(right)
+        if hamming_distance(values[left], values[right]) <= radius
+    }
+    assert len(found) == len(set(found))
+    assert all(left < right for left, right in found)
+    assert expected <= set(found)
+    assert len(found) < len(values) * (len(values) - 1) // 2 // 2
+
+
+def test_near_duplicate_groups_match_the_exhaustive_comparison(monkeypatch):
+    rng = random.Random(7)
+    items = [_photo_item(f"item-{index:04d}", index) for index in range(400)]
+    dhashes = _clustered_hashes(rng, len(items), max_flips=12)
+    phashes = _clustered_hashes(rng, len(items), max_flips=14)
+    hashes = {
+        item.id: PerceptualHashes(dhash=dhash, phash=phash)
+        for item, dhash, phash in zip(items, dhashes, phashes, strict=True)
+    }
+    all_pairs = len(items) * (len(items) - 1) // 2
+
+    measured = group_near_duplicates([items], hashes, THRESHOLDS)
+    monkeypatch.setattr(grouping, "KERNEL_MIN_ITEMS", len(items) + 1)
+    exhaustive = group_near_duplicates([items], hashes, THRESHOLDS)
+
+    assert measured == exhaustive
+    assert measured[0] and measured[1]
+    assert measured[2] == all_pairs
+
+
+@pytest.mark.parametrize("use_bitwise_count", [True, False])
+def test_kernel_pairs_match_scalar_distances(use_bitwise_count):
+    rng = random.Random(3)
+    dhashes = _clustered_hashes(rng, 300, max_flips=12)
+    phashes = _clustered_hashes(rng, 300, max_flips=14) + [(1 << 64) - 1]
+    dhashes.append(0)
+
+    blocks = list(
+        hamming_index.pairs_within(
+            [dhashes, phashes],
+            [10, 12],
+            block_cells=5000,
+            use_bitwise_count=use_bitwise_count,
+        )
+    )
+
+    found = {
+        (left, right): (dhash_distance, phash_distance)
+        for block in blocks
+        for left, right, dhash_distance, phash_distance in zip(
+            block.left.tolist(),
+            block.right.tolist(),
+            block.distances[0].tolist(),
+            block.distances[1].tolist(),
+            strict=True,
+        )
+    }
+    expected = {
+        (left, right): (
+            hamming_distance(dhashes[left], dhashes[right]),
+            hamming_distance(phashes[left], phashes[right]),
+        )
+        for right in range(len(dhashes))
+        for left in range(right)
+    }
+    assert len(blocks) > 1
+    assert found == {
+        pair: distances
+        for pair, distances in expected.items()
+        if distances[0] <= 10 or distances[1] <= 12
+    }
+
+
+def _clustered_hashes(rng: random.Random, count: int, *, max_flips: int) -> list[int]:
+    seeds = [rng.getrandbits(64) for _ in range(max(count // 4, 1))]
+    values = []
+    for index in range(count):
+        flips = rng.sample(range(64), rng.randrange(max_flips + 1))
+        values.append(seeds[index % len(seeds)] ^ sum(1 << bit for bit in flips))
+    return values
+
+
+def _photo_item(item_id: str, offset: int) -> PhotoItem:
+    return PhotoItem(
+        id=item_id,
+        create_time=datetime(2024, 1, 1, tzinfo=UTC) + timedelta(seconds=offset),
+        filename=f"{item_id}.jpg",
+        mime_type="image/jpeg",
+        width=100,
+        height=100,
+        gps=None,
+        download_url=None,
+        deep_link=None,
+    )
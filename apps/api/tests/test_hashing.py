@@ -1,6 +1,32 @@
 from __future__ import annotations
 
+import json
+import math
+import multiprocessing
+import os
+import random
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import UTC, datetime
+from io import BytesIO
+from pathlib import Path
+from typing import Any
+
+import pytest
+from photo_corpus import render_photo_jpeg
+from PIL import Image
+
+from app.core.config import PhashBackend, Settings
 from app.engine import hashing
+from app.engine.downloads import DownloadManager
+from app.engine.models import PhotoItem
+
+GOLDEN_HASHES_PATH = (
+    Path(__file__).resolve().parents[3] / "tests" / "fixtures" / "hashing" / "golden_hashes.json"
+)
+GOLDEN_CORPUS: list[dict[str, Any]] = json.loads(GOLDEN_HASHES_PATH.read_text(encoding="utf-8"))[
+    "images"
+]
 
 
 def test_median_handles_odd_and_even_lengths():
@@ -26,6 +52,257 @@ def test_compute_phash_sets_single_high_bit_for_uniform_image(monkeypatch):
     assert result & (1 << ((8 * 8) - 1))
 
 
+@pytest.mark.parametrize("entry", GOLDEN_CORPUS, ids=lambda entry: entry["name"])
+@pytest.mark.parametrize("backend", list(PhashBackend))
+def test_golden_corpus_hashes_are_stable_for_every_backend(entry, backend):
+    image_bytes = render_golden_image(entry)
+
+    assert f"{hashing.compute_dhash(image_bytes):016x}" == entry["dhash"]
+    assert f"{hashing.compute_phash(image_bytes, backend=backend):016x}" == entry["phash"]
+
+
+@pytest.mark.parametrize("fill", [0, 37, 200, 255])
+def test_numpy_phash_matches_reference_for_tied_coefficients(fill):
+    image_bytes = _encode(Image.new("L", (48, 40), color=fill))
+
+    assert hashing.compute_phash(image_bytes, backend=PhashBackend.NUMPY) == (
+        hashing.compute_phash(image_bytes, backend=PhashBackend.PYTHON)
+    )
+
+
+def test_numpy_phash_supports_non_default_hash_sizes():
+    image_bytes = render_golden_image({"kind": "noise", "seed": 11, "width": 64, "height": 48})
+
+    for hash_size in (1, 5, 8, 12):
+        assert hashing.compute_phash(
+            image_bytes, hash_size=hash_size, backend=PhashBackend.NUMPY
+        ) == hashing.compute_phash(image_bytes, hash_size=hash_size, backend=PhashBackend.PYTHON)
+
+
+def test_hashing_service_uses_configured_phash_backend(monkeypatch):
+    observed: list[PhashBackend] = []
+
+    def fake_phash(_pixels: bytes, _size: int, _hash_size: int, backend: PhashBackend) -> int:
+        observed.append(backend)
+        return 0
+
+    monkeypatch.setattr(hashing, "_phash_from_pixels", fake_phash)
+    image_bytes = render_golden_image(GOLDEN_CORPUS[0])
+    downloader = DownloadManager(fetcher=lambda _item: image_bytes)
+    service = hashing.HashingService(downloader, phash_backend=PhashBackend.PYTHON)
+
+    service.get_perceptual_hashes(_photo_item("one"))
+
+    assert observed == [PhashBackend.PYTHON]
+
+
+def test_hashing_service_decodes_each_image_once(monkeypatch):
+    image_bytes = render_golden_image(GOLDEN_CORPUS[-1])
+    load_calls: list[bytes] = []
+    original_load = hashing._open_image
+
+    def counting_load(data: bytes, **kwargs: Any) -> tuple[Image.Image, int]:
+        load_calls.append(data)
+        return original_load(data, **kwargs)
+
+    monkeypatch.setattr(hashing, "_open_image", counting_load)
+    service = hashing.HashingService(DownloadManager(fetcher=lambda _item: image_bytes))
+    item = _photo_item("one")
+
+    service.validate_image(item)
+    hashes = service.get_perceptual_hashes(item)
+
+    assert len(load_calls) == 1
+    assert service.decode_count == 1
+    assert service.decode_seconds > 0
+    assert service.perceptual_hash_seconds > 0
+    assert f"{hashes.dhash:016x}" == GOLDEN_CORPUS[-1]["dhash"]
+    assert f"{hashes.phash:016x}" == GOLDEN_CORPUS[-1]["phash"]
+
+
+def test_decode_image_reports_oriented_dimensions_and_hash_derivatives():
+    entry = next(entry for entry in GOLDEN_CORPUS if entry.get("orientation") == 6)
+
+    decoded = hashing.decode_image(render_golden_image(entry))
+
+    assert (decoded.width, decoded.height) == (entry["height"], entry["width"])
+    assert len(decoded.dhash_pixels) == 9 * 8
+    assert len(decoded.phash_pixels) == 32 * 32
+
+
+def test_hashing_service_keeps_a_coarse_average_hash_of_decoded_images():
+    image = Image.new("L", (64, 64))
+    image.paste(255, (32, 0, 64, 64))
+    service = hashing.HashingService(DownloadManager(fetcher=lambda _item: _encode(image)))
+    item = _photo_item("halves")
+
+    assert service.get_coarse_hash(item) is None
+    service.validate_image(item)
+    service.get_perceptual_hashes(item)
+
+    assert service.get_coarse_hash(item) == 0b0011_0011_0011_0011
+
+
+def test_hashing_service_propagates_decode_failures():
+    service = hashing.HashingService(DownloadManager(fetcher=lambda _item: b"not-an-image"))
+
+    with pytest.raises(OSError):
+        service.validate_image(_photo_item("bad"))
+    assert service.decode_count == 0
+
+
+class _RecordingExecutor(Executor):
+    def __init__(self) -> None:
+        self.batches: list[list[str]] = []
+
+    def submit(self, fn: Any, /, *args: Any, **kwargs: Any) -> Future[Any]:
+        self.batches.append([item_id for item_id, _ in args[0]])
+        future: Future[Any] = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+def test_decode_images_dispatches_batches_and_collects_failures_in_order():
+    images = {entry["name"]: render_golden_image(entry) for entry in GOLDEN_CORPUS[:5]}
+    images["bad"] = b"not-an-image"
+    items = [_photo_item(name) for name in images]
+    executor = _RecordingExecutor()
+    service = hashing.HashingService(
+        DownloadManager(fetcher=lambda item: images[item.id]),
+        executor=executor,
+        batch_size=2,
+    )
+
+    failures = service.decode_images([*items, items[0]])
+
+    assert executor.batches == [[item.id for item in items[i : i + 2]] for i in range(0, 6, 2)]
+    assert list(failures) == ["bad"]
+    assert isinstance(failures["bad"], OSError)
+    assert service.decode_count == 5
+    for entry, item in zip(GOLDEN_CORPUS[:5], items, strict=False):
+        hashes = service.get_perceptual_hashes(item)
+        assert f"{hashes.dhash:016x}" == entry["dhash"]
+        assert f"{hashes.phash:016x}" == entry["phash"]
+    assert service.decode_count == 5
+
+
+def test_decode_images_in_worker_processes_matches_serial_decoding():
+    corpus = [render_photo_jpeg(seed, 800, 600) for seed in range(6)]
+    items = [_photo_item(f"item-{index}") for index in range(len(corpus))]
+    by_id = {item.id: data for item, data in zip(items, corpus, strict=True)}
+    serial = hashing.HashingService(DownloadManager(fetcher=lambda item: by_id[item.id]))
+    serial.decode_images(items)
+
+    with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("spawn")) as executor:
+        pooled = hashing.HashingService(
+            DownloadManager(fetcher=lambda item: by_id[item.id]),
+            executor=executor,
+            batch_size=4,
+        )
+        assert pooled.decode_images(items) == {}
+
+    assert [pooled.get_decoded_image(item) for item in items] == [
+        serial.get_decoded_image(item) for item in items
+    ]
+    assert pooled.decode_count == serial.decode_count == len(items)
+
+
+def test_hashing_executor_is_shared_and_disabled_for_a_single_worker():
+    hashing.shutdown_hashing_executor()
+    try:
+        executor = hashing.get_hashing_executor(2)
+        assert isinstance(executor, ProcessPoolExecutor)
+        assert hashing.get_hashing_executor(2) is executor
+
+        resized = hashing.get_hashing_executor(3)
+
+        assert resized is not executor
+        with pytest.raises(RuntimeError):
+            executor.submit(abs, -1)
+    finally:
+        hashing.shutdown_hashing_executor()
+
+    assert hashing.get_hashing_executor(1) is None
+
+
+def test_broken_hashing_executor_is_replaced_for_this_and_later_scans():
+    corpus = [_encode(Image.new("L", (16, 16), color=fill)) for fill in (40, 200)]
+    items = [_photo_item(f"item-{index}") for index in range(len(corpus))]
+    by_id = {item.id: data for item, data in zip(items, corpus, strict=True)}
+    hashing.shutdown_hashing_executor()
+    try:
+        broken = hashing.get_hashing_executor(2)
+        assert broken is not None
+        assert isinstance(broken.submit(os._exit, 1).exception(timeout=30), BrokenProcessPool)
+        service = hashing.HashingService(
+            DownloadManager(fetcher=lambda item: by_id[item.id]), executor=broken
+        )
+
+        assert service.decode_images(items) == {}
+        assert hashing.get_hashing_executor(2) is not broken
+        assert hashing.replace_broken_hashing_executor(broken) is hashing.get_hashing_executor(2)
+    finally:
+        hashing.shutdown_hashing_executor()
+
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as own:
+        assert hashing.replace_broken_hashing_executor(own) is None
+
+
+def test_jpeg_draft_decode_drift_stays_within_very_similar_thresholds():
+    settings = Settings()
+
+    for seed in range(4):
+        image_bytes = render_photo_jpeg(seed, 1600, 1200)
+        full = hashing.decode_image(image_bytes)
+        draft = hashing.decode_image(image_bytes, draft_min_edge=settings.scan_jpeg_draft_min_edge)
+
+        assert draft.draft_scale == 4
+        assert (
+            hashing.hamming_distance(_decoded_dhash(full), _decoded_dhash(draft))
+            <= settings.scan_dhash_threshold_very
+        )
+        assert (
+            hashing.hamming_distance(_decoded_phash(full), _decoded_phash(draft))
+            <= settings.scan_phash_threshold_very
+        )
+
+
+@pytest.mark.parametrize("entry", GOLDEN_CORPUS[:3], ids=lambda entry: entry["name"])
+def test_draft_decode_falls_back_to_full_decode_without_draft_support(entry):
+    decoded = hashing.decode_image(render_golden_image(entry), draft_min_edge=32)
+
+    assert decoded.draft_scale == 1
+    assert f"{hashing._dhash_from_pixels(decoded.dhash_pixels, 8):016x}" == entry["dhash"]
+    assert (
+        f"{hashing._phash_from_pixels(decoded.phash_pixels, 32, 8, PhashBackend.NUMPY):016x}"
+        == entry["phash"]
+    )
+
+
+def test_draft_decode_keeps_full_decode_for_jpegs_near_the_minimum_edge():
+    image_bytes = render_photo_jpeg(3, 400, 300)
+
+    decoded = hashing.decode_image(image_bytes, draft_min_edge=256)
+
+    assert decoded.draft_scale == 1
+    assert (decoded.width, decoded.height) == (400, 300)
+    assert decoded == hashing.decode_image(image_bytes)
+
+
+def test_hashing_service_counts_draft_decodes():
+    image_bytes = render_photo_jpeg(5, 1024, 768)
+    service = hashing.HashingService(
+        DownloadManager(fetcher=lambda _item: image_bytes),
+        jpeg_draft_min_edge=128,
+    )
+
+    decoded = service.get_decoded_image(_photo_item("one"))
+
+    assert decoded.draft_scale == 4
+    assert (decoded.width, decoded.height) == (256, 192)
+    assert service.draft_decode_count == 1
+
+
 def test_hamming_distance_counts_bits():
     assert hashing.hamming_distance(0b1010, 0b0011) == 2
 
@@ -39,6 +316,76 @@ class _FakeImage:
         self._size = size
         return self
 
-    def getdata(self) -> list[int]:
+    def tobytes(self) -> bytes:
         width, height = self._size
-        return [self._fill] * (width * height)
+        return bytes([self._fill]) * (width * height)
+
+
+def render_golden_image(entry: dict[str, Any]) -> bytes:
+    width = int(entry["width"])
+    height = int(entry["height"])
+    kind = entry["kind"]
+    if kind == "noise":
+        rng = random.Random(entry["seed"])
+        image = Image.frombytes("L", (width, height), rng.randbytes(width * height))
+    else:
+        image = Image.new("L", (width, height))
+        image.putdata([_golden_pixel(entry, x, y) for y in range(height) for x in range(width)])
+    if entry.get("mode", "L") != "L":
+        image = image.convert(entry["mode"])
+    exif = Image.Exif()
+    if "orientation" in entry:
+        exif[0x0112] = int(entry["orientation"])
+    return _encode(image, exif=exif)
+
+
+def _golden_pixel(entry: dict[str, Any], x: int, y: int) -> int:
+    kind = entry["kind"]
+    width = int(entry["width"])
+    height = int(entry["height"])
+    if kind == "gradient":
+        angle = math.radians(float(entry["angle"]))
+        projection = x * math.cos(angle) + y * math.sin(angle)
+        span = abs(width * math.cos(angle)) + abs(height * math.sin(angle))
+        return int(255 * projection / span) % 256
+    if kind == "checker":
+        cell = int(entry["cell"])
+        return 230 if ((x // cell) + (y // cell)) % 2 else 25
+    if kind == "rings":
+        radius = math.hypot(x - width / 2, y - height / 2)
+        return int(127.5 + 127.5 * math.sin(radius / float(entry["period"])))
+    if kind == "blocks":
+        rng = random.Random(entry["seed"])
+        grid = [[rng.randrange(256) for _ in range(4)] for _ in range(4)]
+        return grid[y * 4 // height][x * 4 // width]
+    raise ValueError(f"unknown golden image kind: {kind}")
+
+
+def _encode(image: Image.Image, *, exif: Image.Exif | None = None) -> bytes:
+    output = BytesIO()
+    image.save(output, format="PNG", exif=exif or Image.Exif())
+    return output.getvalue()
+
+
+def _decoded_dhash(decoded: hashing.DecodedImage) -> int:
+    return hashing._dhash_from_pixels(decoded.dhash_pixels, hashing.DHASH_SIZE)
+
+
+def _decoded_phash(decoded: hashing.DecodedImage) -> int:
+    return hashing._phash_from_pixels(
+        decoded.phash_pixels, hashing.PHASH_SIZE, hashing.PHASH_HASH_SIZE, PhashBackend.NUMPY
+    )
+
+
+def _photo_item(item_id: str) -> PhotoItem:
+    return PhotoItem(
+        id=item_id,
+        create_time=datetime(2024, 1, 1, tzinfo=UTC),
+        filename=f"{item_id}.jpg",
+        mime_type="image/jpeg",
+        width=100,
+        height=100,
+        gps=None,
+        download_url="memory://",
+        deep_link=None,
+    )
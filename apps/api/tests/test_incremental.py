@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import hashlib
+import random
+from dataclasses import replace
+from datetime import UTC, datetime, timedelta
+from io import BytesIO
+from typing import Any
+
+import pytest
+from PIL import Image, ImageFilter
+
+from app.core.config import CandidateStrategy, Settings
+from app.engine import downloads, scan
+from app.engine.fingerprints import FingerprintStore
+from app.engine.incremental import PreviousGroup, PreviousScan, run_incremental_scan
+from app.engine.models import PhotoItem
+
+
+def _added_day(items: list[PhotoItem]) -> tuple[list[PhotoItem], list[PhotoItem]]:
+    return items[:30], items
+
+
+def _removed_edit(items: list[PhotoItem]) -> tuple[list[PhotoItem], list[PhotoItem]]:
+    return items, [item for item in items if item.id not in {"item-01", "item-14"}]
+
+
+def _changed_edit(items: list[PhotoItem]) -> tuple[list[PhotoItem], list[PhotoItem]]:
+    changed = replace(
+        items[2], filename="retouched.png", download_url="https://photos.google.com/0-4"
+    )
+    return items, [changed if item.id == changed.id else item for item in items]
+
+
+def _added_exact_copy(items: list[PhotoItem]) -> tuple[list[PhotoItem], list[PhotoItem]]:
+    copy = replace(items[1], id="item-99", filename="item-99.png")
+    return items, [*items, copy]
+
+
+@pytest.mark.parametrize(
+    "change",
+    [_added_day, _removed_edit, _changed_edit, _added_exact_copy],
+)
+def test_incremental_rescan_matches_a_full_rescan(monkeypatch, change):
+    monkeypatch.setattr(downloads.DownloadManager, "_download", _fake_download)
+    settings = Settings(
+        scan_allowed_download_hosts=["photos.google.com"],
+        scan_candidate_strategy=CandidateStrategy.BUCKET,
+        scan_small_input_fallback_max=1,
+    )
+    before, after = change(_library())
+    first_store = FingerprintStore()
+    first = scan.run_scan(before, settings, fingerprint_store=first_store)
+
+    full = scan.run_scan(after, settings, fingerprint_store=FingerprintStore(first_store.updated))
+    incremental = run_incremental_scan(
+        after,
+        settings,
+        _previous(before, first),
+        fingerprint_store=FingerprintStore(first_store.updated),
+    )
+
+    assert _results(incremental) == _results(full)
+    counts = incremental.stage_metrics.counts
+    assert counts["downloads_performed"] == counts["incremental_fresh_items"]
+    assert counts["incremental_groups_carried"] >= 1
+    assert counts["comparisons_executed"] < full.stage_metrics.counts["comparisons_executed"]
+
+
+def test_incremental_rescan_matches_a_full_rescan_that_splits_an_unchanged_set(monkeypatch):
+    monkeypatch.setattr(downloads.DownloadManager, "_download", _fake_download)
+    # The added day leaves too few comparisons for an earlier day's set to stay whole.
+    settings = Settings(
+        scan_allowed_download_hosts=["photos.google.com"],
+        scan_candidate_strategy=CandidateStrategy.BUCKET,
+        scan_small_input_fallback_max=1,
+        scan_candidate_max_set_items=2,
+        scan_candidate_max_comparisons=24,
+    )
+    before, after = _added_day(_library())
+    first_store = FingerprintStore()
+    first = scan.run_scan(before, settings, fingerprint_store=first_store)
+
+    full = scan.run_scan(after, settings, fingerprint_store=FingerprintStore(first_store.updated))
+    incremental = run_incremental_scan(
+        after,
+        settings,
+        _previous(before, first),
+        fingerprint_store=FingerprintStore(first_store.updated),
+    )
+
+    assert first.stage_metrics.counts["candidate_sets_split"] == 0
+    assert full.stage_metrics.counts["candidate_sets_split"] == 1
+    assert _results(incremental) == _results(full)
+    assert incremental.stage_metrics.counts["incremental_groups_carried"] == 0
+
+
+def test_incremental_rescan_without_changes_downloads_nothing(monkeypatch):
+    monkeypatch.setattr(downloads.DownloadManager, "_download", _fake_download)
+    settings = Settings(
+        scan_allowed_download_hosts=["photos.google.com"],
+        scan_candidate_strategy=CandidateStrategy.BUCKET,
+    )
+    items = [item for item in _library() if not item.download_url.endswith("-5")]
+    store = FingerprintStore()
+    first = scan.run_scan(items, settings, fingerprint_store=store)
+
+    result = run_incremental_scan(
+        items, settings, _previous(items, first), fingerprint_store=FingerprintStore(store.updated)
+    )
+
+    counts = result.stage_metrics.counts
+    assert (counts["downloads_performed"], counts["comparisons_executed"]) == (0, 0)
+    assert counts["incremental_buckets_regrouped"] == 0
+    assert _results(result) == _results(first)
+
+
+def _previous(items: list[PhotoItem], result: scan.ScanResult) -> PreviousScan:
+    return PreviousScan(
+        item_ids=frozenset(item.id for item in items),
+        groups=tuple(
+            PreviousGroup(group.category, tuple(item.id for item in group.items))
+            for group in [
+                *result.groups_exact,
+                *result.groups_very_similar,
+                *result.groups_possibly_similar,
+            ]
+        ),
+        sets_split=result.stage_metrics.counts["candidate_sets_split"],
+    )
+
+
+def _results(result: scan.ScanResult) -> dict[str, Any]:
+    return result.model_dump(
+        mode="json",
+        include={
+            "input_count",
+            "groups_exact",
+            "groups_very_similar",
+            "groups_possibly_similar",
+            "failed_items",
+        },
+    )
+
+
+def _library() -> list[PhotoItem]:
+    """Daily bursts of edited shots, with exact copies and unreadable files mixed in."""
+    start = datetime(2024, 5, 1, 8, tzinfo=UTC)
+    items = []
+    for index in range(36):
+        burst, shot = divmod(index, 6)
+        items.append(
+            PhotoItem(
+                id=f"item-{index:02d}",
+                create_time=start + timedelta(days=burst, seconds=20 * shot),
+                filename=f"item-{index:02d}.png",
+                mime_type="image/png",
+                width=32,
+                height=32,
+                gps=None,
+                download_url=f"https://photos.google.com/{burst}-{shot}",
+                deep_link=None,
+            )
+        )
+    return items
+
+
+def _fake_download(_manager, item: PhotoItem, **_kwargs) -> downloads.DownloadedPayload:
+    burst, shot = (int(part) for part in item.download_url.rsplit("/", 1)[1].split("-"))
+    if shot == 5 and burst % 2:
+        data = b"not-an-image"
+    else:
+        # Shots 0-2 are edits of one scene, 3 copies shot 0 and 4 is its own scene.
+        seed, brighten = {0: (0, 0), 1: (0, 6), 2: (0, 14), 3: (0, 0), 4: (1, 0)}.get(shot, (2, 0))
+        noise = Image.frombytes("L", (32, 32), random.Random(burst * 10 + seed).randbytes(1024))
+        image = noise.filter(ImageFilter.GaussianBlur(3)).point(lambda value: value + brighten)
+        output = BytesIO()
+        image.save(output, format="PNG")
+        data = output.getvalue()
+    return downloads.DownloadedPayload(data, hashlib.sha256(data).hexdigest(), len(data))
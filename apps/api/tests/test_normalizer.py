@@ -65,6 +65,60 @@ def test_normalize_picker_payload_extracts_nested_fields():
     assert item.deep_link == "https://photos.google.com/photo/abc"
 
 
+def test_normalize_picker_payload_extracts_capture_settings():
+    payload = {
+        "mediaItems": [
+            {
+                "mediaFile": {
+                    "id": "with-exif",
+                    "createTime": "2024-01-01T10:00:00Z",
+                    "mimeType": "image/jpeg",
+                    "mediaFileMetadata": {
+                        "cameraMake": "Google",
+                        "cameraModel": "Pixel 8",
+                        "photoMetadata": {
+                            "focalLength": 6.9,
+                            "apertureFNumber": "1.68",
+                            "isoEquivalent": 100,
+                            "exposureTime": "0.008s",
+                        },
+                    },
+                }
+            },
+            {
+                "mediaFile": {
+                    "id": "fractional",
+                    "createTime": "2024-01-01T10:00:00Z",
+                    "mimeType": "image/jpeg",
+                    "mediaFileMetadata": {
+                        "photoMetadata": {"exposureTime": "1/250", "isoEquivalent": "0"},
+                    },
+                }
+            },
+            {
+                "mediaFile": {
+                    "id": "bare",
+                    "createTime": "2024-01-01T10:00:00Z",
+                    "mimeType": "image/jpeg",
+                }
+            },
+        ]
+    }
+
+    with_exif, fractional, bare = normalizer.normalize_picker_payload(payload)
+
+    assert with_exif.capture is not None
+    assert (with_exif.capture.camera_make, with_exif.capture.camera_model) == ("Google", "Pixel 8")
+    assert with_exif.capture.focal_length == 6.9
+    assert with_exif.capture.aperture_f_number == 1.68
+    assert with_exif.capture.iso_equivalent == 100
+    assert with_exif.capture.exposure_seconds == 0.008
+    assert fractional.capture is not None
+    assert fractional.capture.exposure_seconds == 1 / 250
+    assert fractional.capture.iso_equivalent is None
+    assert bare.capture is None
+
+
 def test_normalize_picker_selection_single_item_no_warning():
     items = [
         {
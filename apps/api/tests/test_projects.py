@@ -451,6 +451,108 @@ def test_picker_product_url_is_not_persisted(monkeypatch, tmp_path):
     assert saved_links == [{"url": None}, {"url": None}]
 
 
+def test_project_rescans_reuse_persisted_fingerprints(monkeypatch, tmp_path):
+    client = _client(monkeypatch, tmp_path)
+    project_id = client.post("/api/projects", json={"name": "Campaign"}).json()["id"]
+    photo_items = [
+        {**item, "width": 4, "height": 3} for item in _picker_photo_payloads("item-a", "item-b")
+    ]
+    observed: list[int] = []
+
+    def _scan(items, _settings, **kwargs):
+        store = kwargs["fingerprint_store"]
+        observed.append(sum(store.lookup(item) is not None for item in items))
+        for index, item in enumerate(items):
+            if store.lookup(item) is None:
+                store.record(item, sha256=f"{index:064x}", byte_length=10, dhash=index, phash=7)
+        return _fake_scan_result_with_ids("item-a", "item-b")
+
+    monkeypatch.setattr("app.api.routes.run_scan", _scan)
+    payload = {"sourceType": "picker", "sourceRef": {"type": "picker"}, "photoItems": photo_items}
+
+    assert client.post(f"/api/projects/{project_id}/scan", json=payload).status_code == 200
+    assert client.post(f"/api/projects/{project_id}/scan", json=payload).status_code == 200
+
+    assert observed == [0, 2]
+    with sqlite3.connect(tmp_path / "projects.db") as conn:
+        rows = conn.execute(
+            "SELECT google_media_item_id, fingerprints FROM project_items "
+            "WHERE project_id = ? ORDER BY google_media_item_id",
+            (project_id,),
+        ).fetchall()
+    assert [(media_id, json.loads(value)["phash"]) for media_id, value in rows] == [
+        ("item-a", "0000000000000007"),
+        ("item-b", "0000000000000007"),
+    ]
+
+
+def test_incremental_project_scan_builds_on_the_latest_scan(monkeypatch, tmp_path):
+    client = _client(monkeypatch, tmp_path)
+    project_id = client.post("/api/projects", json={"name": "Campaign"}).json()["id"]
+    previous_scans = []
+
+    def _incremental(items, _settings, previous, **kwargs):
+        previous_scans.append(previous)
+        return _fake_scan_result_with_ids("item-a", "item-c", input_count=len(items))
+
+    monkeypatch.setattr("app.api.routes.run_scan", lambda *_args, **_kwargs: _fake_scan_result())
+    monkeypatch.setattr("app.api.routes.run_incremental_scan", _incremental)
+    first = {"sourceType": "picker", "photoItems": _picker_photo_payloads("item-1", "item-2")}
+    rescan = {
+        "sourceType": "picker",
+        "photoItems": _picker_photo_payloads("item-1", "item-2", "item-3"),
+        "incremental": True,
+    }
+
+    assert client.post(f"/api/projects/{project_id}/scan", json=rescan).status_code == 200
+    assert previous_scans == []
+    assert client.post(f"/api/projects/{project_id}/scan", json=first).status_code == 200
+    response = client.post(f"/api/projects/{project_id}/scan", json=rescan)
+
+    assert response.status_code == 200
+    (previous,) = previous_scans
+    assert previous.item_ids == {"item-1", "item-2"}
+    assert [(group.category, group.member_ids) for group in previous.groups] == [
+        ("EXACT", ("item-1", "item-2"))
+    ]
+    groups = response.json()["envelope"]["results"]["groups"]
+    assert [item["itemId"] for item in groups[0]["items"]] == ["item-a", "item-c"]
+
+
+def test_incremental_project_scan_runs_in_full_when_it_cannot_build_on_the_latest_scan(
+    monkeypatch, tmp_path
+):
+    client = _client(monkeypatch, tmp_path)
+    project_id = client.post("/api/projects", json={"name": "Campaign"}).json()["id"]
+    full_scans = []
+
+    def _scan(items, *_args, **_kwargs):
+        full_scans.append(len(items))
+        return _fake_scan_result()
+
+    def _incremental(*_args, **_kwargs):
+        raise AssertionError("groups must not be carried over")
+
+    monkeypatch.setattr("app.api.routes.run_scan", _scan)
+    monkeypatch.setattr("app.api.routes.run_incremental_scan", _incremental)
+    rescan = {
+        "sourceType": "picker",
+        "photoItems": _picker_photo_payloads("item-1", "item-2"),
+        "incremental": True,
+    }
+    assert client.post(f"/api/projects/{project_id}/scan", json=rescan).status_code == 200
+
+    client.app.state.settings = client.app.state.settings.model_copy(
+        update={"scan_candidate_window_seconds": 60.0}
+    )
+    assert client.post(f"/api/projects/{project_id}/scan", json=rescan).status_code == 200
+
+    with sqlite3.connect(tmp_path / "projects.db") as conn:
+        conn.execute("UPDATE project_groups SET confidence_band = 'UNKNOWN'")
+    assert client.post(f"/api/projects/{project_id}/scan", json=rescan).status_code == 200
+    assert full_scans == [2, 2, 2]
+
+
 def test_project_scan_results_are_scoped_to_requested_scan(monkeypatch, tmp_path):
     client = _client(monkeypatch, tmp_path)
     scans = [
@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
+import threading
 from collections.abc import Iterator
 from contextlib import contextmanager
 from io import BytesIO
@@ -7,10 +11,12 @@ from io import BytesIO
 from fastapi.testclient import TestClient
 from PIL import Image
 
+from app.api import routes
 from app.core import config
 from app.core.config import Settings
 from app.core.security import AdmissionError
 from app.engine import downloads
+from app.engine.scan import ScanCancelledError
 from app.engine.schemas import CostEstimate, ScanResult, StageMetrics
 from app.main import create_app
 
@@ -340,10 +346,11 @@ def test_scan_returns_exact_group_and_partial_item_failure(monkeypatch):
     config.get_settings.cache_clear()
     duplicate_bytes = _png_bytes()
 
-    def fake_download(_manager, item):
+    def fake_download(_manager, item, **_kwargs):
+        data = duplicate_bytes
         if item.download_url and item.download_url.endswith("/invalid"):
-            return b"not-an-image"
-        return duplicate_bytes
+            data = b"not-an-image"
+        return downloads.DownloadedPayload(data, hashlib.sha256(data).hexdigest(), len(data))
 
     monkeypatch.setattr(downloads.DownloadManager, "_download", fake_download)
     try:
@@ -379,7 +386,9 @@ def test_scan_rejects_selection_when_every_item_is_invalid(monkeypatch):
     monkeypatch.setattr(
         downloads.DownloadManager,
         "_download",
-        lambda *_args, **_kwargs: b"not-an-image",
+        lambda *_args, **_kwargs: downloads.DownloadedPayload(
+            b"not-an-image", hashlib.sha256(b"not-an-image").hexdigest(), 12
+        ),
     )
     try:
         client = TestClient(create_app())
@@ -402,6 +411,90 @@ def test_scan_rejects_selection_when_every_item_is_invalid(monkeypatch):
         config.get_settings.cache_clear()
 
 
+def test_scan_stream_sends_exact_groups_before_the_result(monkeypatch):
+    monkeypatch.setenv("SCAN_ALLOWED_DOWNLOAD_HOSTS", "photos.google.com")
+    config.get_settings.cache_clear()
+    duplicate_bytes = _png_bytes()
+    monkeypatch.setattr(
+        downloads.DownloadManager,
+        "_download",
+        lambda *_args, **_kwargs: downloads.DownloadedPayload(
+            duplicate_bytes, hashlib.sha256(duplicate_bytes).hexdigest(), len(duplicate_bytes)
+        ),
+    )
+    try:
+        client = TestClient(create_app())
+        response = client.post(
+            "/api/scan/stream",
+            json={
+                "photoItems": [
+                    _photo_payload("one", "duplicate-one"),
+                    _photo_payload("two", "duplicate-two"),
+                ]
+            },
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["type"] for line in lines] == ["groups", "result"]
+        assert lines[0]["groups"] == lines[1]["result"]["groupsExact"]
+        assert [item["id"] for item in lines[0]["groups"][0]["items"]] == ["one", "two"]
+        assert lines[1]["result"]["stageMetrics"]["timeToFirstGroupMs"] >= 0
+    finally:
+        config.get_settings.cache_clear()
+
+
+def test_scan_stream_ends_with_a_safe_error_line(monkeypatch):
+    monkeypatch.setenv("SCAN_ALLOWED_DOWNLOAD_HOSTS", "photos.google.com")
+    config.get_settings.cache_clear()
+    monkeypatch.setattr(
+        downloads.DownloadManager,
+        "_download",
+        lambda *_args, **_kwargs: downloads.DownloadedPayload(
+            b"not-an-image", hashlib.sha256(b"not-an-image").hexdigest(), 12
+        ),
+    )
+    try:
+        client = TestClient(create_app())
+        response = client.post(
+            "/api/scan/stream",
+            json={"photoItems": [_photo_payload("one", "invalid-one")]},
+        )
+
+        assert response.status_code == 200
+        (line,) = [json.loads(line) for line in response.text.splitlines()]
+        assert line["type"] == "error"
+        assert line["status"] == 422
+        assert line["detail"]["category"] == "download_content"
+    finally:
+        config.get_settings.cache_clear()
+
+
+def test_scan_stream_stops_the_scan_once_the_client_disconnects():
+    stopped = threading.Event()
+
+    def scan_items(on_groups, stop: threading.Event) -> ScanResult:
+        on_groups([])
+        stop.wait(5)
+        stopped.set()
+        raise ScanCancelledError("The scan was cancelled.")
+
+    class DisconnectedRequest:
+        scope: dict[str, object] = {}
+
+        async def is_disconnected(self) -> bool:
+            return True
+
+    async def read_lines() -> list[str]:
+        return [line async for line in routes._scan_lines(scan_items, DisconnectedRequest(), 0.01)]
+
+    lines = asyncio.run(read_lines())
+
+    assert [json.loads(line)["type"] for line in lines] == ["groups"]
+    assert stopped.is_set()
+
+
 def _photo_payload(item_id: str, token: str) -> dict[str, object]:
     return {
         "id": item_id,
@@ -1,18 +1,28 @@
 from __future__ import annotations
 
-from datetime import UTC, datetime
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from datetime import UTC, datetime, timedelta
 from http.client import HTTPException as HTTPClientException
 from http.client import IncompleteRead
 from io import BytesIO
+from typing import Any
 
 import pytest
-from PIL import Image
+from PIL import Image, ImageFilter
 
-from app.core.config import Settings
-from app.engine import scan
+from app.core.config import CandidateStrategy, Settings
+from app.engine import hashing, scan
 from app.engine.downloads import DownloadManager, DownloadSecurityError
+from app.engine.fingerprints import FingerprintStore
 from app.engine.hashing import HashingService, PerceptualHashes
 from app.engine.models import PhotoItem
+from app.engine.progress import ProgressReporter, ScanProgress
+
+GROUP_FIELDS = {"groups_exact", "groups_very_similar", "groups_possibly_similar", "failed_items"}
 
 
 def test_run_scan_tracks_counts_and_costs(monkeypatch):
@@ -22,8 +32,8 @@ def test_run_scan_tracks_counts_and_costs(monkeypatch):
     ]
     downloader = DownloadManager(fetcher=_image_bytes)
 
-    def fake_candidate_sets(_items):
-        return [_items]
+    def fake_candidate_sets(_items, **_kwargs):
+        return [_items], []
 
     def fake_near_duplicates(*_args, **_kwargs):
         return ([], [], 1)
@@ -36,7 +46,11 @@ def test_run_scan_tracks_counts_and_costs(monkeypatch):
     monkeypatch.setattr(scan, "group_near_duplicates", fake_near_duplicates)
     monkeypatch.setattr(HashingService, "get_perceptual_hashes", fake_perceptual_hashes)
 
-    result = scan.run_scan(items, Settings(), download_manager=downloader)
+    result = scan.run_scan(
+        items,
+        Settings(scan_candidate_strategy=CandidateStrategy.BUCKET),
+        download_manager=downloader,
+    )
 
     counts = result.stage_metrics.counts
     assert counts["selected_images"] == 2
@@ -72,10 +86,10 @@ def test_small_input_fallback_runs_hashing_and_comparisons(monkeypatch):
     downloader = DownloadManager(fetcher=_image_bytes)
     observed: dict[str, object] = {}
 
-    def fake_candidate_sets(_items):
-        return []
+    def fake_candidate_sets(_items, **_kwargs):
+        return [], []
 
-    def fake_near_duplicates(candidate_sets, _hashes, _thresholds):
+    def fake_near_duplicates(candidate_sets, _hashes, _thresholds, **_kwargs):
         observed["candidate_sets"] = candidate_sets
         return ([], [], 1)
 
@@ -87,7 +101,11 @@ def test_small_input_fallback_runs_hashing_and_comparisons(monkeypatch):
     monkeypatch.setattr(scan, "group_near_duplicates", fake_near_duplicates)
     monkeypatch.setattr(HashingService, "get_perceptual_hashes", fake_perceptual_hashes)
 
-    result = scan.run_scan(items, Settings(), download_manager=downloader)
+    result = scan.run_scan(
+        items,
+        Settings(scan_candidate_strategy=CandidateStrategy.BUCKET),
+        download_manager=downloader,
+    )
 
     counts = result.stage_metrics.counts
     assert counts["fallback_triggered"] == 1
@@ -97,6 +115,606 @@ def test_small_input_fallback_runs_hashing_and_comparisons(monkeypatch):
     assert observed["candidate_sets"]
 
 
+def test_run_scan_decodes_each_image_once_and_reports_decode_time_separately(monkeypatch):
+    items = [
+        _photo_item("one", "https://photos.google.com/one"),
+        _photo_item("two", "https://photos.google.com/two"),
+        _photo_item("three", "https://photos.google.com/three"),
+    ]
+    load_calls: list[bytes] = []
+    original_load = hashing._open_image
+
+    def counting_load(data: bytes, **kwargs: Any) -> tuple[Image.Image, int]:
+        load_calls.append(data)
+        return original_load(data, **kwargs)
+
+    monkeypatch.setattr(hashing, "_open_image", counting_load)
+    monkeypatch.setattr(scan, "build_candidate_sets", lambda _items, **_kwargs: ([_items], []))
+
+    result = scan.run_scan(
+        items, Settings(), download_manager=DownloadManager(fetcher=_image_bytes)
+    )
+
+    metrics = result.stage_metrics
+    assert len(load_calls) == 3
+    assert metrics.counts["images_decoded"] == 3
+    assert metrics.counts["perceptual_hashes"] == 3
+    assert {
+        "byte_hashing_ms",
+        "image_decoding_ms",
+        "perceptual_hashing_ms",
+        "near_grouping_ms",
+    } <= set(metrics.timings_ms)
+    assert all(value >= 0 for value in metrics.timings_ms.values())
+
+
+def test_run_scan_decodes_through_the_hashing_executor_and_keeps_failure_order():
+    items = [
+        _photo_item("bad", "https://photos.google.com/bad"),
+        _photo_item("one", "https://photos.google.com/one"),
+        _photo_item("missing", "https://photos.google.com/missing"),
+        _photo_item("two", "https://photos.google.com/two"),
+    ]
+    duplicate_bytes = _image_bytes(items[1])
+
+    def fetch(item: PhotoItem) -> bytes:
+        if item.id == "missing":
+            raise OSError("connection reset")
+        return b"not-an-image" if item.id == "bad" else duplicate_bytes
+
+    with ThreadPoolExecutor(2) as executor:
+        result = scan.run_scan(
+            items,
+            Settings(scan_hash_workers=4),
+            download_manager=DownloadManager(fetcher=fetch),
+            hashing_executor=executor,
+        )
+
+    assert [issue.item_id for issue in result.failed_items] == ["bad", "missing"]
+    assert [[item.id for item in group.items] for group in result.groups_exact] == [["one", "two"]]
+    assert result.stage_metrics.counts["images_decoded"] == 2
+
+
+def test_rescan_with_stored_fingerprints_skips_downloads_and_keeps_groups(monkeypatch):
+    items = [
+        _photo_item("one", "https://photos.google.com/one"),
+        _photo_item("two", "https://photos.google.com/two"),
+        _photo_item("copy", "https://photos.google.com/copy"),
+    ]
+    monkeypatch.setattr(scan, "build_candidate_sets", lambda _items, **_kwargs: ([_items], []))
+
+    def fetch(item: PhotoItem) -> bytes:
+        return _image_bytes(items[0] if item.id == "copy" else item)
+
+    def fail_fetch(item: PhotoItem) -> bytes:
+        raise AssertionError(f"unexpected download of {item.id}")
+
+    first_store = FingerprintStore()
+    first = scan.run_scan(
+        items,
+        Settings(),
+        download_manager=DownloadManager(fetcher=fetch),
+        fingerprint_store=first_store,
+    )
+    second_store = FingerprintStore(first_store.updated)
+    second = scan.run_scan(
+        items,
+        Settings(),
+        download_manager=DownloadManager(fetcher=fail_fetch),
+        fingerprint_store=second_store,
+    )
+
+    assert set(first_store.updated) == {"one", "two", "copy"}
+    assert first.stage_metrics.counts["hash_store_misses"] == 3
+    assert second_store.updated == {}
+    assert second.stage_metrics.counts["hash_store_hits"] == 3
+    assert second.stage_metrics.counts["hash_store_misses"] == 0
+    assert second.stage_metrics.counts["downloads_performed"] == 0
+    assert second.groups_exact[0].items == first.groups_exact[0].items
+    assert second.groups_very_similar == first.groups_very_similar
+
+
+def test_items_outside_candidate_sets_are_stored_without_perceptual_hashes(monkeypatch):
+    items = [
+        _photo_item("one", "https://photos.google.com/one"),
+        _photo_item("two", "https://photos.google.com/two"),
+    ]
+    monkeypatch.setattr(scan, "build_candidate_sets", lambda _items, **_kwargs: ([], []))
+    store = FingerprintStore()
+
+    first = scan.run_scan(
+        items,
+        Settings(scan_small_input_fallback_max=1),
+        download_manager=DownloadManager(fetcher=_image_bytes),
+        fingerprint_store=store,
+    )
+
+    assert first.stage_metrics.counts["perceptual_hashes"] == 0
+    assert not any(record.has_perceptual_hashes for record in store.updated.values())
+
+    monkeypatch.setattr(scan, "build_candidate_sets", lambda _items, **_kwargs: ([_items], []))
+    second_store = FingerprintStore(store.updated)
+    second = scan.run_scan(
+        items,
+        Settings(),
+        download_manager=DownloadManager(fetcher=_image_bytes),
+        fingerprint_store=second_store,
+    )
+
+    assert second.stage_metrics.counts["downloads_performed"] == 2
+    assert all(record.has_perceptual_hashes for record in second_store.updated.values())
+
+
+def test_rescan_downloads_items_whose_metadata_changed():
+    item = _photo_item("one", "https://photos.google.com/one")
+    store = FingerprintStore()
+    scan.run_scan(
+        [item],
+        Settings(),
+        download_manager=DownloadManager(fetcher=_image_bytes),
+        fingerprint_store=store,
+    )
+    edited = replace(item, width=200)
+
+    result = scan.run_scan(
+        [edited],
+        Settings(),
+        download_manager=DownloadManager(fetcher=_image_bytes),
+        fingerprint_store=FingerprintStore(store.updated),
+    )
+
+    assert result.stage_metrics.counts["hash_store_hits"] == 0
+    assert result.stage_metrics.counts["downloads_performed"] == 1
+
+
+@pytest.mark.parametrize("library_size", [8, 64])
+def test_run_scan_holds_downloaded_bytes_under_the_cache_ceiling(monkeypatch, library_size):
+    items = [
+        _photo_item(f"item-{index}", f"https://photos.google.com/{index}")
+        for index in range(library_size)
+    ]
+    monkeypatch.setattr(scan, "build_candidate_sets", lambda _items, **_kwargs: ([_items], []))
+    max_item_bytes = max(len(_image_bytes(item)) for item in items)
+    ceiling = 4 * max_item_bytes
+    manager = DownloadManager(
+        fetcher=_image_bytes, max_item_bytes=max_item_bytes, cache_max_bytes=ceiling
+    )
+
+    result = scan.run_scan(items, Settings(), download_manager=manager)
+
+    counts = result.stage_metrics.counts
+    assert 0 < counts["download_peak_bytes_held"] <= ceiling
+    assert counts["download_cache_evictions"] == 0
+    assert counts["downloads_performed"] == library_size
+
+
+def test_stream_mode_hashes_exact_only_items_without_buffering_or_decoding(monkeypatch):
+    items = [
+        _photo_item("one", "https://photos.google.com/one"),
+        _photo_item("two", "https://photos.google.com/two"),
+        _photo_item("lone", "https://photos.google.com/lone"),
+        _photo_item("lone-copy", "https://photos.google.com/lone-copy"),
+    ]
+    monkeypatch.setattr(scan, "build_candidate_sets", lambda _items, **_kwargs: ([_items[:2]], []))
+
+    def fetch(item: PhotoItem) -> bytes:
+        return _image_bytes(items[2] if item.id == "lone-copy" else item)
+
+    manager = DownloadManager(fetcher=fetch)
+    result = scan.run_scan(
+        items,
+        Settings(
+            scan_stream_exact_only_items=True,
+            scan_candidate_strategy=CandidateStrategy.BUCKET,
+        ),
+        download_manager=manager,
+    )
+
+    counts = result.stage_metrics.counts
+    assert [[item.id for item in group.items] for group in result.groups_exact] == [
+        ["lone", "lone-copy"]
+    ]
+    assert counts["byte_hashes_streamed"] == 2
+    assert counts["images_decoded"] == 2
+    assert counts["downloads_performed"] == 4
+    assert counts["download_peak_bytes_held"] == len(fetch(items[0])) + len(fetch(items[1]))
+
+
+def test_window_candidates_group_near_duplicates_across_midnight():
+    midnight = datetime(2024, 1, 2, tzinfo=UTC)
+    items = [
+        replace(
+            _photo_item("before", "https://photos.google.com/before"),
+            create_time=midnight - timedelta(seconds=30),
+        ),
+        replace(
+            _photo_item("after", "https://photos.google.com/after"),
+            create_time=midnight + timedelta(seconds=30),
+        ),
+        replace(
+            _photo_item("later", "https://photos.google.com/later"),
+            create_time=midnight + timedelta(hours=3),
+        ),
+    ]
+
+    result = scan.run_scan(
+        items,
+        Settings(scan_candidate_strategy=CandidateStrategy.WINDOW, scan_small_input_fallback_max=1),
+        download_manager=DownloadManager(fetcher=_image_bytes),
+        explain=True,
+    )
+
+    counts = result.stage_metrics.counts
+    assert (counts["candidate_pairs"], counts["candidate_items"]) == (1, 2)
+    assert counts["fallback_triggered"] == 0
+    assert counts["narrowing_reason_time_bucket_mismatch"] == 1
+    assert [[item.id for item in group.items] for group in result.groups_very_similar] == [
+        ["before", "after"]
+    ]
+    assert result.stage_metrics.debug is not None
+    assert result.stage_metrics.debug["candidate_window"] == {
+        "seconds": 600.0,
+        "pairs": 1,
+        "peak_items": 2,
+        "aspect_rejections": 0,
+    }
+
+
+def test_oversized_candidate_sets_only_hash_and_compare_coarse_matches(monkeypatch):
+    items = [
+        _photo_item(item_id, f"https://photos.google.com/{item_id}")
+        for item_id in ["left", "left-edit", "right"]
+    ]
+
+    monkeypatch.setattr(scan, "build_candidate_sets", lambda _items, **_kwargs: ([_items], []))
+    result = scan.run_scan(
+        items,
+        Settings(
+            scan_candidate_strategy=CandidateStrategy.BUCKET,
+            scan_candidate_max_set_items=2,
+            scan_candidate_max_comparisons=1,
+        ),
+        download_manager=DownloadManager(fetcher=_textured_image_bytes),
+        explain=True,
+    )
+
+    counts = result.stage_metrics.counts
+    assert [[item.id for item in group.items] for group in result.groups_very_similar] == [
+        ["left", "left-edit"]
+    ]
+    assert counts["candidate_sets_split"] == 1
+    assert counts["comparisons_bound"] == counts["comparisons_executed"] == 1
+    assert counts["comparisons_skipped"] == 2
+    assert counts["perceptual_hashes"] == 2
+    assert result.stage_metrics.debug is not None
+    assert result.stage_metrics.debug["candidate_splits"] == {
+        "sets_split": 1,
+        "items_split": 3,
+        "items_without_coarse_hash": 0,
+        "comparisons_before": 3,
+        "pairs_kept": 1,
+        "comparisons_bound": 1,
+    }
+
+
+def test_oversized_candidate_sets_within_the_comparison_cap_keep_blurred_and_cropped_variants(
+    monkeypatch,
+):
+    items = [
+        _photo_item(f"scene-{scene}-{variant}", f"https://photos.google.com/{scene}/{variant}")
+        for scene in range(8)
+        for variant in ["original", "cropped" if scene % 2 else "blurred"]
+    ]
+    monkeypatch.setattr(scan, "build_candidate_sets", lambda _items, **_kwargs: ([_items], []))
+
+    def run(**overrides: Any) -> scan.ScanResult:
+        return scan.run_scan(
+            items,
+            Settings(scan_candidate_strategy=CandidateStrategy.BUCKET, **overrides),
+            download_manager=DownloadManager(fetcher=_variant_image_bytes),
+        )
+
+    unsplit = run()
+    capped = run(scan_candidate_max_set_items=4)
+    split = run(scan_candidate_max_set_items=4, scan_candidate_max_comparisons=1)
+
+    near_groups = sorted(
+        [item.id for item in group.items]
+        for group in [*capped.groups_very_similar, *capped.groups_possibly_similar]
+    )
+    assert near_groups == [
+        sorted(item.id for item in items[index : index + 2]) for index in range(0, 16, 2)
+    ]
+    assert capped.model_dump(include=GROUP_FIELDS) == unsplit.model_dump(include=GROUP_FIELDS)
+    assert capped.stage_metrics.counts["comparisons_skipped"] == 0
+    counts = split.stage_metrics.counts
+    assert counts["candidate_sets_split"] == 1
+    assert counts["comparisons_bound"] + counts["comparisons_skipped"] == 16 * 15 // 2
+
+
+def test_global_search_finds_near_duplicates_across_candidate_sets():
+    items = [
+        replace(
+            _photo_item(item_id, f"https://photos.google.com/{item_id}"),
+            create_time=datetime(2024, month, 1, tzinfo=UTC),
+        )
+        for item_id, month in [("left", 1), ("right", 3), ("left-edit", 6)]
+    ]
+
+    def run(**overrides: Any) -> scan.ScanResult:
+        return scan.run_scan(
+            items,
+            Settings(scan_small_input_fallback_max=1, **overrides),
+            download_manager=DownloadManager(fetcher=_textured_image_bytes),
+        )
+
+    narrowed = run()
+    result = run(scan_global_near_duplicates=True)
+
+    counts = result.stage_metrics.counts
+    assert narrowed.groups_very_similar == []
+    assert [[item.id for item in group.items] for group in result.groups_very_similar] == [
+        ["left", "left-edit"]
+    ]
+    assert counts["fallback_triggered"] == 0
+    assert counts["perceptual_hashes"] == 3
+    assert counts["comparisons_executed"] == counts["global_lsh_pairs"] == 1
+
+
+def test_global_pairs_reach_the_possibly_similar_threshold_on_either_hash():
+    items = [_photo_item(item_id, None) for item_id in ["base", "phash-near", "dhash-near", "far"]]
+    far = (1 << 64) - 1
+    # Nine pHash bits or ten dHash bits apart, beyond what 8 exact-match bands guarantee.
+    hashes = {
+        "base": PerceptualHashes(dhash=0, phash=0),
+        "phash-near": PerceptualHashes(dhash=far, phash=0x0101010101010101 | 1 << 63),
+        "dhash-near": PerceptualHashes(dhash=0x0101010101010101 | 0b11 << 62, phash=far),
+        "far": PerceptualHashes(dhash=far, phash=far),
+    }
+
+    pairs = scan.global_near_pairs(items, hashes, scan.similarity_thresholds(Settings()), 8)
+
+    found = [(left.id, right.id) for left, right in pairs]
+    assert {("base", "phash-near"), ("base", "dhash-near")} <= set(found)
+    assert len(found) == len(set(found))
+
+
+def test_global_search_keeps_the_small_input_fallback():
+    items = [
+        replace(_photo_item(item_id, None), create_time=datetime(2024, month, 1, tzinfo=UTC))
+        for item_id, month in [("left", 1), ("right", 3)]
+    ]
+
+    narrowing = scan.narrow_candidates(
+        items, Settings(scan_global_near_duplicates=True), explain_enabled=False
+    )
+
+    assert narrowing.sets == [items]
+    assert not narrowing.has_candidates
+
+
+def test_concurrent_downloads_keep_results_and_failure_order(monkeypatch):
+    items = [
+        _photo_item(f"item-{index}", f"https://photos.google.com/{index}") for index in range(12)
+    ]
+    monkeypatch.setattr(scan, "build_candidate_sets", lambda _items, **_kwargs: ([_items], []))
+    delays = {item.id: (index * 7 % 5) / 1000 for index, item in enumerate(items)}
+
+    def fetch(item: PhotoItem) -> bytes:
+        time.sleep(delays[item.id])
+        index = int(item.id.split("-")[1])
+        if index % 5 == 2:
+            raise OSError("connection reset")
+        return _image_bytes(items[index % 3])
+
+    results = [
+        scan.run_scan(
+            items,
+            Settings(scan_download_concurrency=concurrency),
+            download_manager=DownloadManager(fetcher=fetch, max_concurrency=concurrency),
+        )
+        for concurrency in (1, 8)
+    ]
+
+    serial, concurrent = results
+    assert [issue.item_id for issue in concurrent.failed_items] == ["item-2", "item-7"]
+    assert concurrent.failed_items == serial.failed_items
+    assert concurrent.groups_exact == serial.groups_exact
+    assert concurrent.stage_metrics.counts["downloads_performed"] == 10
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_pipelined_downloads_match_the_serial_scan(monkeypatch, concurrency):
+    items = [
+        _photo_item(f"item-{index}", f"https://photos.google.com/{index}") for index in range(24)
+    ]
+    monkeypatch.setattr(scan, "build_candidate_sets", lambda _items, **_kwargs: ([_items], []))
+    max_item_bytes = max(len(_image_bytes(item)) for item in items)
+
+    def fetch(item: PhotoItem) -> bytes:
+        index = int(item.id.split("-")[1])
+        time.sleep((index * 7 % 5) / 1000)
+        if index % 7 == 3:
+            raise OSError("connection reset")
+        return b"not-an-image" if index % 11 == 5 else _image_bytes(items[index % 4])
+
+    def run(pipeline: bool) -> scan.ScanResult:
+        return scan.run_scan(
+            items,
+            Settings(
+                scan_candidate_strategy=CandidateStrategy.BUCKET,
+                scan_pipeline_downloads=pipeline,
+                scan_pipeline_queue_depth=3,
+            ),
+            download_manager=DownloadManager(
+                fetcher=fetch,
+                max_item_bytes=max_item_bytes,
+                cache_max_bytes=6 * max_item_bytes,
+                max_concurrency=concurrency,
+            ),
+        )
+
+    serial, pipelined = run(False), run(True)
+
+    def comparable(result: scan.ScanResult) -> dict[str, Any]:
+        dumped = result.model_dump(exclude={"run_id"})
+        dumped["stage_metrics"].pop("timings_ms")
+        dumped["stage_metrics"]["counts"].pop("download_peak_bytes_held")
+        return dumped
+
+    assert comparable(pipelined) == comparable(serial)
+    assert [issue.item_id for issue in pipelined.failed_items] == [
+        "item-3",
+        "item-5",
+        "item-10",
+        "item-16",
+        "item-17",
+    ]
+    assert pipelined.stage_metrics.counts["download_cache_evictions"] == 0
+    assert pipelined.stage_metrics.counts["download_peak_bytes_held"] <= 3 * max_item_bytes
+
+
+def test_pipelined_downloads_overlap_with_decoding(monkeypatch):
+    items = [
+        _photo_item(f"item-{index}", f"https://photos.google.com/{index}") for index in range(4)
+    ]
+    monkeypatch.setattr(scan, "build_candidate_sets", lambda _items, **_kwargs: ([_items], []))
+    later_download_started = threading.Event()
+    overlapped: list[bool] = []
+    decode_images = HashingService.decode_images
+
+    def fetch(item: PhotoItem) -> bytes:
+        if item.id != "item-0":
+            later_download_started.set()
+        return _image_bytes(item)
+
+    def waiting_decode(self: HashingService, batch: list[PhotoItem]) -> dict[str, Exception]:
+        if not overlapped:
+            overlapped.append(later_download_started.wait(timeout=5))
+        return decode_images(self, batch)
+
+    monkeypatch.setattr(HashingService, "decode_images", waiting_decode)
+
+    result = scan.run_scan(
+        items,
+        Settings(scan_pipeline_queue_depth=2),
+        download_manager=DownloadManager(fetcher=fetch, max_concurrency=1),
+    )
+
+    assert overlapped == [True]
+    assert result.stage_metrics.counts["byte_hashes"] == 4
+
+
+def test_run_scan_reports_progress_through_each_stage():
+    items = [
+        _photo_item(f"item-{index}", f"https://photos.google.com/{index}") for index in range(6)
+    ]
+    events: list[ScanProgress] = []
+
+    result = scan.run_scan(
+        items,
+        Settings(scan_pipeline_queue_depth=2, scan_progress_interval_seconds=0.001),
+        download_manager=DownloadManager(fetcher=_image_bytes, max_concurrency=1),
+        progress=events.append,
+    )
+
+    stages = [event.stage for event in events]
+    assert stages[:2] == ["INGEST", "HASH"]
+    assert stages[-2:] == ["COMPARE", "FINALIZE"]
+    assert [event.processed for event in events] == sorted(event.processed for event in events)
+    final = events[-1]
+    assert (final.processed, final.total) == (6, 6)
+    assert final.bytes_downloaded == sum(len(_image_bytes(item)) for item in items)
+    assert final.groups_found == len(result.groups_exact) + len(result.groups_very_similar) + len(
+        result.groups_possibly_similar
+    )
+
+
+def test_progress_within_a_stage_is_throttled():
+    now = [0.0]
+    events: list[ScanProgress] = []
+    reporter = ProgressReporter(
+        events.append,
+        total=100,
+        bytes_downloaded=lambda: 0,
+        interval_seconds=1.0,
+        clock=lambda: now[0],
+    )
+
+    reporter.stage("HASH")
+    for _ in range(20):
+        now[0] += 0.25
+        reporter.advance(1)
+    reporter.finish(groups_found=3)
+
+    assert [(event.stage, event.processed) for event in events] == [
+        ("HASH", 0),
+        ("HASH", 4),
+        ("HASH", 8),
+        ("HASH", 12),
+        ("HASH", 16),
+        ("HASH", 20),
+        ("FINALIZE", 100),
+    ]
+
+
+def test_streamed_scan_hands_over_exact_groups_then_each_bucket():
+    items = [
+        replace(
+            _photo_item(item_id, f"https://photos.google.com/{item_id}"),
+            create_time=datetime(2024, 1, day, tzinfo=UTC),
+        )
+        for item_id, day in [
+            ("left", 1),
+            ("left-edit", 1),
+            ("right", 3),
+            ("right-edit", 3),
+            ("copy", 5),
+            ("copy-again", 5),
+        ]
+    ]
+    scenes = {"left": (1, 0), "right": (3, 0), "copy": (5, 0), "copy-again": (5, 0)}
+
+    def fetch(item: PhotoItem) -> bytes:
+        seed, brighten = scenes.get(item.id) or (scenes[item.id.removesuffix("-edit")][0], 12)
+        noise = Image.frombytes("L", (32, 32), random.Random(seed).randbytes(32 * 32))
+        output = BytesIO()
+        noise.filter(ImageFilter.GaussianBlur(3)).point(lambda value: value + brighten).save(
+            output, format="PNG"
+        )
+        return output.getvalue()
+
+    def run(**kwargs: Any) -> scan.ScanResult:
+        return scan.run_scan(
+            items,
+            Settings(
+                scan_candidate_strategy=CandidateStrategy.BUCKET,
+                scan_small_input_fallback_max=1,
+            ),
+            download_manager=DownloadManager(fetcher=fetch),
+            **kwargs,
+        )
+
+    handed_over: list[list[str]] = []
+    streamed = run(
+        on_groups=lambda groups: handed_over.append(
+            [f"{group.category}:{group.items[0].id}" for group in groups]
+        )
+    )
+    single = run()
+
+    assert handed_over == [
+        ["EXACT:copy"],
+        ["VERY_SIMILAR:left"],
+        ["VERY_SIMILAR:right"],
+    ]
+    assert streamed.model_dump(include=GROUP_FIELDS) == single.model_dump(include=GROUP_FIELDS)
+    for name in ["comparisons_executed", "perceptual_hashes"]:
+        assert streamed.stage_metrics.counts[name] == single.stage_metrics.counts[name]
+    assert streamed.stage_metrics.time_to_first_group_ms is not None
+    assert single.stage_metrics.time_to_first_group_ms is None
+
+
 def test_run_scan_reports_an_unreadable_item_and_keeps_valid_duplicates():
     items = [
         _photo_item("one", "https://photos.google.com/one"),
@@ -180,17 +798,46 @@ def test_run_scan_preserves_metadata_only_compatibility_unless_bytes_are_require
         scan.run_scan([item], Settings(), require_image_bytes=True)
 
 
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_run_scan_stops_at_its_next_batch_once_asked(pipelined):
+    items = [
+        _photo_item(f"item-{index}", f"https://photos.google.com/{index}") for index in range(6)
+    ]
+    stop = threading.Event()
+    fetched: list[str] = []
+
+    def fetch(item: PhotoItem) -> bytes:
+        fetched.append(item.id)
+        stop.set()
+        return _image_bytes(item)
+
+    # Room for one item at a time, so every download is its own batch.
+    item_bytes = max(len(_image_bytes(item)) for item in items)
+    manager = DownloadManager(
+        fetcher=fetch, max_concurrency=1, max_item_bytes=item_bytes, cache_max_bytes=item_bytes
+    )
+
+    with pytest.raises(scan.ScanCancelledError):
+        scan.run_scan(
+            items,
+            Settings(scan_pipeline_downloads=pipelined, scan_pipeline_queue_depth=1),
+            download_manager=manager,
+            stop=stop,
+        )
+
+    assert len(fetched) <= 2
+
+
 def test_run_scan_stops_after_fatal_aggregate_budget_failure():
     calls: list[str] = []
 
-    class FatalBudgetManager(DownloadManager):
-        def get_bytes(self, item: PhotoItem) -> bytes:
-            calls.append(item.id)
-            raise DownloadSecurityError(
-                "download_size",
-                "The scan exceeded its download size limit.",
-                fatal_to_scan=True,
-            )
+    def fetch(item: PhotoItem) -> bytes:
+        calls.append(item.id)
+        raise DownloadSecurityError(
+            "download_size",
+            "The scan exceeded its download size limit.",
+            fatal_to_scan=True,
+        )
 
     items = [
         _photo_item("one", "https://photos.google.com/one"),
@@ -201,7 +848,7 @@ def test_run_scan_stops_after_fatal_aggregate_budget_failure():
         scan.run_scan(
             items,
             Settings(),
-            download_manager=FatalBudgetManager(),
+            download_manager=DownloadManager(fetcher=fetch, max_concurrency=1),
             require_image_bytes=True,
         )
 
@@ -223,6 +870,28 @@ def _photo_item(item_id: str, download_url: str | None) -> PhotoItem:
     )
 
 
+def _textured_image_bytes(item: PhotoItem) -> bytes:
+    seed, brighten = {"left": (1, 0), "left-edit": (1, 12), "right": (3, 0)}[item.id]
+    noise = Image.frombytes("L", (32, 32), random.Random(seed).randbytes(32 * 32))
+    image = noise.filter(ImageFilter.GaussianBlur(3)).point(lambda value: value + brighten)
+    output = BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def _variant_image_bytes(item: PhotoItem) -> bytes:
+    _, scene, variant = item.id.split("-")
+    noise = Image.frombytes("L", (64, 64), random.Random(int(scene)).randbytes(64 * 64))
+    image = noise.filter(ImageFilter.GaussianBlur(4))
+    if variant == "blurred":
+        image = image.filter(ImageFilter.GaussianBlur(2))
+    elif variant == "cropped":
+        image = image.crop((2, 2, 62, 62)).resize((64, 64))
+    output = BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
 def _image_bytes(item: PhotoItem) -> bytes:
     output = BytesIO()
     color = (sum(item.id.encode()) % 255, len(item.id) * 17 % 255, 80)
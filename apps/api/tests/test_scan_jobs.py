@@ -0,0 +1,381 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from io import BytesIO
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.core.config import Settings
+from app.engine import downloads
+from app.engine.progress import ScanProgress
+from app.engine.schemas import ScanRequest
+from app.engine.shards import LocalShards, ShardStage
+from app.jobs.backends import (
+    SCAN_TASK_NAME,
+    SHARD_TASK_NAME,
+    CeleryScanJobs,
+    CeleryShards,
+    ScanJobRecord,
+    ScanJobUnavailableError,
+)
+from app.jobs.runner import build_job_payload, run_scan_job
+from app.jobs.schemas import ScanJobStatus
+from app.main import create_app
+
+SETTINGS = Settings(scan_allowed_download_hosts=["photos.google.com"])
+
+
+def test_scan_job_runs_off_the_request_and_returns_the_envelope(monkeypatch):
+    duplicate_bytes = _png_bytes()
+
+    def fake_download(_manager, item, **_kwargs):
+        data = b"not-an-image" if item.download_url.endswith("/invalid") else duplicate_bytes
+        return downloads.DownloadedPayload(data, hashlib.sha256(data).hexdigest(), len(data))
+
+    monkeypatch.setattr(downloads.DownloadManager, "_download", fake_download)
+    client = TestClient(create_app(SETTINGS))
+
+    submitted = client.post(
+        "/api/scan/jobs",
+        json={
+            "photoItems": [
+                _photo_payload("one", "duplicate"),
+                _photo_payload("two", "duplicate"),
+                _photo_payload("bad", "invalid"),
+            ]
+        },
+    )
+
+    assert submitted.status_code == 202
+    assert submitted.json()["status"] == "QUEUED"
+    assert submitted.json()["progress"] == {
+        "stage": "QUEUED",
+        "processed": 0,
+        "total": 3,
+        "bytesDownloaded": 0,
+        "groupsFound": 0,
+    }
+    job_id = submitted.json()["jobId"]
+    status = _wait_for_job(client, job_id)
+    assert status["status"] == "SUCCEEDED"
+    assert status["progress"] == {
+        "stage": "FINALIZE",
+        "processed": 3,
+        "total": 3,
+        "bytesDownloaded": 2 * len(duplicate_bytes) + len(b"not-an-image"),
+        "groupsFound": 1,
+    }
+    results = client.get(f"/api/scan/jobs/{job_id}/results")
+    assert results.status_code == 200
+    envelope = results.json()
+    assert [group["groupType"] for group in envelope["results"]["groups"]] == ["EXACT"]
+    assert [item["itemId"] for item in envelope["results"]["failedItems"]] == ["bad"]
+
+
+def test_scan_job_events_stream_progress_until_the_job_finishes():
+    hashing = ScanJobRecord.progressed(ScanProgress("HASH", 1, 2, 512, 0))
+    records = [
+        ScanJobRecord.queued(2),
+        hashing,
+        hashing,
+        ScanJobRecord.progressed(ScanProgress("COMPARE", 2, 2, 1024, 1)),
+        ScanJobRecord.finished({"total": 2, "envelope": {"results": {"groups": [{}]}}}),
+    ]
+    client = TestClient(create_app(Settings(scan_progress_interval_seconds=0.001)))
+    client.app.state.scan_jobs = _ScriptedScanJobs(records)
+
+    with client.stream("GET", "/api/scan/jobs/job-1/events") as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        lines = list(response.iter_lines())
+
+    events = [json.loads(line.removeprefix("data: ")) for line in lines if line.startswith("data:")]
+    assert [line for line in lines if line.startswith("event:")] == ["event: progress"] * 4
+    assert [(event["status"], event["progress"]["stage"]) for event in events] == [
+        ("QUEUED", "QUEUED"),
+        ("RUNNING", "HASH"),
+        ("RUNNING", "COMPARE"),
+        ("SUCCEEDED", "FINALIZE"),
+    ]
+    assert events[1]["progress"]["bytesDownloaded"] == 512
+    assert events[-1]["progress"]["groupsFound"] == 1
+    assert client.get("/api/scan/jobs/missing/events").status_code == 404
+
+
+def test_scan_job_failures_are_reported_with_their_category(monkeypatch):
+    monkeypatch.setattr(
+        downloads.DownloadManager,
+        "_download",
+        lambda *_args, **_kwargs: downloads.DownloadedPayload(
+            b"not-an-image", hashlib.sha256(b"not-an-image").hexdigest(), 12
+        ),
+    )
+    client = TestClient(create_app(SETTINGS))
+
+    job_id = client.post(
+        "/api/scan/jobs", json={"photoItems": [_photo_payload("one", "invalid")]}
+    ).json()["jobId"]
+
+    status = _wait_for_job(client, job_id)
+    assert status["status"] == "FAILED"
+    assert status["error"]["category"] == "download_content"
+    results = client.get(f"/api/scan/jobs/{job_id}/results")
+    assert results.status_code == 422
+    assert results.json()["detail"]["category"] == "download_content"
+    assert "correlationId" in results.json()["detail"]
+
+
+def test_scan_job_results_wait_for_the_job_and_unknown_jobs_are_404(monkeypatch):
+    release = threading.Event()
+
+    def blocked_run_scan(*_args, **_kwargs):
+        release.wait(timeout=5)
+        raise ValueError("stopped")
+
+    monkeypatch.setattr("app.jobs.runner.run_scan", blocked_run_scan)
+    client = TestClient(create_app(SETTINGS))
+    job_id = client.post(
+        "/api/scan/jobs", json={"photoItems": [_photo_payload("one", "slow")]}
+    ).json()["jobId"]
+
+    try:
+        pending = client.get(f"/api/scan/jobs/{job_id}/results")
+        assert pending.status_code == 409
+        assert client.get(f"/api/scan/jobs/{job_id}").json()["status"] in {"QUEUED", "RUNNING"}
+    finally:
+        release.set()
+    assert _wait_for_job(client, job_id)["error"] == {
+        "category": "scan_failed",
+        "message": "stopped",
+    }
+    assert client.get("/api/scan/jobs/missing").status_code == 404
+    assert client.get("/api/scan/jobs/missing/results").status_code == 404
+
+
+def test_scan_jobs_hold_their_admission_slot_until_they_finish(monkeypatch):
+    release = threading.Event()
+
+    def blocked_run_scan(*_args, **_kwargs):
+        release.wait(timeout=5)
+        raise ValueError("stopped")
+
+    monkeypatch.setattr("app.jobs.runner.run_scan", blocked_run_scan)
+    client = TestClient(create_app(SETTINGS.model_copy(update={"scan_concurrency_limit": 1})))
+    payload = {"photoItems": [_photo_payload("one", "slow")]}
+
+    job_id = client.post("/api/scan/jobs", json=payload).json()["jobId"]
+    try:
+        refused = client.post("/api/scan/jobs", json=payload)
+        assert refused.status_code == 503
+        assert refused.json()["detail"]["category"] == "scan_busy"
+    finally:
+        release.set()
+    assert _wait_for_job(client, job_id)["status"] == "FAILED"
+
+    assert client.post("/api/scan/jobs", json=payload).status_code == 202
+
+
+def test_scan_job_submission_validates_the_request_before_queueing():
+    client = TestClient(
+        create_app(
+            Settings(
+                environment="production",
+                scan_allowed_download_hosts=["googleusercontent.com"],
+                scan_max_photos=1,
+            )
+        )
+    )
+
+    response = client.post(
+        "/api/scan/jobs",
+        json={
+            "photoItems": [
+                {"id": "one", "createTime": "2025-01-01T00:00:00Z"},
+                {"id": "two", "createTime": "2025-01-01T00:00:01Z"},
+            ]
+        },
+    )
+
+    assert response.status_code == 400
+
+
+def test_celery_jobs_store_the_queued_state_before_sending_the_task():
+    celery_app = _FakeCeleryApp()
+    scan_jobs = CeleryScanJobs(celery_app)
+
+    scan_jobs.submit("job-1", {"request": {}}, total=4)
+
+    assert celery_app.events == [
+        (
+            "store",
+            "job-1",
+            "QUEUED",
+            {
+                "stage": "QUEUED",
+                "processed": 0,
+                "total": 4,
+                "bytes_downloaded": 0,
+                "groups_found": 0,
+            },
+        ),
+        ("send", SCAN_TASK_NAME, "job-1", [{"request": {}}, 4]),
+    ]
+    record = scan_jobs.get("job-1")
+    assert record is not None
+    assert record.status == ScanJobStatus.QUEUED
+    assert record.progress.total == 4
+
+
+@pytest.mark.parametrize(
+    "state,info,expected",
+    [
+        ("PENDING", None, None),
+        ("RUNNING", {"stage": "SCAN", "processed": 0, "total": 2}, ScanJobStatus.RUNNING),
+        (
+            "SUCCESS",
+            {"total": 2, "envelope": {"results": {"groups": []}}},
+            ScanJobStatus.SUCCEEDED,
+        ),
+        ("SUCCESS", {"total": 2, "error": {"category": "c", "message": "m"}}, "FAILED"),
+        ("FAILURE", RuntimeError("boom"), ScanJobStatus.FAILED),
+    ],
+)
+def test_celery_job_states_map_to_scan_job_records(state, info, expected):
+    celery_app = _FakeCeleryApp()
+    celery_app.states["job-1"] = (state, info)
+
+    record = CeleryScanJobs(celery_app).get("job-1")
+
+    assert (record.status if record else None) == expected
+
+
+def test_celery_broker_errors_surface_as_unavailable_jobs():
+    celery_app = _FakeCeleryApp()
+    celery_app.broker_down = True
+    client = TestClient(create_app(SETTINGS))
+    client.app.state.scan_jobs = CeleryScanJobs(celery_app)
+
+    with pytest.raises(ScanJobUnavailableError):
+        CeleryScanJobs(celery_app).submit("job-1", {}, total=1)
+    response = client.post("/api/scan/jobs", json={"photoItems": [_photo_payload("one", "any")]})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+
+def test_sharded_scan_jobs_return_the_unsharded_envelope(monkeypatch):
+    monkeypatch.setattr(
+        downloads.DownloadManager,
+        "_download",
+        lambda _manager, item, **_kwargs: downloads.DownloadedPayload(
+            _png_bytes(), hashlib.sha256(_png_bytes()).hexdigest(), len(_png_bytes())
+        ),
+    )
+    settings = Settings(
+        scan_allowed_download_hosts=["photos.google.com"],
+        scan_job_sharding=True,
+        scan_job_shards=2,
+    )
+    payload = build_job_payload(
+        ScanRequest.model_validate(
+            {"photoItems": [_photo_payload(f"item-{index}", str(index)) for index in range(5)]}
+        ),
+        explain=False,
+    )
+
+    sharded = run_scan_job(payload, settings, shards=LocalShards(settings))
+    unsharded = run_scan_job(payload, settings)
+
+    assert sharded["envelope"]["results"] == unsharded["envelope"]["results"]
+    assert [len(group["items"]) for group in sharded["envelope"]["results"]["groups"]] == [5]
+
+
+def test_celery_shards_wait_for_every_shard_task_in_order():
+    celery_app = _FakeCeleryApp()
+
+    outcomes = CeleryShards(celery_app, timeout_seconds=30).map(
+        ShardStage.GROUP, [{"shard": 0}, {"shard": 1}]
+    )
+
+    assert celery_app.events == [
+        ("send", SHARD_TASK_NAME, None, ["group", {"shard": 0}]),
+        ("send", SHARD_TASK_NAME, None, ["group", {"shard": 1}]),
+    ]
+    assert outcomes == [
+        {"args": ["group", {"shard": 0}], "timeout": 30, "disable_sync_subtasks": False},
+        {"args": ["group", {"shard": 1}], "timeout": 30, "disable_sync_subtasks": False},
+    ]
+
+
+class _ScriptedScanJobs:
+    def __init__(self, records: list[ScanJobRecord]) -> None:
+        self._records = records
+
+    def submit(self, job_id: str, payload: dict[str, Any], *, total: int) -> None:
+        raise AssertionError("not used")
+
+    def get(self, job_id: str) -> ScanJobRecord | None:
+        if job_id != "job-1":
+            return None
+        return self._records.pop(0) if len(self._records) > 1 else self._records[0]
+
+
+class _FakeCeleryApp:
+    def __init__(self) -> None:
+        self.events: list[tuple[Any, ...]] = []
+        self.states: dict[str, tuple[str, Any]] = {}
+        self.broker_down = False
+        self.backend = self
+
+    def store_result(self, task_id: str, result: Any, state: str) -> None:
+        if self.broker_down:
+            raise ConnectionError("redis unavailable")
+        self.events.append(("store", task_id, state, result))
+        self.states[task_id] = (state, result)
+
+    def send_task(self, name: str, *, args: list[Any], task_id: str | None = None) -> Any:
+        self.events.append(("send", name, task_id, args))
+        return _FakeAsyncResult(args)
+
+    def AsyncResult(self, task_id: str) -> Any:
+        state, info = self.states.get(task_id, ("PENDING", None))
+        return type("Result", (), {"state": state, "info": info})()
+
+
+class _FakeAsyncResult:
+    def __init__(self, args: list[Any]) -> None:
+        self._args = args
+
+    def get(self, **kwargs: Any) -> dict[str, Any]:
+        return {"args": self._args, **kwargs}
+
+
+def _wait_for_job(client: TestClient, job_id: str) -> dict[str, Any]:
+    deadline = time.monotonic() + 5
+    while True:
+        status = client.get(f"/api/scan/jobs/{job_id}").json()
+        if status["status"] in {"SUCCEEDED", "FAILED"} or time.monotonic() > deadline:
+            return status
+        time.sleep(0.01)
+
+
+def _photo_payload(item_id: str, token: str) -> dict[str, object]:
+    return {
+        "id": item_id,
+        "createTime": "2025-01-01T00:00:00Z",
+        "filename": f"{item_id}.png",
+        "mimeType": "image/png",
+        "width": 8,
+        "height": 8,
+        "downloadUrl": f"https://photos.google.com/{token}",
+    }
+
+
+def _png_bytes() -> bytes:
+    output = BytesIO()
+    Image.new("RGB", (8, 8), color=(24, 80, 140)).save(output, format="PNG")
+    return output.getvalue()
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import hashlib
+import random
+from datetime import UTC, datetime, timedelta
+from io import BytesIO
+from typing import Any
+
+import pytest
+from PIL import Image, ImageFilter
+
+from app.core.config import CandidateStrategy, Settings
+from app.engine import downloads, scan
+from app.engine.models import CaptureSettings, GPSLocation, PhotoItem
+from app.engine.shards import (
+    LocalShards,
+    ShardStage,
+    item_from_json,
+    item_to_json,
+    run_sharded_scan,
+)
+
+# Counters that follow from the scan's inputs rather than from how its work was spread.
+COMPARABLE_COUNTS = [
+    "candidate_sets",
+    "candidate_pairs",
+    "candidate_items",
+    "candidate_sets_split",
+    "byte_hashes",
+    "byte_hashes_streamed",
+    "images_decoded",
+    "downloads_performed",
+    "global_lsh_pairs",
+    "comparisons_bound",
+    "comparisons_executed",
+    "comparisons_skipped",
+]
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {"scan_candidate_strategy": CandidateStrategy.BUCKET},
+        {
+            "scan_candidate_strategy": CandidateStrategy.BUCKET,
+            "scan_candidate_max_set_items": 4,
+            "scan_candidate_max_comparisons": 10,
+        },
+        {"scan_candidate_strategy": CandidateStrategy.WINDOW},
+        {"scan_global_near_duplicates": True, "scan_stream_exact_only_items": True},
+    ],
+)
+def test_sharded_scan_merges_into_the_single_process_result(monkeypatch, overrides):
+    monkeypatch.setattr(downloads.DownloadManager, "_download", _fake_download)
+    items = _library()
+    settings = Settings(
+        scan_allowed_download_hosts=["photos.google.com"],
+        scan_small_input_fallback_max=1,
+        **overrides,
+    )
+
+    single = scan.run_scan(items, settings, explain=True, require_image_bytes=True)
+    sharded = run_sharded_scan(
+        items,
+        settings,
+        LocalShards(settings),
+        shard_count=3,
+        explain=True,
+        require_image_bytes=True,
+    )
+
+    assert _results(sharded) == _results(single)
+    assert sharded.groups_very_similar and sharded.failed_items
+    counts = sharded.stage_metrics.counts
+    assert {name: counts[name] for name in COMPARABLE_COUNTS} == {
+        name: single.stage_metrics.counts[name] for name in COMPARABLE_COUNTS
+    }
+    assert counts["shards_hashing"] == 3
+    assert counts["shards_grouping"] >= 1
+    assert sharded.stage_metrics.debug == single.stage_metrics.debug
+    assert sharded.stage_metrics.shard_timings_ms is not None
+    assert {"hash-0", "hash-1", "hash-2", "group-0"} <= set(sharded.stage_metrics.shard_timings_ms)
+
+
+def test_sharded_scan_spreads_unrelated_buckets_across_group_shards(monkeypatch):
+    monkeypatch.setattr(downloads.DownloadManager, "_download", _fake_download)
+    settings = Settings(
+        scan_allowed_download_hosts=["photos.google.com"],
+        scan_candidate_strategy=CandidateStrategy.BUCKET,
+    )
+
+    result = run_sharded_scan(_library(), settings, LocalShards(settings), shard_count=2)
+
+    assert result.stage_metrics.counts["shards_grouping"] == 2
+    assert set(result.stage_metrics.shard_timings_ms or {}) == {
+        "hash-0",
+        "hash-1",
+        "group-0",
+        "group-1",
+    }
+
+
+def test_group_shard_payloads_send_each_item_once(monkeypatch):
+    monkeypatch.setattr(downloads.DownloadManager, "_download", _fake_download)
+    settings = Settings(
+        scan_allowed_download_hosts=["photos.google.com"],
+        scan_candidate_strategy=CandidateStrategy.WINDOW,
+    )
+    payloads: list[dict] = []
+
+    class RecordingShards(LocalShards):
+        def map(self, stage, shard_payloads):
+            if stage == ShardStage.GROUP:
+                payloads.extend(shard_payloads)
+            return super().map(stage, shard_payloads)
+
+    result = run_sharded_scan(_library(), settings, RecordingShards(settings), shard_count=2)
+
+    assert result.groups_very_similar
+    for payload in payloads:
+        item_ids = [entry["id"] for entry in payload["items"]]
+        assert len(item_ids) == len(set(item_ids)) == len(payload["hashes"])
+        assert all(isinstance(index, int) for pair in payload["pairs"] for index in pair)
+    assert sum(len(payload["pairs"]) for payload in payloads) > sum(
+        len(payload["items"]) for payload in payloads
+    )
+
+
+def test_sharded_scan_raises_a_shard_failure_fatal_to_the_scan(monkeypatch):
+    def fatal_download(_manager, item, **_kwargs):
+        raise downloads.DownloadSecurityError(
+            "download_size", "The scan exceeded its download size limit.", fatal_to_scan=True
+        )
+
+    monkeypatch.setattr(downloads.DownloadManager, "_download", fatal_download)
+    settings = Settings(scan_allowed_download_hosts=["photos.google.com"])
+
+    with pytest.raises(downloads.DownloadSecurityError) as caught:
+        run_sharded_scan(_library()[:4], settings, LocalShards(settings), shard_count=2)
+
+    assert caught.value.category == "download_size"
+    assert caught.value.fatal_to_scan
+
+
+def test_photo_items_survive_the_shard_payload_round_trip():
+    item = PhotoItem(
+        id="one",
+        create_time=datetime(2024, 1, 1, 12, tzinfo=UTC),
+        filename="one.jpg",
+        mime_type="image/jpeg",
+        width=100,
+        height=80,
+        gps=GPSLocation(latitude=51.5, longitude=-0.12),
+        download_url="https://photos.google.com/one",
+        deep_link=None,
+        capture=CaptureSettings(camera_model="Pixel 8", exposure_seconds=0.008),
+    )
+
+    assert item_from_json(item_to_json(item)) == item
+
+
+def _results(result: scan.ScanResult) -> dict[str, Any]:
+    return result.model_dump(
+        mode="json",
+        include={
+            "input_count",
+            "groups_exact",
+            "groups_very_similar",
+            "groups_possibly_similar",
+            "failed_items",
+        },
+    )
+
+
+def _library() -> list[PhotoItem]:
+    """Daily bursts of edited shots, with exact copies and unreadable files mixed in."""
+    start = datetime(2024, 5, 1, 8, tzinfo=UTC)
+    items = []
+    for index in range(36):
+        burst, shot = divmod(index, 6)
+        items.append(
+            PhotoItem(
+                id=f"item-{index:02d}",
+                create_time=start + timedelta(days=burst, seconds=20 * shot),
+                filename=f"item-{index:02d}.png",
+                mime_type="image/png",
+                width=32,
+                height=32,
+                gps=None,
+                download_url=f"https://photos.google.com/{burst}-{shot}",
+                deep_link=None,
+            )
+        )
+    return items
+
+
+def _fake_download(_manager, item: PhotoItem, **_kwargs) -> downloads.DownloadedPayload:
+    burst, shot = (int(part) for part in item.download_url.rsplit("/", 1)[1].split("-"))
+    if shot == 5 and burst % 2:
+        data = b"not-an-image"
+    else:
+        # Shots 0-2 are edits of one scene, 3 copies shot 0 and 4 is its own scene.
+        seed, brighten = {0: (0, 0), 1: (0, 6), 2: (0, 14), 3: (0, 0), 4: (1, 0)}.get(shot, (2, 0))
+        noise = Image.frombytes("L", (32, 32), random.Random(burst * 10 + seed).randbytes(1024))
+        image = noise.filter(ImageFilter.GaussianBlur(3)).point(lambda value: value + brighten)
+        output = BytesIO()
+        image.save(output, format="PNG")
+        data = output.getvalue()
+    return downloads.DownloadedPayload(data, hashlib.sha256(data).hexdigest(), len(data))
@@ -16,4 +16,4 @@ def typed_task(
     )
 
 
-# Worker tasks will be implemented in Phase 3.
+# Scan tasks run with the scan engine in the API package (apps/api/app/jobs/worker.py).
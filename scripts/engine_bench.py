@@ -0,0 +1,520 @@
+#!/usr/bin/env python3
+"""Scan engine benchmarks and drift reports.
+
+Run with the API environment so the engine package and its dependencies resolve:
+
+    cd apps/api && uv run python ../../scripts/engine_bench.py draft-drift
+"""
+
+from __future__ import annotations
+
+import argparse
+import ipaddress
+import json
+import multiprocessing
+import os
+import runpy
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from datetime import UTC, datetime, timedelta
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+API_ROOT = REPO_ROOT / "apps" / "api"
+if str(API_ROOT) not in sys.path:
+    sys.path.insert(0, str(API_ROOT))
+
+try:
+    import numpy as np
+    import PIL  # noqa: F401 - the photo corpus renders with Pillow
+except ImportError as exc:  # pragma: no cover - runtime guard
+    raise SystemExit("NumPy and Pillow are required. Install API deps before running.") from exc
+
+from app.core.config import Settings
+from app.engine import hamming_index, hashing
+from app.engine.downloads import (
+    AuthorizedTarget,
+    DownloadManager,
+    PinnedHttpConnector,
+    TlsSessionCache,
+    _create_isolated_ssl_context,
+)
+from app.engine.models import CaptureSettings, PhotoItem
+from app.engine.scan import run_scan
+from tests.photo_corpus import render_photo_jpeg
+
+# Phones and cameras in a typical shared family library, shot in good light.
+FAMILY_DEVICES = (
+    CaptureSettings("Apple", "iPhone 15", 6.9, 1.8, 80, 1 / 500),
+    CaptureSettings("Apple", "iPhone 12", 4.2, 1.6, 64, 1 / 640),
+    CaptureSettings("Google", "Pixel 8", 6.9, 1.7, 50, 1 / 800),
+    CaptureSettings("samsung", "SM-S911B", 5.4, 1.8, 50, 1 / 1000),
+    CaptureSettings("Canon", "EOS R6", 35.0, 4.0, 400, 1 / 250),
+)
+
+
+def measure_draft_drift(corpus: list[bytes], *, min_edge: int) -> dict[str, Any]:
+    rows: list[dict[str, Any]] = []
+    for index, image_bytes in enumerate(corpus):
+        full, full_seconds = _timed_decode(image_bytes, None)
+        draft, draft_seconds = _timed_decode(image_bytes, min_edge)
+        full_hashes = _hashes(full)
+        draft_hashes = _hashes(draft)
+        rows.append(
+            {
+                "image": index,
+                "draftScale": draft.draft_scale,
+                "dhashDrift": hashing.hamming_distance(full_hashes.dhash, draft_hashes.dhash),
+                "phashDrift": hashing.hamming_distance(full_hashes.phash, draft_hashes.phash),
+                "fullMs": round(full_seconds * 1000, 2),
+                "draftMs": round(draft_seconds * 1000, 2),
+            }
+        )
+    full_total = sum(row["fullMs"] for row in rows)
+    draft_total = sum(row["draftMs"] for row in rows)
+    return {
+        "minEdge": min_edge,
+        "images": len(rows),
+        "maxDhashDrift": max((row["dhashDrift"] for row in rows), default=0),
+        "meanDhashDrift": _mean(row["dhashDrift"] for row in rows),
+        "maxPhashDrift": max((row["phashDrift"] for row in rows), default=0),
+        "meanPhashDrift": _mean(row["phashDrift"] for row in rows),
+        "fullMsPer100": round(full_total / max(len(rows), 1) * 100, 1),
+        "draftMsPer100": round(draft_total / max(len(rows), 1) * 100, 1),
+        "speedup": round(full_total / draft_total, 2) if draft_total else None,
+        "rows": rows,
+    }
+
+
+def measure_hash_pool(
+    corpus: list[bytes], *, worker_counts: list[int], min_edge: int | None
+) -> dict[str, Any]:
+    items = [_bench_item(index) for index in range(len(corpus))]
+    by_id = {item.id: data for item, data in zip(items, corpus, strict=True)}
+    rows: list[dict[str, Any]] = []
+    for workers in worker_counts:
+        executor = (
+            ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+            if workers > 1
+            else None
+        )
+        try:
+            if executor is not None:
+                # Spawn and import cost is paid once per process, not per scan.
+                list(executor.map(hashing._decode_batch, [[]] * workers, [None] * workers))
+            service = hashing.HashingService(
+                DownloadManager(fetcher=lambda item: by_id[item.id]),
+                jpeg_draft_min_edge=min_edge,
+                executor=executor,
+            )
+            start = time.perf_counter()
+            failures = service.decode_images(items)
+            elapsed = time.perf_counter() - start
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        rows.append(
+            {
+                "workers": workers,
+                "failures": len(failures),
+                "ms": round(elapsed * 1000, 1),
+                "msPer100": round(elapsed * 1000 / max(len(items), 1) * 100, 1),
+            }
+        )
+    baseline = rows[0]["ms"] if rows else 0
+    for row in rows:
+        row["speedup"] = round(baseline / row["ms"], 2) if row["ms"] else None
+    return {"images": len(corpus), "cpus": os.cpu_count(), "minEdge": min_edge, "rows": rows}
+
+
+def measure_tls_resume(requests: int) -> dict[str, Any]:
+    """Fetch fixture media over TLS with and without resumable sessions."""
+    handler = runpy.run_path(str(REPO_ROOT / "scripts" / "fixture_media_server.py"))[
+        "FixtureHandler"
+    ]
+    with tempfile.TemporaryDirectory() as workdir:
+        cert, key = Path(workdir) / "cert.pem", Path(workdir) / "key.pem"
+        subprocess.run(
+            [
+                "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                "-keyout", str(key), "-out", str(cert), "-subj", "/CN=fixture.test",
+                "-addext", "subjectAltName=DNS:fixture.test",
+            ],
+            check=True,
+            capture_output=True,
+        )  # fmt: skip
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(cert, key)
+        client_context = _create_isolated_ssl_context()
+        client_context.load_verify_locations(cert)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.socket = server_context.wrap_socket(server.socket, server_side=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            rows = [
+                _tls_row(server, client_context, "full", TlsSessionCache(max_entries=0), requests),
+                _tls_row(server, client_context, "resumed", TlsSessionCache(), requests),
+            ]
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join(timeout=2)
+    return {"requests": requests, "rows": rows}
+
+
+def measure_camera_match(
+    items: list[PhotoItem], corpus: dict[str, bytes], *, exposure_stops: float
+) -> dict[str, Any]:
+    """Scan the same library with and without camera-identity candidate narrowing."""
+    rows: list[dict[str, Any]] = []
+    for mode, camera_match in (("off", False), ("on", True)):
+        settings = Settings(
+            scan_candidate_camera_match=camera_match,
+            scan_candidate_exposure_stops=exposure_stops,
+        )
+        start = time.perf_counter()
+        result = run_scan(
+            items,
+            settings,
+            download_manager=DownloadManager(fetcher=lambda item: corpus[item.id]),
+        )
+        elapsed = time.perf_counter() - start
+        counts = result.stage_metrics.counts
+        rows.append(
+            {
+                "mode": mode,
+                "candidatePairs": counts["candidate_pairs"],
+                "comparisons": counts["comparisons_executed"],
+                "perceptualHashes": counts["perceptual_hashes"],
+                "nearGroups": len(result.groups_very_similar) + len(result.groups_possibly_similar),
+                "ms": round(elapsed * 1000, 1),
+            }
+        )
+    return {"items": len(items), "exposureStops": exposure_stops, "rows": rows}
+
+
+def _family_library(
+    events: int, devices: int, *, seed: int, width: int, height: int
+) -> tuple[list[PhotoItem], dict[str, bytes]]:
+    """Gatherings where each family member's device shoots its own short burst.
+
+    Some events happen after dark, where each device exposes several stops brighter.
+    """
+    rng = np.random.default_rng(seed)
+    items: list[PhotoItem] = []
+    corpus: dict[str, bytes] = {}
+    start = datetime(2024, 1, 1, 12, tzinfo=UTC)
+    for event in range(events):
+        event_time = start + timedelta(days=event)
+        night = event % 3 == 2
+        for device_index in range(devices):
+            device = FAMILY_DEVICES[device_index % len(FAMILY_DEVICES)]
+            capture = (
+                replace(device, iso_equivalent=1600, exposure_seconds=1 / 15) if night else device
+            )
+            scene = int(rng.integers(1 << 31))
+            for shot in range(int(rng.integers(1, 4))):
+                index = len(items)
+                item = replace(
+                    _bench_item(index),
+                    create_time=event_time + timedelta(seconds=int(rng.integers(0, 300))),
+                    width=width,
+                    height=height,
+                    capture=capture,
+                )
+                items.append(item)
+                # Burst frames re-encode one scene, so they are near duplicates of each other.
+                corpus[item.id] = render_photo_jpeg(scene, width, height, quality=90 - 8 * shot)
+    return items, corpus
+
+
+def _tls_row(
+    server: ThreadingHTTPServer,
+    context: ssl.SSLContext,
+    mode: str,
+    sessions: TlsSessionCache,
+    requests: int,
+) -> dict[str, Any]:
+    # The fixture server speaks HTTP/1.0, so every request needs its own TLS connection.
+    connector = PinnedHttpConnector(ssl_context=context, tls_sessions=sessions)
+    port = server.server_address[1]
+    addresses = frozenset({ipaddress.ip_address("127.0.0.1")})
+    start = time.perf_counter()
+    for index in range(requests):
+        path = f"/media/bench-{index % 8}"
+        target = AuthorizedTarget(
+            url=f"https://fixture.test:{port}{path}",
+            scheme="https",
+            hostname="fixture.test",
+            port=port,
+            request_target=path,
+            allow_non_global=True,
+        )
+        response = connector.open(target, addresses, 10)
+        try:
+            while response.read(64 * 1024):
+                pass
+        finally:
+            response.close()
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": mode,
+        "fullHandshakes": connector.tls_handshakes_full,
+        "resumedHandshakes": connector.tls_handshakes_resumed,
+        "ms": round(elapsed * 1000, 1),
+        "msPer100": round(elapsed * 1000 / max(requests, 1) * 100, 1),
+    }
+
+
+def measure_hamming(sizes: list[int], *, seed: int, radii: tuple[int, int]) -> dict[str, Any]:
+    """Near-pair search per bucket size: scalar loop and NumPy kernel."""
+    rng = np.random.default_rng(seed)
+    rows: list[dict[str, Any]] = []
+    for size in sizes:
+        columns = [_clustered_hashes(rng, size) for _ in radii]
+        found: dict[str, int] = {}
+        timings: dict[str, float] = {}
+        for method, search in (
+            ("scalar", _scalar_pairs),
+            ("kernel", _kernel_pairs),
+        ):
+            start = time.perf_counter()
+            found[method] = search(columns, radii)
+            timings[method] = time.perf_counter() - start
+        rows.append(
+            {
+                "items": size,
+                "pairs": size * (size - 1) // 2,
+                "nearPairs": found["kernel"],
+                "consistent": len(set(found.values())) == 1,
+                **{f"{method}Ms": round(seconds * 1000, 1) for method, seconds in timings.items()},
+            }
+        )
+    return {"radii": list(radii), "rows": rows}
+
+
+def _clustered_hashes(rng: np.random.Generator, size: int) -> list[int]:
+    """Hashes in small clusters of near neighbours, like bursts within a busy day."""
+    seeds = rng.integers(0, 2**63, size=max(size // 4, 1), dtype=np.uint64) << np.uint64(1)
+    values = []
+    for index in range(size):
+        flips = rng.choice(64, size=int(rng.integers(0, 16)), replace=False)
+        values.append(int(seeds[index % len(seeds)]) ^ sum(1 << int(bit) for bit in flips))
+    return values
+
+
+def _within(columns: list[list[int]], radii: tuple[int, int], left: int, right: int) -> bool:
+    return any(
+        hashing.hamming_distance(column[left], column[right]) <= radius
+        for column, radius in zip(columns, radii, strict=True)
+    )
+
+
+def _scalar_pairs(columns: list[list[int]], radii: tuple[int, int]) -> int:
+    size = len(columns[0])
+    return sum(
+        _within(columns, radii, left, right)
+        for left in range(size)
+        for right in range(left + 1, size)
+    )
+
+
+def _kernel_pairs(columns: list[list[int]], radii: tuple[int, int]) -> int:
+    return sum(len(block.left) for block in hamming_index.pairs_within(columns, radii))
+
+
+def _bench_item(index: int) -> PhotoItem:
+    return PhotoItem(
+        id=f"bench-{index}",
+        create_time=datetime(2024, 1, 1, tzinfo=UTC),
+        filename=f"bench-{index}.jpg",
+        mime_type="image/jpeg",
+        width=None,
+        height=None,
+        gps=None,
+        download_url=f"https://photos.google.com/bench-{index}",
+        deep_link=None,
+    )
+
+
+def _timed_decode(image_bytes: bytes, min_edge: int | None) -> tuple[hashing.DecodedImage, float]:
+    start = time.perf_counter()
+    decoded = hashing.decode_image(image_bytes, draft_min_edge=min_edge)
+    return decoded, time.perf_counter() - start
+
+
+def _hashes(decoded: hashing.DecodedImage) -> hashing.PerceptualHashes:
+    return hashing.PerceptualHashes(
+        dhash=hashing._dhash_from_pixels(decoded.dhash_pixels, hashing.DHASH_SIZE),
+        phash=hashing._phash_from_pixels(
+            decoded.phash_pixels,
+            hashing.PHASH_SIZE,
+            hashing.PHASH_HASH_SIZE,
+            hashing.PhashBackend.NUMPY,
+        ),
+    )
+
+
+def _mean(values: Any) -> float:
+    collected = list(values)
+    return round(statistics.fmean(collected), 3) if collected else 0.0
+
+
+def _run_draft_drift(args: argparse.Namespace) -> dict[str, Any]:
+    corpus = [
+        render_photo_jpeg(args.seed + offset, args.width, args.height)
+        for offset in range(args.count)
+    ]
+    return measure_draft_drift(corpus, min_edge=args.min_edge)
+
+
+def _run_hash_pool(args: argparse.Namespace) -> dict[str, Any]:
+    corpus = [
+        render_photo_jpeg(args.seed + offset, args.width, args.height)
+        for offset in range(args.count)
+    ]
+    return measure_hash_pool(
+        corpus,
+        worker_counts=args.workers,
+        min_edge=None if args.full_decode else args.min_edge,
+    )
+
+
+def _run_tls_resume(args: argparse.Namespace) -> dict[str, Any]:
+    return measure_tls_resume(args.requests)
+
+
+def _run_hamming(args: argparse.Namespace) -> dict[str, Any]:
+    return measure_hamming(args.sizes, seed=args.seed, radii=(args.dhash_radius, args.phash_radius))
+
+
+def _run_camera(args: argparse.Namespace) -> dict[str, Any]:
+    items, corpus = _family_library(
+        args.events, args.devices, seed=args.seed, width=args.width, height=args.height
+    )
+    return measure_camera_match(items, corpus, exposure_stops=args.exposure_stops)
+
+
+def _print_camera(report: dict[str, Any]) -> None:
+    print(
+        f"Camera-identity narrowing on {report['items']} family photos "
+        f"(exposure within {report['exposureStops']} stops)"
+    )
+    print(f"{'mode':>4} {'pairs':>7} {'compared':>8} {'pHashes':>7} {'groups':>6} {'ms':>9}")
+    for row in report["rows"]:
+        print(
+            f"{row['mode']:>4} {row['candidatePairs']:>7} {row['comparisons']:>8} "
+            f"{row['perceptualHashes']:>7} {row['nearGroups']:>6} {row['ms']:>9}"
+        )
+
+
+def _print_hamming(report: dict[str, Any]) -> None:
+    print(f"Near-pair search within dHash/pHash radii {report['radii']}")
+    print(
+        f"{'items':>6} {'near':>8} {'scalar ms':>10} {'index ms':>9} {'kernel ms':>10} {'same':>5}"
+    )
+    for row in report["rows"]:
+        print(
+            f"{row['items']:>6} {row['nearPairs']:>8} {row['scalarMs']:>10} "
+            f"{row['indexMs']:>9} {row['kernelMs']:>10} {row['consistent']!s:>5}"
+        )
+
+
+def _print_tls_resume(report: dict[str, Any]) -> None:
+    print(f"{report['requests']} TLS fixture downloads, one connection each")
+    print(f"{'mode':>8} {'full':>5} {'resumed':>7} {'ms':>9} {'ms/100':>9}")
+    for row in report["rows"]:
+        print(
+            f"{row['mode']:>8} {row['fullHandshakes']:>5} {row['resumedHandshakes']:>7} "
+            f"{row['ms']:>9} {row['msPer100']:>9}"
+        )
+
+
+def _print_hash_pool(report: dict[str, Any]) -> None:
+    print(f"Pooled decode of {report['images']} images on {report['cpus']} CPUs")
+    print(f"{'workers':>7} {'ms':>9} {'ms/100':>9} {'speedup':>7}")
+    for row in report["rows"]:
+        print(f"{row['workers']:>7} {row['ms']:>9} {row['msPer100']:>9} {row['speedup']:>7}")
+
+
+def _print_draft_drift(report: dict[str, Any]) -> None:
+    print(f"JPEG draft decode (min edge {report['minEdge']}px, {report['images']} images)")
+    print(f"{'image':>5} {'scale':>5} {'dHash':>5} {'pHash':>5} {'full ms':>9} {'draft ms':>9}")
+    for row in report["rows"]:
+        print(
+            f"{row['image']:>5} {row['draftScale']:>5} {row['dhashDrift']:>5} "
+            f"{row['phashDrift']:>5} {row['fullMs']:>9} {row['draftMs']:>9}"
+        )
+    print(
+        f"drift dHash max {report['maxDhashDrift']} mean {report['meanDhashDrift']}; "
+        f"pHash max {report['maxPhashDrift']} mean {report['meanPhashDrift']}"
+    )
+    print(
+        f"per 100 photos: full {report['fullMsPer100']} ms, "
+        f"draft {report['draftMsPer100']} ms ({report['speedup']}x)"
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--json", action="store_true", help="print the raw report as JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    draft = commands.add_parser("draft-drift", help="hash drift of JPEG draft decoding")
+    draft.add_argument("--count", type=int, default=12)
+    draft.add_argument("--width", type=int, default=4000)
+    draft.add_argument("--height", type=int, default=3000)
+    draft.add_argument("--min-edge", type=int, default=256)
+    draft.add_argument("--seed", type=int, default=0)
+    draft.set_defaults(run=_run_draft_drift, show=_print_draft_drift)
+
+    pool = commands.add_parser("hash-pool", help="decode throughput per hashing worker count")
+    pool.add_argument("--count", type=int, default=64)
+    pool.add_argument("--width", type=int, default=4000)
+    pool.add_argument("--height", type=int, default=3000)
+    pool.add_argument("--min-edge", type=int, default=256)
+    pool.add_argument("--full-decode", action="store_true", help="disable JPEG draft decoding")
+    pool.add_argument("--seed", type=int, default=0)
+    pool.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    pool.set_defaults(run=_run_hash_pool, show=_print_hash_pool)
+
+    tls = commands.add_parser("tls-resume", help="full vs resumed TLS handshakes per download")
+    tls.add_argument("--requests", type=int, default=200)
+    tls.set_defaults(run=_run_tls_resume, show=_print_tls_resume)
+
+    pairs = commands.add_parser("hamming", help="near-pair search cost per bucket size")
+    pairs.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    pairs.add_argument("--dhash-radius", type=int, default=10)
+    pairs.add_argument("--phash-radius", type=int, default=12)
+    pairs.add_argument("--seed", type=int, default=0)
+    pairs.set_defaults(run=_run_hamming, show=_print_hamming)
+
+    camera = commands.add_parser("camera", help="comparisons with camera-identity narrowing")
+    camera.add_argument("--events", type=int, default=30)
+    camera.add_argument("--devices", type=int, default=4)
+    camera.add_argument("--width", type=int, default=640)
+    camera.add_argument("--height", type=int, default=480)
+    camera.add_argument("--exposure-stops", type=float, default=4.0)
+    camera.add_argument("--seed", type=int, default=0)
+    camera.set_defaults(run=_run_camera, show=_print_camera)
+
+    args = parser.parse_args(argv)
+    report = args.run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        args.show(report)
+
+
+if __name__ == "__main__":
+    main()